@@ -0,0 +1,263 @@
+import numpy as np
+import json
+import brush
+import cell_rules
+import explosions
+import movement
+import thermal
+import savefile
+from chunks import ChunkTracker, RESTLESS
+from events import Schedule
+from profiling import phase
+from rng import WorldRandom
+from materials import EMPTY, FIRE, PLANT, AMBIENT_TEMPERATURE, material_id, material_name, initial_life
+
+REACTIVE = (FIRE, PLANT)
+# materials whose rare events come from a Schedule rather than a roll every tick
+SCHEDULED = (PLANT,)
+
+
+def apply_rules(planes, moved, kernels='vector', rng=None, scheduled=(), own=None):
+    if kernels == 'vector':
+        movement.step(planes, moved, rng, own)
+        cell_rules.step(planes, moved, only=REACTIVE, rng=rng, skip=scheduled)
+    else:
+        cell_rules.step(planes, moved, rng=rng, skip=scheduled)
+
+
+def paint_cells(planes, ys, xs, particle_type=None, mode=brush.FILL):
+    m, t, life, vx, vy = planes
+    if mode == brush.FILL:
+        empty = m[ys, xs] == EMPTY
+        ys, xs = ys[empty], xs[empty]
+    material = EMPTY if mode == brush.ERASE else material_id(particle_type)
+    m[ys, xs] = material
+    t[ys, xs] = AMBIENT_TEMPERATURE
+    life[ys, xs] = initial_life(material)
+    vx[ys, xs] = 0.0
+    vy[ys, xs] = 0.0
+    return ys, xs
+
+
+class Viewport:
+    # the material and temperature of a rectangle of a world, for drawing
+    def __init__(self, planes):
+        self.planes = planes
+        self.height, self.width = planes[0].shape
+
+    def material_grid(self):
+        return self.planes[0]
+
+    def temperature_grid(self):
+        return self.planes[1]
+
+
+class ArrayWorld:
+    def __init__(self, width, height, kernels='vector', seed=None):
+        self.kernels = kernels
+        self.tick = 0
+        self.random = WorldRandom(seed)
+        self.profiler = None
+        self.allocate(width, height)
+
+    def allocate(self, width, height):
+        self.width = width
+        self.height = height
+        self.material = np.zeros((height, width), dtype=np.uint8)
+        self.temperature = np.full((height, width), AMBIENT_TEMPERATURE, dtype=np.float32)
+        self.life = np.full((height, width), -1, dtype=np.int16)
+        self.vx = np.zeros((height, width), dtype=np.float32)
+        self.vy = np.zeros((height, width), dtype=np.float32)
+        # scheduled plants do nothing between events, so their chunks may sleep
+        self.chunks = ChunkTracker(width, height, restless=tuple(m for m in RESTLESS if m not in SCHEDULED))
+        self.schedule = Schedule((height, width))
+
+    def planes(self):
+        return self.material, self.temperature, self.life, self.vx, self.vy
+
+    def add_particle(self, x, y, particle_type):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            if self.material[y, x] == EMPTY:
+                cell_rules.spawn(self.planes(), x, y, material_id(particle_type))
+                self.chunks.wake(x, y)
+
+    def set_temperature(self, x, y, temperature):
+        if 0 <= x < self.width and 0 <= y < self.height and self.material[y, x] != EMPTY:
+            self.temperature[y, x] = temperature
+            self.chunks.wake(x, y)
+
+    def erase(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            cell_rules.clear(self.planes(), x, y)
+            self.chunks.wake(x, y)
+
+    def paint(self, cells, particle_type=None, mode=brush.FILL):
+        self.chunks.wake_cells(*paint_cells(self.planes(), *cells, particle_type, mode))
+
+    def material_grid(self):
+        return self.material
+
+    def temperature_grid(self):
+        return self.temperature
+
+    def viewport(self, x0, y0, x1, y1):
+        y0, y1, x0, x1 = max(y0, 0), min(y1, self.height), max(x0, 0), min(x1, self.width)
+        return Viewport((self.material[y0:y1, x0:x1], self.temperature[y0:y1, x0:x1]))
+
+    def particle_count(self):
+        return int(np.count_nonzero(self.material))
+
+    def update(self):
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin(self.tick)
+        updates = []
+        found = []
+        for region in self.chunks.regions():
+            y0, y1, x0, x1 = region
+            window = tuple(np.ascontiguousarray(p[y0:y1, x0:x1]) for p in self.planes())
+            before = tuple(p.copy() for p in window[:3])
+            moved = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+            if profiler is None:
+                self.step(window, moved)
+            else:
+                self.profiled_step(window, moved, profiler)
+            for plane, updated in zip(self.planes(), window):
+                plane[y0:y1, x0:x1] = updated
+            updates.append((region, before, window))
+            # painted, loaded or grown plants that have no event yet
+            ys, xs = np.nonzero((window[0] == PLANT) & ~self.schedule.pending[y0:y1, x0:x1])
+            found.append((ys + y0) * self.width + xs + x0)
+        with phase(profiler, 'events'):
+            grown = self.grow_plants(found)
+        if profiler is not None:
+            profiler.current.counts['created'] += len(grown)
+            population = np.count_nonzero(self.material)
+        # One pass over the whole grid so blasts are not clipped at region edges.
+        with phase(profiler, 'explosions'):
+            burn = explosions.step(self.planes(), rng=self.random)
+        with phase(profiler, 'chunks'):
+            self.chunks.settle(updates)
+            if burn is not None:
+                self.chunks.wake_mask(burn)
+            if len(grown):
+                self.chunks.wake_cells(*np.divmod(grown, self.width))
+        if profiler is not None:
+            profiler.current.population(population, np.count_nonzero(self.material))
+            profiler.end()
+        self.tick += 1
+
+    def grow_plants(self, found=()):
+        due = self.schedule.due(self.tick)
+        due = due[self.material.reshape(-1)[due] == PLANT]
+        grown = cell_rules.grow_plants(self.planes(), due, self.random)
+        self.schedule.add(self.tick, np.concatenate([due, grown] + list(found)), self.random)
+        return grown
+
+    def reschedule(self):
+        self.schedule.clear()
+        self.schedule.add(self.tick, np.flatnonzero(self.material == PLANT), self.random)
+
+    def step(self, planes, moved):
+        apply_rules(planes, moved, self.kernels, self.random, SCHEDULED)
+        thermal.step(planes)
+
+    def profiled_step(self, planes, moved, profiler):
+        # Same work as step, but timed per kernel. The array backend has no
+        # particle identity, so created/destroyed are net per kernel.
+        stats = profiler.current
+        m = planes[0]
+        population = np.count_nonzero(m)
+        stats.counts['updated'] += population
+        with profiler.phase('rules'):
+            if self.kernels == 'vector':
+                with profiler.rule('movement'):
+                    movement.step(planes, moved, self.random)
+                stats.counts['moved'] += int(np.count_nonzero(moved))
+                population, previous = np.count_nonzero(m), population
+                stats.population(previous, population)
+                with profiler.rule('reactions'):
+                    cell_rules.step(planes, moved, only=REACTIVE, rng=self.random, skip=SCHEDULED)
+            else:
+                with profiler.rule('cells'):
+                    cell_rules.step(planes, moved, rng=self.random, skip=SCHEDULED)
+        population, previous = np.count_nonzero(m), population
+        stats.population(previous, population)
+        with profiler.phase('temperature'):
+            thermal.step(planes)
+        stats.population(population, np.count_nonzero(m))
+
+    def save(self, filename):
+        if savefile.is_json_name(filename):
+            self.save_json(filename)
+        else:
+            savefile.write(filename, *self.snapshot())
+
+    def snapshot(self):
+        # copies, so the arrays can be encoded off the simulation thread while it runs on
+        meta = {'tick': self.tick, 'random': self.random.snapshot(), 'chunks': self.chunks.snapshot()}
+        planes = dict(zip(savefile.PLANE_NAMES, (p.copy() for p in self.planes())))
+        planes['event'] = self.schedule.snapshot()
+        return planes, meta
+
+    def load(self, filename):
+        if not savefile.is_binary(filename):
+            self.load_json(filename)
+            return
+        header, planes = savefile.read(filename)
+        if 'sparse' in header:
+            raise savefile.SaveFormatError("sparse save file; load it with SparseWorld")
+        self.restore(planes, header)
+
+    def restore(self, planes, meta):
+        height, width = planes['material'].shape
+        if (width, height) != (self.width, self.height):
+            self.allocate(width, height)
+        for name, plane in zip(savefile.PLANE_NAMES, self.planes()):
+            plane[...] = planes[name]
+        self.tick = meta.get('tick', 0)
+        if 'random' in meta:
+            self.random.restore(meta['random'])
+        if 'chunks' in meta:
+            self.chunks.restore(meta['chunks'])
+        else:
+            self.chunks.wake_all()
+        if 'event' in planes:
+            self.schedule.restore(planes['event'])
+        else:
+            self.reschedule()
+
+    def save_json(self, filename):
+        ys, xs = np.nonzero(self.material)
+        data = [
+            {
+                'x': x, 'y': y, 'type': material_name(self.material[y, x]),
+                'temperature': float(self.temperature[y, x]),
+                'life': int(self.life[y, x]),
+                'velocity': [float(self.vx[y, x]), float(self.vy[y, x])]
+            }
+            for y, x in zip(ys.tolist(), xs.tolist())
+        ]
+        with open(filename, 'w') as f:
+            json.dump(data, f)
+
+    def load_json(self, filename):
+        with open(filename, 'r') as f:
+            data = json.load(f)
+        self.clear()
+        for item in data:
+            x, y = item['x'], item['y']
+            self.material[y, x] = material_id(item['type'])
+            self.temperature[y, x] = item['temperature']
+            self.life[y, x] = item['life']
+            self.vx[y, x], self.vy[y, x] = item.get('velocity', [0.0, 0.0])
+        self.reschedule()
+
+    def clear(self):
+        self.material.fill(EMPTY)
+        self.temperature.fill(AMBIENT_TEMPERATURE)
+        self.life.fill(-1)
+        self.vx.fill(0.0)
+        self.vy.fill(0.0)
+        self.chunks.wake_all()
+        self.schedule.clear()
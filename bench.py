@@ -0,0 +1,163 @@
+import json
+import platform
+import time
+import tracemalloc
+import numpy as np
+from util import parse_size
+
+SIZES = [(200, 150), (512, 512), (1024, 1024)]
+
+
+def fill(world, x0, y0, x1, y1, particle_type, step=1):
+    for y in range(max(y0, 0), min(y1, world.height), step):
+        for x in range(max(x0, 0), min(x1, world.width), step):
+            world.add_particle(x, y, particle_type)
+
+
+def heat(world, x0, y0, x1, y1, temperature):
+    for y in range(max(y0, 0), min(y1, world.height)):
+        for x in range(max(x0, 0), min(x1, world.width)):
+            world.set_temperature(x, y, temperature)
+
+
+def rock_floor(world, thickness=2):
+    fill(world, 0, world.height - thickness, world.width, world.height, 'rock')
+
+
+def sand_avalanche(world):
+    w, h = world.width, world.height
+    rock_floor(world)
+    fill(world, w // 4, 0, 3 * w // 4, h // 3, 'sand')
+
+
+def water_flood(world):
+    w, h = world.width, world.height
+    rock_floor(world)
+    fill(world, w // 8, h // 2, w // 8 + 2, h, 'rock')
+    fill(world, 7 * w // 8 - 2, h // 2, 7 * w // 8, h, 'rock')
+    fill(world, 3 * w // 8, 0, 5 * w // 8, h // 4, 'water')
+
+
+def fire_wood(world):
+    w, h = world.width, world.height
+    fill(world, w // 4, h // 4, 3 * w // 4, 3 * h // 4, 'wood')
+    fill(world, w // 4 - 1, h // 4, w // 4, 3 * h // 4, 'fire')
+
+
+def plant_overgrowth(world):
+    w, h = world.width, world.height
+    rock_floor(world)
+    fill(world, 0, h - 3, w, h - 2, 'plant', step=8)
+
+
+def explosive_chain(world):
+    w, h = world.width, world.height
+    rock_floor(world)
+    fill(world, 3, h // 2 + 1, w, h // 2 + 2, 'explosive', step=6)
+    fill(world, 0, h // 2, w, h // 2 + 4, 'wood')
+
+
+def boiling(world):
+    w, h = world.width, world.height
+    fill(world, 0, h - 8, w, h, 'rock')
+    heat(world, 0, h - 8, w, h, 400)
+    fill(world, 0, h // 2, w, h - 8, 'water')
+
+
+SCENARIOS = {
+    'sand_avalanche': sand_avalanche,
+    'water_flood': water_flood,
+    'fire_wood': fire_wood,
+    'plant_overgrowth': plant_overgrowth,
+    'explosive_chain': explosive_chain,
+    'boiling': boiling,
+}
+
+
+def build(world_class, scenario, width, height, seed):
+    world = world_class(width, height, seed=seed)
+    SCENARIOS[scenario](world)
+    return world
+
+
+def peak_memory(world_class, scenario, width, height, seed, ticks):
+    tracemalloc.start()
+    try:
+        world = build(world_class, scenario, width, height, seed)
+        for _ in range(ticks):
+            world.update()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_scenario(world_class, scenario, width, height, ticks, seed=0, memory_ticks=10):
+    world = build(world_class, scenario, width, height, seed)
+    latencies = np.empty(ticks)
+    for tick in range(ticks):
+        start = time.perf_counter()
+        world.update()
+        latencies[tick] = time.perf_counter() - start
+    total = latencies.sum()
+    return {
+        'scenario': scenario,
+        'size': f"{width}x{height}",
+        'ticks': ticks,
+        'seed': seed,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p90_ms': float(np.percentile(latencies, 90) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'mean_ms': float(latencies.mean() * 1000),
+        'ticks_per_sec': float(ticks / total) if total > 0 else float('inf'),
+        'peak_mb': peak_memory(world_class, scenario, width, height, seed, min(ticks, memory_ticks)) / 2**20,
+        'particles': world.particle_count(),
+    }
+
+
+def run_suite(world_class, backend, scenarios, sizes, ticks, seed=0, log=print):
+    results = []
+    for width, height in sizes:
+        for scenario in scenarios:
+            result = run_scenario(world_class, scenario, width, height, ticks, seed)
+            log(format_result(result))
+            results.append(result)
+    return {
+        'meta': {
+            'backend': backend,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def format_result(result):
+    return (f"{result['scenario']:<18} {result['size']:>10} p50 {result['p50_ms']:8.2f}ms "
+            f"p90 {result['p90_ms']:8.2f}ms p99 {result['p99_ms']:8.2f}ms "
+            f"{result['ticks_per_sec']:8.1f} ticks/s {result['peak_mb']:7.1f}MB")
+
+
+def compare(baseline, candidate):
+    old = {(r['scenario'], r['size']): r for r in baseline['results']}
+    lines = []
+    for result in candidate['results']:
+        key = (result['scenario'], result['size'])
+        if key not in old:
+            continue
+        before = old[key]
+        speedup = result['ticks_per_sec'] / before['ticks_per_sec'] if before['ticks_per_sec'] else float('inf')
+        lines.append(f"{key[0]:<18} {key[1]:>10} p50 {before['p50_ms']:8.2f} -> {result['p50_ms']:8.2f}ms "
+                     f"{speedup:6.2f}x ticks/s, mem {before['peak_mb']:.1f} -> {result['peak_mb']:.1f}MB")
+    return lines
+
+
+def save_results(results, filename):
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(filename):
+    with open(filename, 'r') as f:
+        return json.load(f)
@@ -0,0 +1,107 @@
+import numpy as np
+from explosions import disc
+
+FILL = 'fill'
+REPLACE = 'replace'
+ERASE = 'erase'
+MODES = (FILL, REPLACE, ERASE)
+
+
+def clip(ys, xs, width, height):
+    keep = (ys >= 0) & (ys < height) & (xs >= 0) & (xs < width)
+    return ys[keep], xs[keep]
+
+
+def circle(x, y, radius, width, height):
+    dy, dx = disc(radius)
+    return clip(dy + y, dx + x, width, height)
+
+
+def line_points(x0, y0, x1, y1):
+    steps = max(abs(x1 - x0), abs(y1 - y0)) + 1
+    xs = np.rint(np.linspace(x0, x1, steps)).astype(np.intp)
+    ys = np.rint(np.linspace(y0, y1, steps)).astype(np.intp)
+    return xs, ys
+
+
+def line(x0, y0, x1, y1, radius, width, height):
+    # Stamp into a mask over the stroke's bounding box so overlapping discs
+    # collapse to one cell each without sorting.
+    xs, ys = line_points(x0, y0, x1, y1)
+    top, left = max(min(y0, y1) - radius, 0), max(min(x0, x1) - radius, 0)
+    bottom, right = min(max(y0, y1) + radius + 1, height), min(max(x0, x1) + radius + 1, width)
+    if top >= bottom or left >= right:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    mask = np.zeros((bottom - top, right - left), dtype=bool)
+    dy, dx = disc(radius)
+    ys, xs = clip((ys[:, None] + dy).ravel() - top, (xs[:, None] + dx).ravel() - left, *mask.shape[::-1])
+    mask[ys, xs] = True
+    ys, xs = np.nonzero(mask)
+    return ys + top, xs + left
+
+
+def rect(x0, y0, x1, y1, width, height):
+    x0, x1 = sorted((x0, x1))
+    y0, y1 = sorted((y0, y1))
+    ys, xs = np.mgrid[max(y0, 0):min(y1 + 1, height), max(x0, 0):min(x1 + 1, width)]
+    return ys.ravel(), xs.ravel()
+
+
+def flood(material, x, y):
+    height, width = material.shape
+    if not (0 <= x < width and 0 <= y < height):
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    same = material == material[y, x]
+    filled = np.zeros_like(same)
+    stack = [(y, x)]
+    while stack:
+        y, x = stack.pop()
+        if filled[y, x]:
+            continue
+        # Fill the whole run of matching cells on this row, then seed one cell
+        # per matching run in the rows above and below.
+        row = same[y]
+        left = np.flatnonzero(~row[:x])
+        right = np.flatnonzero(~row[x:])
+        x0 = left[-1] + 1 if len(left) else 0
+        x1 = x + right[0] if len(right) else width
+        filled[y, x0:x1] = True
+        for ny in (y - 1, y + 1):
+            if 0 <= ny < height:
+                open_cells = same[ny, x0:x1] & ~filled[ny, x0:x1]
+                starts = np.flatnonzero(open_cells & ~np.concatenate(([False], open_cells[:-1])))
+                stack.extend((ny, x0 + s) for s in starts.tolist())
+    return np.nonzero(filled)
+
+
+class Stroke:
+    def __init__(self):
+        self.last = None
+
+    def to(self, x, y, radius, width, height):
+        x0, y0 = self.last or (x, y)
+        self.last = (x, y)
+        return line(x0, y0, x, y, radius, width, height)
+
+    def lift(self):
+        self.last = None
+
+
+def parse(spec, width, height, material=None):
+    # shape:numbers:type[:mode], e.g. disc:100,20,5:sand or rect:0,140,199,149:rock:replace
+    parts = spec.split(':')
+    shape, numbers, particle_type = parts[0], [int(v) for v in parts[1].split(',')], parts[2]
+    mode = parts[3] if len(parts) > 3 else (ERASE if particle_type == 'erase' else FILL)
+    if shape == 'disc':
+        cells = circle(*numbers, width, height)
+    elif shape == 'line':
+        cells = line(*numbers, width, height)
+    elif shape == 'rect':
+        cells = rect(*numbers, width, height)
+    elif shape == 'flood':
+        cells = flood(material, *numbers)
+    else:
+        raise ValueError(f"unknown brush shape {shape!r}")
+    if mode not in MODES:
+        raise ValueError(f"unknown paint mode {mode!r}")
+    return cells, particle_type, mode
@@ -0,0 +1,288 @@
+import numpy as np
+import jit
+from rng import CELL_DRAWS
+from events import GROWTH_CHANCE
+from jit import kernel
+import materials
+from materials import (EMPTY, SAND, WATER, FIRE, SMOKE, STEAM, PLANT, AMBIENT_TEMPERATURE,
+                       NONE, DETONATE, SINKS, PHASE_TEMPERATURE, PHASE_ABOVE, PHASE_BELOW,
+                       SELF_PRODUCT, NEIGHBOUR_PRODUCT, DISPERSION)
+
+# float32 so compiled and interpreted rules round velocities the same way
+GRAVITY = np.float32(0.1)
+DAMPING = np.float32(0.9)
+
+initial_life = kernel(materials.initial_life)
+
+
+@kernel
+def spawn(planes, x, y, material):
+    m, t, life, vx, vy = planes
+    m[y, x] = material
+    t[y, x] = AMBIENT_TEMPERATURE
+    life[y, x] = initial_life(material)
+    vx[y, x] = 0.0
+    vy[y, x] = 0.0
+
+
+@kernel
+def transform(planes, x, y, material):
+    m, t, life, vx, vy = planes
+    m[y, x] = material
+    life[y, x] = initial_life(material)
+    vx[y, x] = 0.0
+    vy[y, x] = 0.0
+
+
+@kernel
+def clear(planes, x, y):
+    m, t, life, vx, vy = planes
+    m[y, x] = EMPTY
+    t[y, x] = AMBIENT_TEMPERATURE
+    life[y, x] = -1
+    vx[y, x] = 0.0
+    vy[y, x] = 0.0
+
+
+@kernel
+def swap(planes, x0, y0, x1, y1):
+    m, t, life, vx, vy = planes
+    m[y0, x0], m[y1, x1] = m[y1, x1], m[y0, x0]
+    t[y0, x0], t[y1, x1] = t[y1, x1], t[y0, x0]
+    life[y0, x0], life[y1, x1] = life[y1, x1], life[y0, x0]
+    vx[y0, x0], vx[y1, x1] = vx[y1, x1], vx[y0, x0]
+    vy[y0, x0], vy[y1, x1] = vy[y1, x1], vy[y0, x0]
+
+
+@kernel
+def change_phase(planes, x, y):
+    m, t = planes[0], planes[1]
+    material = m[y, x]
+    if t[y, x] >= PHASE_TEMPERATURE[material]:
+        product = PHASE_ABOVE[material]
+    else:
+        product = PHASE_BELOW[material]
+    if product == NONE:
+        return False
+    transform(planes, x, y, product)
+    return True
+
+
+@kernel
+def _sign(u):
+    return -1 if u < 0.5 else 1
+
+
+@kernel
+def update_sand(planes, x, y, u):
+    m = planes[0]
+    height, width = m.shape
+    if y + 1 < height:
+        if SINKS[m[y, x], m[y + 1, x]]:
+            swap(planes, x, y, x, y + 1)
+            return x, y + 1
+        for dx in (-1, 1):
+            if 0 <= x + dx < width and m[y + 1, x + dx] == EMPTY:
+                swap(planes, x, y, x + dx, y + 1)
+                return x + dx, y + 1
+    return x, y
+
+
+@kernel
+def slide_reach(m, x, y, dx, rate):
+    # Cells a liquid can slide along its row: up to rate, stopping on the first
+    # empty cell it could fall from.
+    height, width = m.shape
+    reach = 0
+    while reach < rate:
+        nx = x + dx * (reach + 1)
+        if nx < 0 or nx >= width or m[y, nx] != EMPTY:
+            break
+        reach += 1
+        if y + 1 < height and m[y + 1, nx] == EMPTY:
+            break
+    return reach
+
+
+@kernel
+def update_water(planes, x, y, u):
+    m, t, life, vx, vy = planes
+    height, width = m.shape
+    if change_phase(planes, x, y):
+        return x, y
+
+    vy[y, x] += GRAVITY
+    new_y = y + int(vy[y, x])
+
+    if new_y != y and new_y < height and m[new_y, x] == EMPTY:
+        swap(planes, x, y, x, new_y)
+        y = new_y
+    else:
+        moved = False
+        dx = _sign(u[0])
+        for _ in range(2):
+            nx, ny = x + dx, y + 1
+            if 0 <= nx < width and ny < height and m[ny, nx] == EMPTY:
+                swap(planes, x, y, nx, ny)
+                x, y = nx, ny
+                moved = True
+                break
+            dx = -dx
+
+        if not moved:
+            dx = _sign(u[1])
+            for _ in range(2):
+                reach = slide_reach(m, x, y, dx, DISPERSION[m[y, x]])
+                if reach:
+                    swap(planes, x, y, x + dx * reach, y)
+                    x += dx * reach
+                    break
+                dx = -dx
+            vy[y, x] = 0.0
+
+    vx[y, x] *= DAMPING
+    vy[y, x] *= DAMPING
+    return x, y
+
+
+@kernel
+def update_fire(planes, x, y, u):
+    m, t, life, vx, vy = planes
+    height, width = m.shape
+    life[y, x] -= 1
+    if life[y, x] <= 0:
+        spawn(planes, x, y, SMOKE)
+        return x, y
+
+    actor = m[y, x]
+    for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+        nx, ny = x + dx, y + dy
+        if 0 <= nx < width and 0 <= ny < height:
+            neighbour = m[ny, nx]
+            product = NEIGHBOUR_PRODUCT[actor, neighbour]
+            if product == DETONATE:
+                life[ny, nx] = 0
+            elif product != NONE:
+                spawn(planes, nx, ny, product)
+            product = SELF_PRODUCT[actor, neighbour]
+            if product != NONE:
+                spawn(planes, x, y, product)
+                return x, y
+
+    if u[0] < 0.1 and y > 0 and m[y - 1, x] == EMPTY:
+        spawn(planes, x, y - 1, SMOKE)
+    return x, y
+
+
+@kernel
+def _rise(planes, x, y, u):
+    m = planes[0]
+    width = m.shape[1]
+    if y > 0 and u[0] < 0.8:
+        side = _sign(u[1])
+        first = min(int(u[2] * 3), 2)
+        for i in range(3):
+            dx = (0, side, -side)[(first + i) % 3]
+            nx, ny = x + dx, y - 1
+            if 0 <= nx < width and m[ny, nx] == EMPTY:
+                swap(planes, x, y, nx, ny)
+                return nx, ny
+    elif u[3] < 0.05:
+        clear(planes, x, y)
+    return x, y
+
+
+@kernel
+def update_smoke(planes, x, y, u):
+    return _rise(planes, x, y, u)
+
+
+@kernel
+def update_steam(planes, x, y, u):
+    if change_phase(planes, x, y):
+        return x, y
+    return _rise(planes, x, y, u)
+
+
+@kernel
+def grow(planes, x, y, u):
+    # returns the flat index of the new plant, or -1
+    m = planes[0]
+    height, width = m.shape
+    first = min(int(u[1] * 4), 3)
+    for i in range(4):
+        dx, dy = ((-1, 0), (1, 0), (0, -1), (0, 1))[(first + i) % 4]
+        nx, ny = x + dx, y + dy
+        if 0 <= nx < width and 0 <= ny < height:
+            if m[ny, nx] == EMPTY and u[2 + i] < 0.2:
+                spawn(planes, nx, ny, PLANT)
+                return ny * width + nx
+    return -1
+
+
+@kernel
+def update_plant(planes, x, y, u):
+    if u[0] < GROWTH_CHANCE:
+        grow(planes, x, y, u)
+    return x, y
+
+
+@kernel
+def update_cell(planes, x, y, u):
+    material = planes[0][y, x]
+    if material == SAND:
+        return update_sand(planes, x, y, u)
+    if material == WATER:
+        return update_water(planes, x, y, u)
+    if material == FIRE:
+        return update_fire(planes, x, y, u)
+    if material == SMOKE:
+        return update_smoke(planes, x, y, u)
+    if material == STEAM:
+        return update_steam(planes, x, y, u)
+    if material == PLANT:
+        return update_plant(planes, x, y, u)
+    return x, y
+
+
+@kernel
+def update_cells(planes, moved, ys, xs, draws):
+    m = planes[0]
+    for i in range(len(ys)):
+        y, x = ys[i], xs[i]
+        if m[y, x] == EMPTY or moved[y, x]:
+            continue
+        nx, ny = update_cell(planes, x, y, draws[i])
+        moved[ny, nx] = True
+
+
+@kernel
+def grow_cells(planes, ys, xs, draws, spawned):
+    m = planes[0]
+    for i in range(len(ys)):
+        spawned[i] = grow(planes, xs[i], ys[i], draws[i]) if m[ys[i], xs[i]] == PLANT else -1
+
+
+def grow_plants(planes, cells, rng=None):
+    # Fires scheduled growth for the plants among cells and returns the new plants.
+    m = planes[0]
+    ys, xs = np.divmod(cells, m.shape[1])
+    draws = (rng or np.random).random((len(ys), CELL_DRAWS))
+    spawned = np.full(len(ys), -1, dtype=np.intp)
+    if not jit.ENABLED:
+        ys, xs, draws = ys.tolist(), xs.tolist(), draws.tolist()
+    grow_cells(planes, ys, xs, draws, spawned)
+    return spawned[spawned >= 0]
+
+
+def step(planes, moved, only=None, rng=None, skip=()):
+    m = planes[0]
+    active = m if only is None else np.isin(m, only)
+    if skip:
+        active = (active != 0) & ~np.isin(m, skip)
+    ys, xs = np.nonzero(active[::-1])
+    ys = m.shape[0] - 1 - ys
+    draws = (rng or np.random).random((len(ys), CELL_DRAWS))
+    if not jit.ENABLED:
+        ys, xs, draws = ys.tolist(), xs.tolist(), draws.tolist()
+    update_cells(planes, moved, ys, xs, draws)
@@ -0,0 +1,100 @@
+import glob
+import os
+import queue
+import threading
+import savefile
+
+KEEP = 3
+QUEUE_SIZE = 2
+
+
+def checkpoint_path(directory, tick):
+    return os.path.join(directory, f"tick_{tick:08d}.pxz")
+
+
+class Checkpointer:
+    # Saves are copied out of the world at a tick boundary, which costs a few
+    # memcpys, and compressed and written by a background thread. Periodic
+    # checkpoints go to directory and only the newest keep of them are kept
+    # (keep=0 keeps them all). A lossy checkpointer skips a periodic
+    # checkpoint when the writer is behind instead of stalling the tick.
+    def __init__(self, world, directory=None, every=0, keep=KEEP, lossy=True):
+        self.world = world
+        self.directory = directory
+        self.every = every
+        self.keep = keep
+        self.lossy = lossy
+        self.skipped = 0
+        self.error = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.writer = threading.Thread(target=self._drain, name='checkpoint', daemon=True)
+        self.writer.start()
+
+    def _drain(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    break
+                filename, planes, meta, rotate = item
+                savefile.write(filename, planes, meta)
+                if rotate:
+                    self._rotate()
+            except Exception as error:
+                self.error = error
+            finally:
+                self.queue.task_done()
+
+    def _rotate(self):
+        if self.keep:
+            for old in sorted(glob.glob(os.path.join(self.directory, 'tick_*.pxz')))[:-self.keep]:
+                os.remove(old)
+
+    def _check(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError("background save failed") from error
+
+    def save(self, filename):
+        # Must be called on the thread that steps the world, between ticks.
+        self._check()
+        if savefile.is_json_name(filename):
+            self.flush()
+            self.world.save(filename)
+            return
+        self.queue.put((filename, *self.world.snapshot(), False))
+
+    def checkpoint(self):
+        self._check()
+        if self.lossy and self.queue.full():
+            self.skipped += 1
+            return None
+        filename = checkpoint_path(self.directory, self.world.tick)
+        self.queue.put((filename, *self.world.snapshot(), True))
+        return filename
+
+    def step(self):
+        if self.every and self.directory and self.world.tick % self.every == 0:
+            self.checkpoint()
+
+    def latest(self):
+        found = sorted(glob.glob(os.path.join(self.directory, 'tick_*.pxz'))) if self.directory else []
+        return found[-1] if found else None
+
+    def flush(self):
+        self.queue.join()
+        self._check()
+
+    def close(self):
+        if self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,75 @@
+import numpy as np
+from materials import FIRE, SMOKE, STEAM, PLANT, EXPLOSIVE
+
+CHUNK_SIZE = 16
+RESTLESS = (FIRE, SMOKE, STEAM, PLANT, EXPLOSIVE)
+TEMPERATURE_EPSILON = 0.5
+
+
+def runs(flags):
+    edges = np.diff(np.concatenate(([0], flags.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist()))
+
+
+def dilate(chunks):
+    padded = np.pad(chunks, 1)
+    out = np.zeros_like(chunks)
+    for dy in range(3):
+        for dx in range(3):
+            out |= padded[dy:dy + chunks.shape[0], dx:dx + chunks.shape[1]]
+    return out
+
+
+class ChunkTracker:
+    def __init__(self, width, height, size=CHUNK_SIZE, restless=RESTLESS):
+        self.width = width
+        self.height = height
+        self.size = size
+        self.restless = restless
+        self.awake = np.ones((-(-height // size), -(-width // size)), dtype=bool)
+
+    def wake(self, x, y):
+        cy, cx = y // self.size, x // self.size
+        self.awake[max(cy - 1, 0):cy + 2, max(cx - 1, 0):cx + 2] = True
+
+    def wake_mask(self, mask):
+        self.wake_cells(*np.nonzero(mask))
+
+    def wake_cells(self, ys, xs):
+        chunks = np.zeros_like(self.awake)
+        chunks[ys // self.size, xs // self.size] = True
+        self.awake |= dilate(chunks)
+
+    def wake_all(self):
+        self.awake.fill(True)
+
+    def snapshot(self):
+        return np.packbits(self.awake).tobytes().hex()
+
+    def restore(self, snapshot):
+        bits = np.unpackbits(np.frombuffer(bytes.fromhex(snapshot), dtype=np.uint8))
+        self.awake = bits[:self.awake.size].reshape(self.awake.shape).astype(bool)
+
+    def awake_count(self):
+        return int(np.count_nonzero(self.awake))
+
+    def regions(self, margin=2):
+        size = self.size
+        regions = []
+        for r0, r1 in runs(self.awake.any(axis=1)):
+            for c0, c1 in runs(self.awake[r0:r1].any(axis=0)):
+                regions.append((max(r0 * size - margin, 0), min(r1 * size + margin, self.height),
+                                max(c0 * size - margin, 0), min(c1 * size + margin, self.width)))
+        return regions
+
+    def settle(self, updates):
+        chunks = np.zeros_like(self.awake)
+        for region, before, after in updates:
+            y0, y1, x0, x1 = region
+            changed = (before[0] != after[0]) | (before[2] != after[2])
+            changed |= np.abs(before[1] - after[1]) > TEMPERATURE_EPSILON
+            for material in self.restless:
+                changed |= after[0] == material
+            ys, xs = np.nonzero(changed)
+            chunks[(ys + y0) // self.size, (xs + x0) // self.size] = True
+        self.awake = dilate(chunks)
@@ -0,0 +1,254 @@
+import csv
+import functools
+import itertools
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+import numpy as np
+import cell_rules
+import events
+import materials
+import movement
+import particle
+import savefile
+from world import World
+from array_world import ArrayWorld
+from rng import WorldRandom
+from materials import FIRE, EXPLOSIVE, MATERIAL_NAMES
+
+BACKENDS = {
+    'object': World,
+    'array': ArrayWorld,
+    'cell': functools.partial(ArrayWorld, kernels='cell'),
+}
+
+
+def set_fire_life(value):
+    materials.LIFETIME[FIRE] = int(value)
+
+
+def set_blast_radius(value):
+    materials.BLAST_RADIUS[EXPLOSIVE] = int(value)
+
+
+def set_growth_chance(value):
+    events.GROWTH_CHANCE = float(value)
+    cell_rules.GROWTH_CHANCE = float(value)
+
+
+def set_water_damping(value):
+    movement.LIQUID_DAMPING = float(value)
+    particle.WATER_DAMPING = float(value)
+    cell_rules.DAMPING = np.float32(value)
+
+
+# name: (setter, backends whose compiled kernels bake the value in)
+PARAMETERS = {
+    'fire_life': (set_fire_life, ('array', 'cell')),
+    'blast_radius': (set_blast_radius, ()),
+    'growth_chance': (set_growth_chance, ()),
+    'water_damping': (set_water_damping, ('cell',)),
+}
+
+
+def parse_parameter(spec):
+    # name=v1,v2,... e.g. fire_life=50,100,200
+    name, values = spec.split('=', 1)
+    if name not in PARAMETERS:
+        raise ValueError(f"unknown parameter {name!r}; choose from {', '.join(PARAMETERS)}")
+    return name, [float(v) for v in values.split(',')]
+
+
+def variants(grid, seeds):
+    names = [name for name, _ in grid]
+    for values in itertools.product(*(values for _, values in grid)):
+        for seed in seeds:
+            yield dict(zip(names, values)), seed
+
+
+class MaterialCounts:
+    def observe(self, tick, material):
+        self.counts = np.bincount(material.ravel(), minlength=len(MATERIAL_NAMES))
+
+    def sample(self):
+        return {f"count.{name}": int(self.counts[i]) for i, name in enumerate(MATERIAL_NAMES) if i}
+
+    def summary(self):
+        return self.sample()
+
+
+class BurnedArea:
+    # cells that have been on fire at any tick so far
+    def __init__(self):
+        self.burned = None
+
+    def observe(self, tick, material):
+        fire = material == FIRE
+        self.burned = fire if self.burned is None else self.burned | fire
+
+    def sample(self):
+        return {'burned': int(np.count_nonzero(self.burned))}
+
+    def summary(self):
+        return self.sample()
+
+
+class SettleTime:
+    # the tick after the last one that changed any cell, or NaN if the world
+    # was still changing when the run ended
+    def __init__(self):
+        self.previous = None
+        self.changed = 0
+        self.last_change = -1
+        self.tick = 0
+
+    def observe(self, tick, material):
+        self.changed = 0 if self.previous is None else int(np.count_nonzero(material != self.previous))
+        if self.changed:
+            self.last_change = tick
+        self.previous = material.copy()
+        self.tick = tick
+
+    def sample(self):
+        return {'changed': self.changed}
+
+    def summary(self):
+        return {'settle_tick': float(self.last_change + 1) if self.last_change < self.tick else float('nan')}
+
+
+METRICS = {
+    'counts': MaterialCounts,
+    'burned': BurnedArea,
+    'settle': SettleTime,
+}
+
+# The base scene, attached once per worker from shared memory.
+_base = None
+
+
+def _attach(name, layout, meta):
+    global _base
+    memory = shared_memory.SharedMemory(name=name)
+    planes, offset = {}, 0
+    for plane, dtype, shape in layout:
+        planes[plane] = np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=offset)
+        offset += planes[plane].nbytes
+    _base = (memory, planes, meta)
+
+
+def run_variant(task):
+    index, backend, params, seed, ticks, every, metric_names = task
+    for name, value in params.items():
+        PARAMETERS[name][0](value)
+    _, planes, meta = _base
+    height, width = planes['material'].shape
+    world = BACKENDS[backend](width, height, seed=seed)
+    # restore copies out of the shared planes, which stay untouched for the next variant
+    world.restore(planes, meta)
+    world.random = WorldRandom(seed)
+    # the base scene's plant events were drawn from its own generator
+    world.reschedule()
+    metrics = [METRICS[name]() for name in metric_names]
+
+    rows = []
+    for tick in range(1, ticks + 1):
+        world.update()
+        material = world.material_grid()
+        for metric in metrics:
+            metric.observe(tick, material)
+        if tick % every == 0 or tick == ticks:
+            row = {'tick': tick}
+            for metric in metrics:
+                row.update(metric.sample())
+            rows.append(row)
+    summary = {}
+    for metric in metrics:
+        summary.update(metric.summary())
+    return index, rows, summary
+
+
+def share(planes):
+    layout = [(name, planes[name].dtype.str, planes[name].shape) for name in savefile.PLANE_NAMES]
+    memory = shared_memory.SharedMemory(create=True, size=sum(planes[name].nbytes for name in savefile.PLANE_NAMES))
+    offset = 0
+    for name in savefile.PLANE_NAMES:
+        view = np.ndarray(planes[name].shape, dtype=planes[name].dtype, buffer=memory.buf, offset=offset)
+        view[...] = planes[name]
+        offset += view.nbytes
+        del view
+    return memory, layout
+
+
+def run(base, backend, grid, seeds, ticks, every=1, metric_names=tuple(METRICS), workers=None, progress=None):
+    # base is a world snapshot (planes, meta). Each variant restores it into a
+    # fresh world in a worker process and returns its sampled rows and summary.
+    planes, meta = base
+    tasks = [(i, backend, params, seed, ticks, every, metric_names)
+             for i, (params, seed) in enumerate(variants(grid, seeds))]
+    # Values that compiled kernels bake in can only be swept by interpreted workers,
+    # which need a fresh interpreter to pick up the setting.
+    interpreted = any(backend in PARAMETERS[name][1] for name, _ in grid)
+    memory, layout = share(planes)
+    previous = os.environ.get('PIXELZ_NO_JIT')
+    try:
+        if interpreted:
+            os.environ['PIXELZ_NO_JIT'] = '1'
+        context = multiprocessing.get_context('spawn' if interpreted else None)
+        with context.Pool(workers or os.cpu_count(), initializer=_attach, initargs=(memory.name, layout, meta)) as pool:
+            if previous is None:
+                os.environ.pop('PIXELZ_NO_JIT', None)
+            else:
+                os.environ['PIXELZ_NO_JIT'] = previous
+            results = [None] * len(tasks)
+            for done, (index, rows, summary) in enumerate(pool.imap_unordered(run_variant, tasks), 1):
+                results[index] = (rows, summary)
+                if progress:
+                    progress(done, len(tasks))
+    finally:
+        memory.close()
+        memory.unlink()
+    return [(params, seed) for params, seed in variants(grid, seeds)], results
+
+
+def columns(variant_list, results, names):
+    # Flattens per-variant rows into one array per column.
+    per_tick, summary = {}, {}
+    for index, ((params, seed), (rows, totals)) in enumerate(zip(variant_list, results)):
+        head = dict({'variant': index, 'seed': seed}, **{name: params[name] for name in names})
+        for row in rows:
+            for key, value in dict(head, **row).items():
+                per_tick.setdefault(key, []).append(value)
+        for key, value in dict(head, **totals).items():
+            summary.setdefault(key, []).append(value)
+    return ({key: np.asarray(values) for key, values in per_tick.items()},
+            {key: np.asarray(values) for key, values in summary.items()})
+
+
+def aggregate(summary, names):
+    # mean and spread of each summary metric over seeds, per parameter combination
+    metrics = [key for key in summary if key not in ('variant', 'seed') and key not in names]
+    combos = np.stack([summary[name] for name in names], axis=1) if names else np.zeros((len(summary['seed']), 0))
+    keys, group = np.unique(combos, axis=0, return_inverse=True)
+    group = group.reshape(-1)
+    table = {name: keys[:, i] for i, name in enumerate(names)}
+    table['runs'] = np.bincount(group, minlength=len(keys))
+    for metric in metrics:
+        values = summary[metric].astype(float)
+        groups = [values[(group == g) & ~np.isnan(values)] for g in range(len(keys))]
+        table[f"{metric}.mean"] = np.array([v.mean() if len(v) else np.nan for v in groups])
+        table[f"{metric}.std"] = np.array([v.std() if len(v) else np.nan for v in groups])
+        if summary[metric].dtype.kind == 'f':
+            # runs without a value, e.g. ones that never settled, are left out of the mean
+            table[f"{metric}.missing"] = table['runs'] - np.array([len(v) for v in groups])
+    return table
+
+
+def save_columns(table, filename):
+    if filename.endswith('.csv'):
+        names = list(table)
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(names)
+            writer.writerows(zip(*(table[name].tolist() for name in names)))
+    else:
+        np.savez_compressed(filename, **table)
@@ -0,0 +1,62 @@
+import numpy as np
+
+# chance per tick that a plant tries to grow into a neighbouring cell
+GROWTH_CHANCE = 0.01
+
+
+class Schedule:
+    # Rare per-cell events, kept in buckets keyed by the tick they fire on.
+    # A cell with a 1% chance per tick gets one geometric wait instead of a
+    # dice roll every tick; since the wait is memoryless, an event is simply
+    # dropped if its cell no longer holds what scheduled it, and a new
+    # occupant of a still-pending cell inherits the event.
+    def __init__(self, shape, chance=None):
+        # looked up here rather than bound as a default, so it can be tuned at run time
+        self.chance = GROWTH_CHANCE if chance is None else chance
+        self.pending = np.zeros(shape, dtype=bool)
+        self.buckets = {}
+
+    def __len__(self):
+        return int(np.count_nonzero(self.pending))
+
+    def add(self, tick, cells, rng):
+        cells = np.unique(cells)
+        cells = cells[~self.pending.reshape(-1)[cells]]
+        if len(cells) == 0:
+            return
+        self.pending.reshape(-1)[cells] = True
+        self._file(tick + rng.geometric(self.chance, len(cells)), cells)
+
+    def _file(self, ticks, cells):
+        order = np.argsort(ticks, kind='stable')
+        ticks, cells = ticks[order], cells[order]
+        starts = np.flatnonzero(np.diff(ticks, prepend=-1))
+        for start, end in zip(starts.tolist(), starts[1:].tolist() + [len(cells)]):
+            self.buckets.setdefault(int(ticks[start]), []).append(cells[start:end])
+
+    def due(self, tick):
+        batches = self.buckets.pop(tick, None)
+        if not batches:
+            return np.empty(0, dtype=np.intp)
+        # in cell order, however the batches were filed, so a restored schedule fires the same way
+        cells = np.sort(np.concatenate(batches))
+        self.pending.reshape(-1)[cells] = False
+        return cells
+
+    def snapshot(self):
+        # the tick each pending cell fires on, -1 where nothing is pending
+        events = np.full(self.pending.shape, -1, dtype=np.int32)
+        for tick, batches in self.buckets.items():
+            for cells in batches:
+                events.reshape(-1)[cells] = tick
+        return events
+
+    def restore(self, events):
+        self.clear()
+        cells = np.flatnonzero(events.reshape(-1) >= 0)
+        self.pending.reshape(-1)[cells] = True
+        self._file(events.reshape(-1)[cells].astype(np.int64), cells)
+
+    def clear(self):
+        self.pending.fill(False)
+        self.buckets.clear()
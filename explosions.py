@@ -0,0 +1,79 @@
+import functools
+import numpy as np
+from materials import ROCK, FIRE, AMBIENT_TEMPERATURE, LIFETIME, BLAST_RADIUS, BLAST_STRENGTH
+from movement import is_kind
+
+BLAST_PROOF = (ROCK,)
+EXPLOSIVES = tuple(np.flatnonzero(BLAST_RADIUS > 0).tolist())
+MAX_RADIUS = int(BLAST_RADIUS.max())
+
+
+@functools.lru_cache(maxsize=None)
+def disc(radius):
+    offsets = np.arange(-radius, radius + 1)
+    dy, dx = np.meshgrid(offsets, offsets, indexing='ij')
+    inside = dy * dy + dx * dx <= radius * radius
+    return dy[inside], dx[inside]
+
+
+def stamp(blast, ys, xs, kinds, rng=None):
+    height, width = blast.shape
+    for kind in np.unique(kinds).tolist():
+        chosen = kinds == kind
+        dy, dx = disc(int(BLAST_RADIUS[kind]))
+        ty = (ys[chosen, None] + dy).ravel()
+        tx = (xs[chosen, None] + dx).ravel()
+        keep = (ty >= 0) & (ty < height) & (tx >= 0) & (tx < width)
+        if BLAST_STRENGTH[kind] < 1:
+            keep &= (rng or np.random).random(len(ty)) < BLAST_STRENGTH[kind]
+        blast[ty[keep], tx[keep]] = True
+
+
+def resolve(material, ys, xs, rows=None, rng=None, cols=None):
+    # Detonations spread wave by wave through explosives caught in a blast, so a
+    # whole chain goes off in the tick it starts. Explosives outside rows/cols are
+    # only primed, for whoever owns those cells to set off.
+    ys, xs = np.asarray(ys, dtype=np.intp), np.asarray(xs, dtype=np.intp)
+    y0, y1 = rows or (0, material.shape[0])
+    x0, x1 = cols or (0, material.shape[1])
+    owned = np.zeros(material.shape, dtype=bool)
+    owned[y0:y1, x0:x1] = True
+    explosive = is_kind(material, EXPLOSIVES)
+    blast = np.zeros(material.shape, dtype=bool)
+    detonated = np.zeros(material.shape, dtype=bool)
+    primed = np.zeros(material.shape, dtype=bool)
+    while len(ys):
+        detonated[ys, xs] = True
+        stamp(blast, ys, xs, material[ys, xs], rng)
+        triggered = blast & explosive & ~detonated & ~primed
+        primed |= triggered & ~owned
+        ys, xs = np.nonzero(triggered & owned)
+    burn = ((blast & ~is_kind(material, BLAST_PROOF)) | detonated) & ~primed
+    return burn, primed
+
+
+def detonate(planes, ys, xs, rows=None, rng=None, cols=None):
+    m, t, life, vx, vy = planes
+    burn, primed = resolve(m, ys, xs, rows, rng, cols)
+    m[burn] = FIRE
+    t[burn] = AMBIENT_TEMPERATURE
+    life[burn] = LIFETIME[FIRE]
+    vx[burn] = 0.0
+    vy[burn] = 0.0
+    life[primed] = 0
+    return burn
+
+
+def step(planes, rows=None, rng=None, cols=None):
+    m, life = planes[0], planes[2]
+    y0, y1 = rows or (0, m.shape[0])
+    x0, x1 = cols or (0, m.shape[1])
+    fused = is_kind(m[y0:y1, x0:x1], EXPLOSIVES)
+    if not fused.any():
+        return None
+    fuse = life[y0:y1, x0:x1]
+    fuse[fused] -= 1
+    ys, xs = np.nonzero(fused & (fuse <= 0))
+    if len(ys) == 0:
+        return None
+    return detonate(planes, ys + y0, xs + x0, rows, rng, cols)
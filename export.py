@@ -0,0 +1,216 @@
+import os
+import queue
+import shlex
+import struct
+import subprocess
+import threading
+import zlib
+import numpy as np
+from palette import build_palette, build_heat_palette, heat_bin
+from materials import MATERIAL_COLORS
+
+# one cell becomes a CELL_SIZE square, as main.py draws it
+CELL_SIZE = 4
+FPS = 30
+QUEUE_SIZE = 8
+PNG_LEVEL = 1
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_PNG_HEADER = struct.Struct('>IIBBBBB')
+
+
+def upscale(frame, scale):
+    if scale == 1:
+        return frame
+    return np.repeat(np.repeat(frame, scale, axis=0), scale, axis=1)
+
+
+def _png_chunk(tag, data):
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+
+def encode_png(rgb, level=PNG_LEVEL):
+    height, width, _ = rgb.shape
+    # every row starts with filter type 0 (none)
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 1:] = rgb.reshape(height, -1)
+    return b''.join([_PNG_SIGNATURE,
+                     _png_chunk(b'IHDR', _PNG_HEADER.pack(width, height, 8, 2, 0, 0, 0)),
+                     _png_chunk(b'IDAT', zlib.compress(rows, level)),
+                     _png_chunk(b'IEND', b'')])
+
+
+def encode_lzw(indices, code_size):
+    # GIF image data without compression: literal codes only, with a clear
+    # code often enough that the code width never grows. Frames are larger
+    # than real LZW but are packed with a few array operations instead of a
+    # dictionary walk per pixel.
+    clear = 1 << code_size
+    run = clear - 2
+    pixels = indices.reshape(-1).astype(np.uint16)
+    codes = np.insert(pixels, np.arange(0, len(pixels), run), clear)
+    codes = np.append(codes, clear + 1)
+    bits = (codes[:, None] >> np.arange(code_size + 1, dtype=np.uint16)) & 1
+    data = np.packbits(bits.astype(np.uint8).reshape(-1), bitorder='little').tobytes()
+    blocks = [data[i:i + 255] for i in range(0, len(data), 255)]
+    return bytes([code_size]) + b''.join(bytes([len(block)]) + block for block in blocks) + b'\x00'
+
+
+class PngSequence:
+    # frame_000000.png, frame_000001.png, ... in directory
+    indexed = False
+
+    def __init__(self, directory, width, height, fps=FPS, level=PNG_LEVEL):
+        self.directory = directory
+        self.level = level
+        self.frames = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, rgb):
+        with open(os.path.join(self.directory, f"frame_{self.frames:06d}.png"), 'wb') as f:
+            f.write(encode_png(rgb, self.level))
+        self.frames += 1
+
+    def close(self):
+        pass
+
+
+class GifWriter:
+    # Frames are material ids, so the palette is the material colours and
+    # heat tints are not available. Each frame only covers the box of cells
+    # that changed since the last one and is drawn over it.
+    indexed = True
+
+    def __init__(self, filename, width, height, fps=FPS, scale=1, colors=MATERIAL_COLORS):
+        self.scale = scale
+        self.code_size = max(2, (len(colors) - 1).bit_length())
+        self.delay = max(1, round(100 / fps))
+        self.previous = None
+        self.file = open(filename, 'wb')
+        table = np.zeros((1 << self.code_size, 3), dtype=np.uint8)
+        table[:len(colors)] = colors
+        packed = 0x80 | (self.code_size - 1) << 4 | (self.code_size - 1)
+        self.file.write(b'GIF89a' + struct.pack('<HHBBB', width, height, packed, 0, 0) + table.tobytes())
+        # loop forever
+        self.file.write(b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', 0) + b'\x00')
+
+    def write(self, indices):
+        # indices are at cell resolution; only the changed box is scaled up
+        scale = self.scale
+        if self.previous is None:
+            y0, y1, x0, x1 = 0, indices.shape[0], 0, indices.shape[1]
+        else:
+            changed = indices != self.previous
+            rows, cols = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+            if len(rows):
+                y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+            else:
+                # nothing changed, but the frame still has to take up its time
+                y0, y1, x0, x1 = 0, 1, 0, 1
+        self.previous = indices
+        box = upscale(indices[y0:y1, x0:x1], scale)
+        self.file.write(b'!\xf9\x04' + struct.pack('<BHBB', 1 << 2, self.delay, 0, 0))
+        self.file.write(b',' + struct.pack('<HHHHB', x0 * scale, y0 * scale, box.shape[1], box.shape[0], 0))
+        self.file.write(encode_lzw(box, self.code_size))
+
+    def close(self):
+        if not self.file.closed:
+            self.file.write(b';')
+            self.file.close()
+
+
+class PipeWriter:
+    # Raw rgb24 frames on the stdin of an encoder, e.g.
+    # ffmpeg -y -f rawvideo -pix_fmt rgb24 -s {width}x{height} -r {fps} -i - clip.mp4
+    indexed = False
+
+    def __init__(self, command, width, height, fps=FPS):
+        self.process = subprocess.Popen(shlex.split(command.format(width=width, height=height, fps=fps)),
+                                        stdin=subprocess.PIPE)
+
+    def write(self, rgb):
+        self.process.stdin.write(memoryview(np.ascontiguousarray(rgb)).cast('B'))
+
+    def close(self):
+        if self.process.stdin.closed:
+            return
+        self.process.stdin.close()
+        if self.process.wait():
+            raise RuntimeError(f"encoder exited with status {self.process.returncode}")
+
+
+def open_writer(output, width, height, fps=FPS, scale=1, pipe=None):
+    # width and height are in output pixels
+    if pipe:
+        return PipeWriter(pipe, width, height, fps)
+    if output.endswith('.gif'):
+        return GifWriter(output, width, height, fps, scale)
+    return PngSequence(output, width, height, fps)
+
+
+class Exporter:
+    # capture() copies the material (and temperature) grids at a tick
+    # boundary; colouring, upscaling and encoding happen on a writer thread.
+    # The queue is bounded, so a slow encoder holds the simulation back
+    # rather than dropping frames or buffering the clip in memory.
+    def __init__(self, world, writer, every=1, scale=CELL_SIZE, heat=False):
+        if heat and writer.indexed:
+            raise ValueError("heat view needs an RGB output, not a GIF")
+        self.world = world
+        self.writer = writer
+        self.every = every
+        self.scale = scale
+        self.heat = heat
+        self.palette = build_palette()
+        self.heat_palette = build_heat_palette(self.palette)
+        self.frames = 0
+        self.error = None
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.thread = threading.Thread(target=self._drain, name='export', daemon=True)
+        self.thread.start()
+
+    def _drain(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                self._encode(*item)
+            except Exception as error:
+                self.error = error
+
+    def _encode(self, material, temperature):
+        if self.writer.indexed:
+            self.writer.write(material)
+        elif temperature is None:
+            self.writer.write(upscale(self.palette[material], self.scale))
+        else:
+            self.writer.write(upscale(self.heat_palette[material, heat_bin(temperature)], self.scale))
+
+    def _check(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError("export failed") from error
+
+    def capture(self):
+        if self.every > 1 and self.world.tick % self.every:
+            return
+        self._check()
+        temperature = self.world.temperature_grid().copy() if self.heat else None
+        self.queue.put((self.world.material_grid().copy(), temperature))
+        self.frames += 1
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self.writer.close()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import functools
+import sys
+import time
+import bench
+import brush
+import checkpoint
+import ensemble
+import export
+import profiling
+import recorder
+import stream
+from world import World
+from array_world import ArrayWorld
+from parallel import ParallelWorld
+from sparse_world import SparseWorld, MEMORY_BUDGET
+from rng import WorldRandom
+
+BACKENDS = {
+    'object': World,
+    'array': ArrayWorld,
+    'cell': functools.partial(ArrayWorld, kernels='cell'),
+    'sparse': SparseWorld,
+}
+
+
+def make_world(args):
+    if getattr(args, 'workers', 1) > 1:
+        world = ParallelWorld(args.width, args.height, workers=args.workers, seed=args.seed,
+                              kernels='cell' if args.backend == 'cell' else 'vector')
+    elif args.backend == 'sparse':
+        world = SparseWorld(args.width, args.height, seed=args.seed,
+                            memory_budget=getattr(args, 'memory_budget', MEMORY_BUDGET // 2 ** 20) * 2 ** 20)
+    else:
+        world = BACKENDS[args.backend](args.width, args.height, seed=args.seed)
+    if args.scene:
+        world.load(args.scene)
+        if args.seed is not None:
+            world.random = WorldRandom(args.seed)
+    for spec in getattr(args, 'paint', None) or []:
+        material = world.material_grid() if spec.startswith('flood:') else None
+        world.paint(*brush.parse(spec, world.width, world.height, material))
+    return world
+
+
+def run(args):
+    world = make_world(args)
+    try:
+        # snapshots are written in the background but never skipped
+        snapshots = checkpoint.Checkpointer(world, args.snapshot_dir, args.snapshot_every, args.keep,
+                                            lossy=False) if args.snapshot_dir else None
+        recording = recorder.Recorder(world, args.record, args.keyframe_every) if args.record else None
+        if args.profile:
+            world.profiler = profiling.Profiler(keep=True)
+
+        # Only the updates are timed, as in bench: counting particles pages
+        # chunks in on the sparse backend, and recording has its own cost.
+        particles = 0
+        elapsed = 0.0
+        for tick in range(1, args.ticks + 1):
+            particles += world.particle_count()
+            start = time.perf_counter()
+            world.update()
+            elapsed += time.perf_counter() - start
+            if recording:
+                recording.capture()
+            if snapshots:
+                snapshots.step()
+        if recording:
+            recording.close()
+        if snapshots:
+            snapshots.close()
+
+        ticks_per_sec = args.ticks / elapsed if elapsed > 0 else float('inf')
+        particles_per_sec = particles / elapsed if elapsed > 0 else float('inf')
+        print(f"{args.ticks} ticks in {elapsed:.3f}s: {ticks_per_sec:.1f} ticks/s, "
+              f"{particles_per_sec:.0f} particles/s, {world.particle_count()} particles")
+
+        if args.profile:
+            profiling.save_log(world.profiler.log, args.profile)
+            rules = world.profiler.rule_totals()
+            if rules:
+                spent = sum(rules.values())
+                print("rules: " + ", ".join(f"{name} {100 * seconds / spent:.0f}%" for name, seconds in rules.most_common()))
+
+        if args.output:
+            world.save(args.output)
+        return 0
+    finally:
+        if hasattr(world, 'close'):
+            world.close()
+
+
+def run_serve(args):
+    world = make_world(args)
+    server = stream.StreamServer(world, args.host, args.port, args.tick_rate)
+    print(f"serving {world.width}x{world.height} on {args.host}:{args.port}")
+    start = time.perf_counter()
+    try:
+        asyncio.run(server.run(args.ticks))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if hasattr(world, 'close'):
+            world.close()
+    elapsed = time.perf_counter() - start
+    print(f"{server.tick} ticks in {elapsed:.3f}s, {server.bytes_sent / 1024:.0f} KiB sent")
+    return 0
+
+
+def run_ensemble(args):
+    if args.backend not in ensemble.BACKENDS:
+        print(f"ensembles run on: {', '.join(ensemble.BACKENDS)}", file=sys.stderr)
+        return 2
+    world = make_world(args)
+    base = world.snapshot()
+    grid = [ensemble.parse_parameter(spec) for spec in args.param or []]
+    names = [name for name, _ in grid]
+    seeds = [(args.seed or 0) + i for i in range(args.runs)]
+    metric_names = args.metrics.split(',')
+
+    def progress(done, total):
+        print(f"\r{done}/{total} variants", end='', file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    variant_list, results = ensemble.run(base, args.backend, grid, seeds, args.ticks, args.every, metric_names,
+                                         args.processes, progress)
+    print(f"\n{len(results)} variants of {args.ticks} ticks in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    per_tick, summary = ensemble.columns(variant_list, results, names)
+    if args.output:
+        ensemble.save_columns(per_tick, args.output)
+    table = ensemble.aggregate(summary, names)
+    if args.summary:
+        ensemble.save_columns(table, args.summary)
+    # columns that stayed zero everywhere (materials never present) are left out of the printout
+    shown = [name for name in table if name in names or table[name].any()]
+    for row in zip(*(table[name] for name in shown)):
+        print("  ".join(f"{name}={value:g}" for name, value in zip(shown, row)))
+    return 0
+
+
+def run_export(args):
+    if args.heat and args.output and args.output.endswith('.gif'):
+        print("GIFs hold material colours only; use --heat with a PNG sequence or --pipe", file=sys.stderr)
+        return 2
+    world = make_world(args)
+    writer = export.open_writer(args.output, world.width * args.scale, world.height * args.scale, args.fps,
+                                args.scale, args.pipe)
+    start = time.perf_counter()
+    with export.Exporter(world, writer, args.every, args.scale, args.heat) as exporter:
+        exporter.capture()
+        for tick in range(args.ticks):
+            world.update()
+            exporter.capture()
+    elapsed = time.perf_counter() - start
+    print(f"{exporter.frames} frames of {args.ticks} ticks in {elapsed:.3f}s: "
+          f"{exporter.frames / elapsed if elapsed > 0 else float('inf'):.1f} frames/s")
+    return 0
+
+
+def run_replay(args):
+    with recorder.Player(args.recording) as player:
+        frames = 0
+        start = time.perf_counter()
+        for tick, material, temperature, life in player.play(args.start, args.end):
+            frames += 1
+        elapsed = time.perf_counter() - start
+        print(f"replayed {frames} ticks ({player.ticks[0]}..{player.last_tick}) in {elapsed:.3f}s: "
+              f"{frames / elapsed if elapsed > 0 else float('inf'):.1f} ticks/s")
+        if args.output:
+            player.seek(args.end if args.end is not None else player.last_tick)
+            world = ArrayWorld(player.width, player.height)
+            world.material[...] = player.material
+            world.temperature[...] = player.temperature
+            world.life[...] = player.life
+            world.save(args.output)
+    return 0
+
+
+def run_bench(args):
+    scenarios = args.scenarios.split(',') if args.scenarios else list(bench.SCENARIOS)
+    sizes = [bench.parse_size(s) for s in args.sizes.split(',')] if args.sizes else bench.SIZES
+    results = bench.run_suite(BACKENDS[args.backend], args.backend, scenarios, sizes, args.ticks, args.seed)
+    if args.output:
+        bench.save_results(results, args.output)
+    return 0
+
+
+def run_compare(args):
+    for line in bench.compare(bench.load_results(args.baseline), bench.load_results(args.candidate)):
+        print(line)
+    return 0
+
+
+def add_world_arguments(parser):
+    parser.add_argument('--width', type=int, default=200)
+    parser.add_argument('--height', type=int, default=150)
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='array')
+    parser.add_argument('--scene', help="saved world to start from")
+    parser.add_argument('--seed', type=int)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='headless', description="Run the sandbox without a display.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="step a world as fast as possible")
+    add_world_arguments(run_parser)
+    run_parser.add_argument('--workers', type=int, default=1, help="strip-parallel worker processes (array and cell backends)")
+    run_parser.add_argument('--memory-budget', type=int, default=MEMORY_BUDGET // 2 ** 20,
+                            help="MiB of chunks kept in memory before paging to disk (sparse backend)")
+    run_parser.add_argument('--paint', action='append', metavar='SHAPE:ARGS:TYPE[:MODE]',
+                            help="paint before running, e.g. disc:100,20,5:sand or rect:0,140,199,149:rock")
+    run_parser.add_argument('--ticks', type=int, default=1000)
+    run_parser.add_argument('--output', help="write the final state here")
+    run_parser.add_argument('--snapshot-dir', help="directory for periodic snapshots")
+    run_parser.add_argument('--snapshot-every', type=int, default=0)
+    run_parser.add_argument('--keep', type=int, default=0, help="keep only the newest this many snapshots (0 keeps all)")
+    run_parser.add_argument('--record', help="record tick deltas to this file")
+    run_parser.add_argument('--keyframe-every', type=int, default=recorder.KEYFRAME_EVERY)
+    run_parser.add_argument('--profile', help="write per-tick timings and counts here (.csv, otherwise JSON)")
+    run_parser.set_defaults(func=run)
+
+    serve_parser = commands.add_parser('serve', help="run a world and stream it to viewer.py clients")
+    add_world_arguments(serve_parser)
+    serve_parser.add_argument('--memory-budget', type=int, default=MEMORY_BUDGET // 2 ** 20,
+                              help="MiB of chunks kept in memory before paging to disk (sparse backend)")
+    serve_parser.add_argument('--paint', action='append', metavar='SHAPE:ARGS:TYPE[:MODE]')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=stream.PORT)
+    serve_parser.add_argument('--tick-rate', type=float, default=stream.TICK_RATE)
+    serve_parser.add_argument('--ticks', type=int, default=0, help="stop after this many ticks (0 runs until interrupted)")
+    serve_parser.set_defaults(func=run_serve)
+
+    ensemble_parser = commands.add_parser('ensemble', help="run seeded variants of a scene over a parameter grid")
+    add_world_arguments(ensemble_parser)
+    ensemble_parser.add_argument('--paint', action='append', metavar='SHAPE:ARGS:TYPE[:MODE]')
+    ensemble_parser.add_argument('--param', action='append', metavar='NAME=V1,V2,...',
+                                 help="sweep a parameter: " + ', '.join(ensemble.PARAMETERS))
+    ensemble_parser.add_argument('--runs', type=int, default=4, help="seeds per parameter combination")
+    ensemble_parser.add_argument('--ticks', type=int, default=300)
+    ensemble_parser.add_argument('--every', type=int, default=10, help="sample metrics every this many ticks")
+    ensemble_parser.add_argument('--metrics', default=','.join(ensemble.METRICS))
+    ensemble_parser.add_argument('--processes', type=int, help="worker processes (default: one per core)")
+    ensemble_parser.add_argument('--output', help="per-tick samples, one column per metric (.npz, or .csv)")
+    ensemble_parser.add_argument('--summary', help="per-combination means and spreads over seeds (.npz, or .csv)")
+    ensemble_parser.set_defaults(func=run_ensemble)
+
+    export_parser = commands.add_parser('export', help="render a run to a PNG sequence, a GIF or an encoder")
+    add_world_arguments(export_parser)
+    export_parser.add_argument('--paint', action='append', metavar='SHAPE:ARGS:TYPE[:MODE]')
+    export_parser.add_argument('--ticks', type=int, default=300)
+    export_parser.add_argument('--every', type=int, default=1, help="keep one frame every this many ticks")
+    export_parser.add_argument('--scale', type=int, default=export.CELL_SIZE, help="pixels per cell")
+    export_parser.add_argument('--fps', type=int, default=export.FPS)
+    export_parser.add_argument('--heat', action='store_true', help="tint by temperature (not for GIFs)")
+    target = export_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--output', help="a .gif file, or a directory for a PNG sequence")
+    target.add_argument('--pipe', metavar='COMMAND',
+                        help="encoder reading rgb24 on stdin; {width}, {height} and {fps} are filled in, e.g. "
+                             "'ffmpeg -y -f rawvideo -pix_fmt rgb24 -s {width}x{height} -r {fps} -i - clip.mp4'")
+    export_parser.set_defaults(func=run_export)
+
+    replay_parser = commands.add_parser('replay', help="play back a recording without running the rules")
+    replay_parser.add_argument('recording')
+    replay_parser.add_argument('--start', type=int, default=0)
+    replay_parser.add_argument('--end', type=int)
+    replay_parser.add_argument('--output', help="write the state at --end (or the last tick) here")
+    replay_parser.set_defaults(func=run_replay)
+
+    bench_parser = commands.add_parser('bench', help="time the canonical scenarios")
+    bench_parser.add_argument('--backend', choices=sorted(BACKENDS), default='array')
+    bench_parser.add_argument('--scenarios', help="comma-separated subset of: " + ', '.join(bench.SCENARIOS))
+    bench_parser.add_argument('--sizes', help="comma-separated WIDTHxHEIGHT list")
+    bench_parser.add_argument('--ticks', type=int, default=150)
+    bench_parser.add_argument('--seed', type=int, default=0)
+    bench_parser.add_argument('--output', help="write JSON results here")
+    bench_parser.set_defaults(func=run_bench)
+
+    compare_parser = commands.add_parser('compare', help="compare two bench result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.set_defaults(func=run_compare)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, 'workers', 1) > 1 and args.backend not in ('array', 'cell'):
+        parser.error(f"--workers runs the array or cell kernels, not the {args.backend} backend")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+import os
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+ENABLED = numba is not None and os.environ.get('PIXELZ_NO_JIT', '') in ('', '0')
+
+
+def kernel(function):
+    if not ENABLED:
+        return function
+    return numba.njit(cache=True)(function)
@@ -1,24 +1,48 @@
+import argparse
 import pygame
+import os
 import sys
-import numpy as np
+import time
+import brush
 from world import World
+from array_world import ArrayWorld
+from sparse_world import SparseWorld
+from renderer import Renderer, ProfilerOverlay
+from profiling import Profiler
+from sim_thread import SimulationThread, TICK_RATE
+from checkpoint import Checkpointer, KEEP
+from util import parse_size
+from materials import (MATERIAL_COLORS, SAND, WATER, ROCK, FIRE, SMOKE, WOOD, STEAM, PLANT,
+                       EXPLOSIVE)
 
 
 WIDTH, HEIGHT = 800, 600
 CELL_SIZE = 4
 GRID_WIDTH, GRID_HEIGHT = WIDTH // CELL_SIZE, HEIGHT // CELL_SIZE
 
+SAVE_FILE = "sandbox_save.pxz"
+LEGACY_SAVE_FILE = "sandbox_save.json"
+AUTOSAVE_DIR = "autosave"
+# arrow keys move the view over a world bigger than the window, this many cells a press
+SCROLL_STEP = 16
+SCROLL_KEYS = {
+    pygame.K_LEFT: (-1, 0),
+    pygame.K_RIGHT: (1, 0),
+    pygame.K_UP: (0, -1),
+    pygame.K_DOWN: (0, 1),
+}
+
 
 BLACK = (0, 0, 0)
-SAND_COLOR = (194, 178, 128)
-WATER_COLOR = (0, 119, 190)
-ROCK_COLOR = (120, 120, 120)
-FIRE_COLOR = (255, 69, 0)
-SMOKE_COLOR = (105, 105, 105)
-WOOD_COLOR = (139, 69, 19)
-STEAM_COLOR = (220, 220, 220)
-PLANT_COLOR = (0, 128, 0)
-EXPLOSIVE_COLOR = (255, 0, 0)
+SAND_COLOR = MATERIAL_COLORS[SAND]
+WATER_COLOR = MATERIAL_COLORS[WATER]
+ROCK_COLOR = MATERIAL_COLORS[ROCK]
+FIRE_COLOR = MATERIAL_COLORS[FIRE]
+SMOKE_COLOR = MATERIAL_COLORS[SMOKE]
+WOOD_COLOR = MATERIAL_COLORS[WOOD]
+STEAM_COLOR = MATERIAL_COLORS[STEAM]
+PLANT_COLOR = MATERIAL_COLORS[PLANT]
+EXPLOSIVE_COLOR = MATERIAL_COLORS[EXPLOSIVE]
 
 class Button:
     def __init__(self, x, y, width, height, text, color):
@@ -36,29 +60,33 @@ class Button:
     def is_clicked(self, pos):
         return self.rect.collidepoint(pos)
 
-def get_particle_color(particle):
-    color_map = {
-        'sand': SAND_COLOR,
-        'water': WATER_COLOR,
-        'rock': ROCK_COLOR,
-        'fire': FIRE_COLOR,
-        'smoke': SMOKE_COLOR,
-        'wood': WOOD_COLOR,
-        'steam': STEAM_COLOR,
-        'plant': PLANT_COLOR,
-        'explosive': EXPLOSIVE_COLOR
-    }
-    return color_map.get(particle.type, BLACK)
-
-def main():
+WORLD_BACKENDS = {
+    'object': World,
+    'array': ArrayWorld,
+    'sparse': SparseWorld,
+}
+
+def main(backend='array', threaded=False, tick_rate=TICK_RATE, autosave_every=0, keep=KEEP, world_size=None):
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     clock = pygame.time.Clock()
-    world = World(GRID_WIDTH, GRID_HEIGHT)
+    world = WORLD_BACKENDS[backend](*(world_size or (GRID_WIDTH, GRID_HEIGHT)))
+    # Only the cells under the window are drawn, so a sparse world pages in
+    # just the chunks in view.
+    view_width, view_height = min(GRID_WIDTH, world.width), min(GRID_HEIGHT, world.height)
+    camera_x, camera_y = 0, 0
+    visible = (0, 0, view_width, view_height)
+    # Saves are snapshotted between ticks and written in the background.
+    checkpointer = Checkpointer(world, AUTOSAVE_DIR if autosave_every else None, autosave_every, keep)
+    # In threaded mode the world is only touched by the simulation thread; the
+    # UI sends it commands and draws whichever frame it published last.
+    sim = SimulationThread(world, tick_rate, checkpointer=checkpointer, view=visible) if threaded else None
+    target = sim or world
 
     current_type = 'sand'
     brush_size = 3
     eraser_mode = False
+    heat_view = False
 
     font = pygame.font.Font(None, 36)
 
@@ -76,13 +104,27 @@ def main():
     save_button = Button(10, 10, 80, 30, "Save", (0, 255, 0))
     load_button = Button(100, 10, 80, 30, "Load", (0, 0, 255))
 
-    particle_surface = pygame.Surface((WIDTH, HEIGHT))
+    renderer = Renderer(view_width, view_height, CELL_SIZE)
+    profiler = Profiler()
+    overlay = ProfilerOverlay(profiler)
+    stroke = brush.Stroke()
 
     running = True
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_t:
+                heat_view = not heat_view
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_p:
+                world.profiler = None if world.profiler else profiler
+            elif event.type == pygame.KEYDOWN and event.key in SCROLL_KEYS:
+                dx, dy = SCROLL_KEYS[event.key]
+                camera_x = min(max(camera_x + dx * SCROLL_STEP, 0), world.width - view_width)
+                camera_y = min(max(camera_y + dy * SCROLL_STEP, 0), world.height - view_height)
+                visible = (camera_x, camera_y, camera_x + view_width, camera_y + view_height)
+                if sim:
+                    sim.look(*visible)
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 4:
                     brush_size = min(10, brush_size + 1)
@@ -98,32 +140,34 @@ def main():
                                 current_type = button.text.lower()
                                 eraser_mode = False
                     if save_button.is_clicked(pos):
-                        world.save("sandbox_save.json")
+                        if sim:
+                            sim.save(SAVE_FILE)
+                        else:
+                            checkpointer.save(SAVE_FILE)
                     elif load_button.is_clicked(pos):
-                        world.load("sandbox_save.json")
+                        filename = next((f for f in (SAVE_FILE, LEGACY_SAVE_FILE) if os.path.exists(f)), None)
+                        if filename and sim:
+                            sim.load(filename)
+                        elif filename:
+                            checkpointer.flush()
+                            world.load(filename)
 
         if pygame.mouse.get_pressed()[0]:
             x, y = pygame.mouse.get_pos()
-            for dx in range(-brush_size, brush_size + 1):
-                for dy in range(-brush_size, brush_size + 1):
-                    if dx*dx + dy*dy <= brush_size*brush_size:
-                        grid_x, grid_y = (x + dx*CELL_SIZE) // CELL_SIZE, (y + dy*CELL_SIZE) // CELL_SIZE
-                        if 0 <= grid_x < GRID_WIDTH and 0 <= grid_y < GRID_HEIGHT:
-                            if eraser_mode:
-                                world.grid[grid_y, grid_x] = None
-                            else:
-                                world.add_particle(grid_x, grid_y, current_type)
+            cells = stroke.to(x // CELL_SIZE + camera_x, y // CELL_SIZE + camera_y, brush_size,
+                              world.width, world.height)
+            target.paint(cells, current_type, brush.ERASE if eraser_mode else brush.FILL)
+        else:
+            stroke.lift()
 
-        world.update()
+        if sim is None:
+            world.update()
+            checkpointer.step()
 
-        particle_surface.fill(BLACK)
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                if world.grid[y, x]:
-                    color = get_particle_color(world.grid[y, x])
-                    pygame.draw.rect(particle_surface, color, (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-
-        screen.blit(particle_surface, (0, 0))
+        render_start = time.perf_counter()
+        screen.blit(renderer.render(sim.latest() if sim else world.viewport(*visible), heat_view), (0, 0))
+        if world.profiler:
+            profiler.sample('render', time.perf_counter() - render_start)
 
         for button in buttons:
             button.draw(screen)
@@ -138,11 +182,33 @@ def main():
             text = font.render("Eraser Mode", True, (255, 0, 0))
             screen.blit(text, (600, 10))
 
+        if sim:
+            text = font.render(f"{sim.ticks_per_sec:.0f} ticks/s", True, (255, 255, 255))
+            screen.blit(text, (600, 40))
+        if world.profiler:
+            overlay.draw(screen, (WIDTH - overlay.surface.get_width() - 10, 80))
+
         pygame.display.flip()
         clock.tick(60)
 
+    if sim:
+        sim.close()
+    checkpointer.close()
+    if hasattr(world, 'close'):
+        world.close()
     pygame.quit()
     sys.exit()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', choices=sorted(WORLD_BACKENDS), default='array')
+    parser.add_argument('--threaded', action='store_true',
+                        help="run the simulation on its own thread at a fixed tick rate")
+    parser.add_argument('--tick-rate', type=float, default=TICK_RATE)
+    parser.add_argument('--autosave-every', type=int, default=0,
+                        help=f"checkpoint into {AUTOSAVE_DIR}/ every this many ticks")
+    parser.add_argument('--keep', type=int, default=KEEP, help="autosave checkpoints to keep")
+    parser.add_argument('--world-size', type=parse_size, metavar='WIDTHxHEIGHT',
+                        help="cells in the world, if not one window's worth; arrow keys scroll the view")
+    args = parser.parse_args()
+    main(args.backend, args.threaded, args.tick_rate, args.autosave_every, args.keep, args.world_size)
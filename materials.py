@@ -0,0 +1,112 @@
+from collections import namedtuple
+import numpy as np
+
+AMBIENT_TEMPERATURE = 20
+NONE = 255
+DETONATE = 254
+
+Material = namedtuple('Material', 'name color state density flammable lifetime phase_temperature above below '
+                                   'blast_radius blast_strength dispersion', defaults=(0, 0.0, 1))
+
+# Entries are indexed by ID; a new material is a new row here plus any reactions.
+REGISTRY = [
+    Material('empty', (0, 0, 0), 'empty', 0.0, False, -1, None, None, None),
+    Material('sand', (194, 178, 128), 'powder', 1.6, False, -1, None, None, None),
+    Material('water', (0, 119, 190), 'liquid', 1.0, False, -1, 100, 'steam', None, dispersion=8),
+    Material('rock', (120, 120, 120), 'solid', 2.6, False, -1, None, None, None),
+    Material('fire', (255, 69, 0), 'energy', 0.0, False, 100, None, None, None),
+    Material('smoke', (105, 105, 105), 'gas', 0.001, False, -1, None, None, None),
+    Material('wood', (139, 69, 19), 'solid', 0.7, True, -1, None, None, None),
+    Material('steam', (220, 220, 220), 'gas', 0.0006, False, -1, 100, None, 'water'),
+    Material('plant', (0, 128, 0), 'solid', 0.9, True, -1, None, None, None),
+    Material('explosive', (255, 0, 0), 'solid', 1.7, True, 100, None, None, None, 5, 1.0),
+]
+
+MATERIAL_NAMES = [material.name for material in REGISTRY]
+MATERIAL_IDS = {name: i for i, name in enumerate(MATERIAL_NAMES)}
+MATERIAL_COLORS = [material.color for material in REGISTRY]
+
+EMPTY = MATERIAL_IDS['empty']
+SAND = MATERIAL_IDS['sand']
+WATER = MATERIAL_IDS['water']
+ROCK = MATERIAL_IDS['rock']
+FIRE = MATERIAL_IDS['fire']
+SMOKE = MATERIAL_IDS['smoke']
+WOOD = MATERIAL_IDS['wood']
+STEAM = MATERIAL_IDS['steam']
+PLANT = MATERIAL_IDS['plant']
+EXPLOSIVE = MATERIAL_IDS['explosive']
+
+# actor, neighbour, what the actor becomes, what the neighbour becomes
+REACTIONS = [
+    ('fire', 'wood', None, 'fire'),
+    ('fire', 'plant', None, 'fire'),
+    ('fire', 'water', 'steam', None),
+    ('fire', 'explosive', None, DETONATE),
+]
+
+
+def material_id(particle_type):
+    if particle_type not in MATERIAL_IDS:
+        raise ValueError(f"unknown material {particle_type!r}")
+    return MATERIAL_IDS[particle_type]
+
+
+def material_name(material):
+    return MATERIAL_NAMES[material] if 0 < material < len(MATERIAL_NAMES) else None
+
+
+def materials_in_state(state):
+    return tuple(i for i, material in enumerate(REGISTRY) if material.state == state)
+
+
+def _product(ids, name):
+    if name is None:
+        return NONE
+    return name if name == DETONATE else ids[name]
+
+
+def build_tables(registry=REGISTRY, reactions=REACTIONS):
+    ids = {material.name: i for i, material in enumerate(registry)}
+    density = np.zeros(256, dtype=np.float32)
+    flammable = np.zeros(256, dtype=np.bool_)
+    lifetime = np.full(256, -1, dtype=np.int16)
+    phase_temperature = np.full(256, np.inf, dtype=np.float32)
+    above = np.full(256, NONE, dtype=np.uint8)
+    below = np.full(256, NONE, dtype=np.uint8)
+    blast_radius = np.zeros(256, dtype=np.int16)
+    blast_strength = np.zeros(256, dtype=np.float32)
+    # cells a liquid may slide along a row in one tick
+    dispersion = np.ones(256, dtype=np.int16)
+    for i, material in enumerate(registry):
+        density[i] = material.density
+        dispersion[i] = material.dispersion
+        blast_radius[i] = material.blast_radius
+        blast_strength[i] = material.blast_strength
+        flammable[i] = material.flammable
+        lifetime[i] = material.lifetime
+        if material.phase_temperature is not None:
+            phase_temperature[i] = material.phase_temperature
+            above[i] = _product(ids, material.above)
+            below[i] = _product(ids, material.below)
+
+    fluid = np.zeros(256, dtype=np.bool_)
+    for i, material in enumerate(registry):
+        fluid[i] = material.state in ('empty', 'liquid', 'gas')
+    sinks = fluid[None, :] & (density[None, :] < density[:, None])
+
+    self_product = np.full((256, 256), NONE, dtype=np.uint8)
+    neighbour_product = np.full((256, 256), NONE, dtype=np.uint8)
+    for actor, neighbour, to_actor, to_neighbour in reactions:
+        self_product[ids[actor], ids[neighbour]] = _product(ids, to_actor)
+        neighbour_product[ids[actor], ids[neighbour]] = _product(ids, to_neighbour)
+    return (density, flammable, lifetime, phase_temperature, above, below, sinks, self_product, neighbour_product,
+            blast_radius, blast_strength, dispersion)
+
+
+(DENSITY, FLAMMABLE, LIFETIME, PHASE_TEMPERATURE, PHASE_ABOVE, PHASE_BELOW, SINKS, SELF_PRODUCT, NEIGHBOUR_PRODUCT,
+ BLAST_RADIUS, BLAST_STRENGTH, DISPERSION) = build_tables()
+
+
+def initial_life(material):
+    return LIFETIME[material]
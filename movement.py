@@ -0,0 +1,229 @@
+import numpy as np
+from materials import EMPTY, AMBIENT_TEMPERATURE, SINKS, DISPERSION, materials_in_state
+
+WALL = 255
+
+GRANULAR = materials_in_state('powder')
+LIQUIDS = materials_in_state('liquid')
+GASES = materials_in_state('gas')
+
+GRAVITY = 0.1
+LIQUID_DAMPING = 0.9
+GAS_RISE_CHANCE = 0.8
+GAS_DISSIPATE_CHANCE = 0.05
+
+
+def neighbour(a, dy, dx, fill=WALL):
+    height, width = a.shape
+    out = np.full_like(a, fill)
+    out[max(-dy, 0):height - max(dy, 0), max(-dx, 0):width - max(dx, 0)] = \
+        a[max(dy, 0):height + min(dy, 0), max(dx, 0):width + min(dx, 0)]
+    return out
+
+
+def is_kind(m, kinds):
+    mask = m == kinds[0]
+    for kind in kinds[1:]:
+        mask |= m == kind
+    return mask
+
+
+def permute(planes, moved, index, target):
+    for plane in planes:
+        flat = plane.reshape(-1)
+        flat[target] = flat[index]
+    flat = moved.reshape(-1)
+    flat[target] = flat[index]
+
+
+def move(planes, moved, src, dy, dx):
+    if not src.any():
+        return np.empty(0, dtype=np.intp)
+    index = np.flatnonzero(src)
+    target = index + dy * src.shape[1] + dx
+    permute(planes, moved, np.concatenate((index, target)), np.concatenate((target, index)))
+    moved.reshape(-1)[target] = True
+    return target
+
+
+def shift_runs(planes, moved, movers, passable, dy):
+    # Each vertical run of movers whose leading neighbour is passable advances one
+    # cell as a block, and the displaced cell wraps round to the trailing end.
+    if not movers.any():
+        return np.empty(0, dtype=np.intp)
+    height, width = movers.shape
+    rows = np.arange(height)[:, None]
+    if dy > 0:
+        lead = np.minimum.accumulate(np.where(movers, height, rows)[::-1], axis=0)[::-1]
+    else:
+        lead = np.maximum.accumulate(np.where(movers, -1, rows), axis=0)
+    ys, xs = np.nonzero(movers)
+    ahead = lead[ys, xs]
+    keep = (ahead >= 0) & (ahead < height)
+    ys, xs, ahead = ys[keep], xs[keep], ahead[keep]
+    keep = passable[ahead, xs]
+    ys, xs, ahead = ys[keep], xs[keep], ahead[keep]
+    if len(ys) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    shifting = np.zeros_like(movers)
+    shifting[ys, xs] = True
+    trailing = ~neighbour(shifting, -dy, 0, False)[ys, xs]
+    index = ys * width + xs
+    target = index + dy * width
+    ends = ahead[trailing] * width + xs[trailing]
+    permute(planes, moved, np.concatenate((index, ends)), np.concatenate((target, index[trailing])))
+    moved.reshape(-1)[target] = True
+    return target
+
+
+def _sideways(planes, moved, candidates, left, dy):
+    m = planes[0]
+    open_left = neighbour(m, dy, -1) == EMPTY
+    open_right = neighbour(m, dy, 1) == EMPTY
+    move(planes, moved, candidates & open_left & (left | ~open_right), dy, -1)
+    # the cells they left now hold the empty cells they swapped with
+    candidates &= ~moved & (m != EMPTY)
+    move(planes, moved, candidates & (neighbour(m, dy, 1) == EMPTY), dy, 1)
+
+
+def _disperse(planes, moved, candidates, left):
+    # Each horizontal run of liquid beside empty cells shifts along its row as a
+    # block, by up to its dispersion rate and no further than the first cell it
+    # could fall into. As in shift_runs the run's trailing cells wrap round to its
+    # leading end, so a wide flood levels in a few ticks instead of a cell at a
+    # time. When runs close on the same gap from both sides they split it.
+    m = planes[0]
+    height, width = m.shape
+    beside_gap = (neighbour(m, 0, -1) == EMPTY) | (neighbour(m, 0, 1) == EMPTY)
+    rows = np.flatnonzero((candidates & beside_gap).any(axis=1))
+    if len(rows) == 0:
+        return np.empty(0, dtype=np.intp)
+    cols = np.arange(width)
+    row_material, candidates, left = m[rows], candidates[rows], left[rows]
+    open_ = row_material == EMPTY
+    below = np.where((rows + 1 < height)[:, None], m[np.minimum(rows + 1, height - 1)], WALL)
+    drop = open_ & (below == EMPTY)
+    # nearest blocked cell and nearest drop strictly to each side of every cell
+    next_blocked = neighbour(np.minimum.accumulate(np.where(open_, width, cols)[:, ::-1], axis=1)[:, ::-1], 0, 1, width)
+    next_drop = neighbour(np.minimum.accumulate(np.where(drop, cols, width)[:, ::-1], axis=1)[:, ::-1], 0, 1, width)
+    prev_blocked = neighbour(np.maximum.accumulate(np.where(open_, -1, cols), axis=1), 0, -1, -1)
+    prev_drop = neighbour(np.maximum.accumulate(np.where(drop, cols, -width), axis=1), 0, -1, -width)
+
+    rate = DISPERSION[row_material]
+    heads = candidates & ~neighbour(candidates, 0, 1, False)
+    tails = candidates & ~neighbour(candidates, 0, -1, False)
+    ys, ends = np.nonzero(heads)
+    starts = np.nonzero(tails)[1]
+    length = ends - starts + 1
+    rate = rate[ys, ends]
+    reach_right = np.minimum(np.minimum(next_blocked[ys, ends] - ends - 1, next_drop[ys, ends] - ends), rate)
+    reach_left = np.minimum(np.minimum(starts - prev_blocked[ys, starts] - 1, starts - prev_drop[ys, starts]), rate)
+    go_left = (reach_left > 0) & (left[ys, starts] | (reach_right == 0))
+    go_right = ~go_left & (reach_right > 0)
+
+    leftward = np.zeros_like(candidates)
+    leftward[ys[go_left], starts[go_left]] = True
+    gap_end = next_blocked[ys, ends]
+    meets = go_right & (gap_end < width)
+    meets[meets] = leftward[ys[meets], gap_end[meets]]
+    reach_right[meets] = np.minimum(reach_right[meets], (gap_end[meets] - ends[meets]) // 2)
+    rightward = np.zeros_like(candidates)
+    rightward[ys[go_right], ends[go_right]] = True
+    gap_start = prev_blocked[ys, starts]
+    meets = go_left & (gap_start >= 0)
+    meets[meets] = rightward[ys[meets], gap_start[meets]]
+    reach_left[meets] = np.minimum(reach_left[meets], (starts[meets] - gap_start[meets] - 1) // 2)
+
+    shift = np.where(go_right, reach_right, np.where(go_left, -reach_left, 0))
+    count = np.minimum(length, np.abs(shift))
+    moving = count > 0
+    ys, starts, ends, shift, count = ys[moving], starts[moving], ends[moving], shift[moving], count[moving]
+    if len(ys) == 0:
+        return np.empty(0, dtype=np.intp)
+    step = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    rows = np.repeat(rows[ys], count)
+    right = np.repeat(shift > 0, count)
+    # vacated cells are the trailing end of the run, targets are just past its lead
+    source = np.where(right, np.repeat(starts, count) + step, np.repeat(ends, count) - step)
+    target = np.where(right, np.repeat(ends + shift - count + 1, count) + step,
+                      np.repeat(starts + shift + count - 1, count) - step)
+    index, target = rows * width + source, rows * width + target
+    permute(planes, moved, np.concatenate((index, target)), np.concatenate((target, index)))
+    moved.reshape(-1)[target] = True
+    return target
+
+
+def _granular(planes, moved, left):
+    m = planes[0]
+    for kind in GRANULAR:
+        shift_runs(planes, moved, (m == kind) & ~moved, SINKS[kind][m], 1)
+    _sideways(planes, moved, is_kind(m, GRANULAR) & ~moved, left, 1)
+
+
+def _liquid(planes, moved, left):
+    m, vy = planes[0], planes[4]
+    target = shift_runs(planes, moved, is_kind(m, LIQUIDS) & ~moved, m == EMPTY, 1)
+    fallen = vy.reshape(-1)
+    fallen[target] = (fallen[target] + GRAVITY) * LIQUID_DAMPING
+
+    _sideways(planes, moved, is_kind(m, LIQUIDS) & ~moved, left, 1)
+    _disperse(planes, moved, is_kind(m, LIQUIDS) & ~moved, left)
+
+
+def _gas(planes, moved, rising, preference):
+    m = planes[0]
+    candidates = is_kind(m, GASES) & ~moved & rising
+    for choice, dx in ((1, -1), (2, 1)):
+        move(planes, moved, candidates & (preference == choice) & (neighbour(m, -1, dx) == EMPTY), -1, dx)
+    candidates &= ~moved & (m != EMPTY)
+    shift_runs(planes, moved, candidates, m == EMPTY, -1)
+    candidates &= ~moved & (m != EMPTY)
+    for dx in (-1, 1):
+        move(planes, moved, candidates & (neighbour(m, -1, dx) == EMPTY), -1, dx)
+        candidates &= ~moved & (m != EMPTY)
+
+
+def _terminal_fall(planes, moved):
+    m, vy = planes[0], planes[4]
+    liquid = is_kind(m, LIQUIDS)
+    vy[liquid & ~moved] = 0.0
+    steps = int(vy[liquid].max()) if liquid.any() else 0
+    for k in range(1, steps + 1):
+        shift_runs(planes, moved, is_kind(m, LIQUIDS) & (vy >= k), m == EMPTY, 1)
+
+
+def step(planes, moved, rng=None, own=None):
+    # own, a pair of slices, is the part of the window this call is responsible
+    # for when windows overlap; gas outside it is left to its owner to dissipate.
+    m, t, life, vx, vy = planes
+    height, width = m.shape
+    chance = np.frombuffer((rng or np.random).bytes(2 * height * width), dtype=np.uint8).reshape(2, height, width)
+    left = chance[1] < 128
+
+    gas = is_kind(m, GASES)
+    rise_threshold = round(GAS_RISE_CHANCE * 256)
+    rising = chance[0] < rise_threshold
+    rising[0] = False
+    preference = chance[0].astype(np.uint16) * 3 // rise_threshold
+    # gas that already moved this tick was rolled for in the window it started in
+    dissipate = gas & ~rising & ~moved & (chance[1] < round(GAS_DISSIPATE_CHANCE * 256))
+    if own is not None:
+        inside = np.zeros_like(dissipate)
+        inside[own] = True
+        dissipate &= inside
+    m[dissipate] = EMPTY
+    t[dissipate] = AMBIENT_TEMPERATURE
+    life[dissipate] = -1
+    vx[dissipate] = 0.0
+    vy[dissipate] = 0.0
+
+    if is_kind(m, GRANULAR).any():
+        _granular(planes, moved, left)
+    if is_kind(m, LIQUIDS).any():
+        _liquid(planes, moved, left)
+    if gas.any():
+        _gas(planes, moved, rising, preference)
+
+    _terminal_fall(planes, moved)
+    vx[is_kind(m, LIQUIDS)] *= LIQUID_DAMPING
@@ -0,0 +1,32 @@
+import numpy as np
+from materials import MATERIAL_COLORS, AMBIENT_TEMPERATURE
+
+HEAT_BINS = 32
+COLD_LIMIT = -20
+HOT_LIMIT = 300
+COLD_TINT = (0, 60, 255)
+HOT_TINT = (255, 40, 0)
+
+
+def build_palette(colors=MATERIAL_COLORS):
+    palette = np.zeros((256, 3), dtype=np.uint8)
+    palette[:len(colors)] = colors
+    return palette
+
+
+def heat_bin(temperature):
+    scaled = (np.asarray(temperature) - COLD_LIMIT) * ((HEAT_BINS - 1) / (HOT_LIMIT - COLD_LIMIT))
+    return np.clip(scaled, 0, HEAT_BINS - 1).astype(np.intp)
+
+
+def build_heat_palette(palette):
+    ambient = int(heat_bin(AMBIENT_TEMPERATURE))
+    lut = np.zeros((palette.shape[0], HEAT_BINS, 3), dtype=np.float32)
+    for b in range(HEAT_BINS):
+        if b >= ambient:
+            weight, tint = (b - ambient) / max(HEAT_BINS - 1 - ambient, 1), HOT_TINT
+        else:
+            weight, tint = (ambient - b) / max(ambient, 1), COLD_TINT
+        lut[:, b] = palette * (1 - 0.6 * weight) + np.array(tint) * (0.6 * weight)
+    lut[0] = 0
+    return lut.astype(np.uint8)
@@ -0,0 +1,185 @@
+import multiprocessing
+import os
+import numpy as np
+from multiprocessing import shared_memory
+import cell_rules
+import explosions
+import movement
+import thermal
+from array_world import ArrayWorld, REACTIVE, SCHEDULED
+from chunks import ChunkTracker
+from events import Schedule
+from profiling import phase
+from materials import EMPTY, PLANT, AMBIENT_TEMPERATURE
+from rng import keyed
+
+HALO = max(8, explosions.MAX_RADIUS)
+LAYOUT = (
+    ('material', np.uint8),
+    ('temperature', np.float32),
+    ('life', np.int16),
+    ('vx', np.float32),
+    ('vy', np.float32),
+    ('moved', np.bool_),
+    ('next_temperature', np.float32),
+)
+
+
+def layout_size(width, height):
+    return sum(np.dtype(dtype).itemsize for _, dtype in LAYOUT) * width * height
+
+
+def attach(buffer, width, height):
+    views = {}
+    offset = 0
+    for name, dtype in LAYOUT:
+        views[name] = np.ndarray((height, width), dtype=dtype, buffer=buffer, offset=offset)
+        offset += views[name].nbytes
+    return views
+
+
+def split_strips(height, count):
+    count = max(1, min(count, height // (2 * HALO)))
+    bounds = np.linspace(0, height, count + 1).astype(int)
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def planes_of(views):
+    return tuple(views[name] for name, _ in LAYOUT[:5])
+
+
+def run_rules(views, y0, y1, kernels, rng):
+    # Movement may carry cells across into the idle neighbours' halo rows; the
+    # shared moved mask stops them moving again when those strips run.
+    height = views['material'].shape[0]
+    w0, w1 = max(y0 - HALO, 0), min(y1 + HALO, height)
+    own = slice(y0 - w0, y1 - w0)
+    window = tuple(np.ascontiguousarray(p[w0:w1]) for p in planes_of(views))
+    moved = views['moved'][w0:w1].copy()
+    if kernels == 'vector':
+        movement.step(window, moved, rng, (own, slice(None)))
+
+    frozen = np.ones_like(moved)
+    frozen[own] = moved[own]
+    cell_rules.step(window, frozen, only=REACTIVE if kernels == 'vector' else None, rng=rng, skip=SCHEDULED)
+    moved[own] |= frozen[own]
+    explosions.step(window, (own.start, own.stop), rng)
+
+    for plane, updated in zip(planes_of(views), window):
+        plane[w0:w1] = updated
+    views['moved'][w0:w1] = moved
+
+
+def run_diffusion(views, y0, y1):
+    height = views['material'].shape[0]
+    w0, w1 = max(y0 - 1, 0), min(y1 + 1, height)
+    occupied = views['material'][w0:w1] != EMPTY
+    temperature = views['temperature'][w0:w1].copy()
+    if not thermal.is_uniform(occupied, temperature):
+        thermal.diffuse(occupied, temperature)
+    views['next_temperature'][y0:y1] = temperature[y0 - w0:y1 - w0]
+
+
+def run_phase_changes(views, y0, y1):
+    views['temperature'][y0:y1] = views['next_temperature'][y0:y1]
+    thermal.apply_phase_changes(tuple(p[y0:y1] for p in planes_of(views)))
+
+
+def worker(name, width, height, strips, kernels, conn):
+    memory = shared_memory.SharedMemory(name=name)
+    views = attach(memory.buf, width, height)
+    try:
+        while True:
+            command = conn.recv()
+            if command is None:
+                break
+            task, tick, parity, entropy = command
+            for index, y0, y1 in strips:
+                if task == 'rules' and index % 2 == parity:
+                    # Keyed by tick and strip, so workers share no generator state.
+                    run_rules(views, y0, y1, kernels, keyed(entropy, tick, index))
+                elif task == 'diffuse':
+                    run_diffusion(views, y0, y1)
+                elif task == 'phase':
+                    run_phase_changes(views, y0, y1)
+            conn.send(True)
+    finally:
+        del views
+        memory.close()
+
+
+class ParallelWorld(ArrayWorld):
+    def __init__(self, width, height, workers=None, seed=None, kernels='vector'):
+        self.workers = workers or os.cpu_count() or 1
+        self.memory = None
+        self.processes = []
+        self.connections = []
+        super().__init__(width, height, kernels, seed)
+
+    def allocate(self, width, height):
+        self.close()
+        self.width = width
+        self.height = height
+        self.memory = shared_memory.SharedMemory(create=True, size=layout_size(width, height))
+        self.views = attach(self.memory.buf, width, height)
+        self.material, self.temperature, self.life, self.vx, self.vy = planes_of(self.views)
+        self.material.fill(EMPTY)
+        self.temperature.fill(AMBIENT_TEMPERATURE)
+        self.life.fill(-1)
+        self.vx.fill(0.0)
+        self.vy.fill(0.0)
+        self.chunks = ChunkTracker(width, height)
+        self.schedule = Schedule((height, width))
+
+        strips = [(index, y0, y1) for index, (y0, y1) in enumerate(split_strips(height, 2 * self.workers))]
+        assigned = [strips[i:i + 2] for i in range(0, len(strips), 2)]
+        context = multiprocessing.get_context()
+        for worker_strips in assigned:
+            parent, child = context.Pipe()
+            process = context.Process(target=worker, daemon=True,
+                                      args=(self.memory.name, width, height, worker_strips, self.kernels, child))
+            process.start()
+            self.processes.append(process)
+            self.connections.append(parent)
+
+    def broadcast(self, task, parity=0):
+        for conn in self.connections:
+            conn.send((task, self.tick, parity, self.random.entropy))
+        for conn in self.connections:
+            conn.recv()
+
+    def update(self):
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin(self.tick)
+        self.views['moved'].fill(False)
+        with phase(profiler, 'rules'):
+            self.broadcast('rules', 0)
+            self.broadcast('rules', 1)
+        with phase(profiler, 'events'):
+            # growth events fire here in the parent, on the shared planes
+            self.grow_plants([np.flatnonzero((self.material == PLANT) & ~self.schedule.pending)])
+        with phase(profiler, 'temperature'):
+            self.broadcast('diffuse')
+            self.broadcast('phase')
+        if profiler is not None:
+            profiler.end()
+        self.tick += 1
+
+    def close(self):
+        for conn in self.connections:
+            conn.send(None)
+        for process in self.processes:
+            process.join()
+        self.processes, self.connections = [], []
+        if self.memory is not None:
+            self.material = self.temperature = self.life = self.vx = self.vy = self.views = None
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,28 +1,74 @@
-import random
-import numpy as np
+from materials import (SAND, WATER, FIRE, SMOKE, STEAM, PLANT, EXPLOSIVE, MATERIAL_NAMES,
+                       AMBIENT_TEMPERATURE, NONE, DETONATE, SINKS, PHASE_TEMPERATURE, PHASE_ABOVE, PHASE_BELOW,
+                       SELF_PRODUCT, NEIGHBOUR_PRODUCT, DISPERSION, material_id, initial_life)
+
+WATER_DAMPING = 0.9
+
+
+def _rotate(directions, u):
+    first = min(int(u * len(directions)), len(directions) - 1)
+    return directions[first:] + directions[:first]
+
 
 class Particle:
+    __slots__ = ('x', 'y', 'material', 'life', 'temperature', 'vx', 'vy', 'moved')
+
     def __init__(self, x, y, particle_type):
+        self.reset(x, y, particle_type)
+
+    def reset(self, x, y, particle_type):
         self.x = x
         self.y = y
-        self.type = particle_type
-        self.life = 100 if particle_type in ['fire', 'explosive'] else -1
-        self.temperature = 20  # celisuz
-        self.velocity = np.array([0.0, 0.0])  # [vx, vy]
-
-    def update(self, grid, world):
-        update_method = getattr(self, f"update_{self.type}", None)
+        # the tick it last moved on, so the row scan does not update it again where it lands
+        self.moved = -1
+        self.temperature = AMBIENT_TEMPERATURE
+        self.transform(material_id(particle_type) if isinstance(particle_type, str) else int(particle_type))
+
+    def transform(self, material):
+        # Changes what the particle is but keeps its heat, as a phase change does.
+        self.material = int(material)
+        self.life = int(initial_life(self.material))
+        self.vx = 0.0
+        self.vy = 0.0
+
+    def respawn(self, material):
+        self.temperature = AMBIENT_TEMPERATURE
+        self.transform(material)
+
+    @property
+    def type(self):
+        return MATERIAL_NAMES[self.material]
+
+    def update(self, grid, world, u):
+        update_method = RULES.get(self.material)
         if update_method:
-            update_method(grid, world)
-        self.apply_temperature_effects(grid, world)
-
-    def update_sand(self, grid, world):
+            update_method(self, grid, world, u)
+
+    def phase_product(self):
+        if self.temperature >= PHASE_TEMPERATURE[self.material]:
+            return PHASE_ABOVE[self.material]
+        return PHASE_BELOW[self.material]
+
+    def slide_reach(self, grid, world, dx):
+        reach = 0
+        while reach < DISPERSION[self.material]:
+            new_x = self.x + dx * (reach + 1)
+            if not 0 <= new_x < world.width or grid[self.y, new_x] is not None:
+                break
+            reach += 1
+            if self.y + 1 < world.height and grid[self.y + 1, new_x] is None:
+                break
+        return reach
+
+    def update_sand(self, grid, world, u):
         if self.y + 1 < world.height:
             if grid[self.y + 1, self.x] is None:
                 grid[self.y, self.x], grid[self.y + 1, self.x] = None, self
                 self.y += 1
-            elif grid[self.y + 1, self.x].type in ['water', 'steam']:
-                grid[self.y, self.x], grid[self.y + 1, self.x] = grid[self.y + 1, self.x], self
+            elif SINKS[self.material, grid[self.y + 1, self.x].material]:
+                below = grid[self.y + 1, self.x]
+                grid[self.y, self.x], grid[self.y + 1, self.x] = below, self
+                below.y = self.y
                 self.y += 1
             else:
                 for dx in [-1, 1]:
@@ -32,14 +78,15 @@ class Particle:
                         self.x += dx
                         break
 
-    def update_water(self, grid, world):
-        if self.temperature >= 100:
-            grid[self.y, self.x] = Particle(self.x, self.y, 'steam')
+    def update_water(self, grid, world, u):
+        product = self.phase_product()
+        if product != NONE:
+            self.transform(product)
             return
 
 
-        self.velocity[1] += 0.1
-        new_y = int(self.y + self.velocity[1])
+        self.vy += 0.1
+        new_y = int(self.y + self.vy)
 
 
         if new_y < world.height and grid[new_y, self.x] is None:
@@ -47,8 +94,7 @@ class Particle:
             self.y = new_y
         else:
 
-            diag_dirs = [(-1, 1), (1, 1)]
-            random.shuffle(diag_dirs)
+            diag_dirs = [(-1, 1), (1, 1)] if u[0] < 0.5 else [(1, 1), (-1, 1)]
             moved = False
             for dx, dy in diag_dirs:
                 new_x, new_y = self.x + dx, self.y + dy
@@ -60,107 +106,131 @@ class Particle:
 
             if not moved:
 
-                horizontal_dirs = [-1, 1]
-                random.shuffle(horizontal_dirs)
+                horizontal_dirs = [-1, 1] if u[1] < 0.5 else [1, -1]
                 for dx in horizontal_dirs:
-                    new_x = self.x + dx
-                    if 0 <= new_x < world.width and grid[self.y, new_x] is None:
+                    reach = self.slide_reach(grid, world, dx)
+                    if reach:
+                        new_x = self.x + dx * reach
                         grid[self.y, self.x], grid[self.y, new_x] = None, self
                         self.x = new_x
                         break
 
 
-                self.velocity[1] = 0
+                self.vy = 0.0
 
 
-        self.velocity *= 0.9
+        self.vx *= WATER_DAMPING
+        self.vy *= WATER_DAMPING
 
-    def update_fire(self, grid, world):
+    def update_fire(self, grid, world, u):
         self.life -= 1
         if self.life <= 0:
-            grid[self.y, self.x] = Particle(self.x, self.y, 'smoke')
+            self.respawn(SMOKE)
             return
 
         for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
             nx, ny = self.x + dx, self.y + dy
             if 0 <= nx < world.width and 0 <= ny < world.height:
-                if grid[ny, nx]:
-                    if grid[ny, nx].type == 'wood':
-                        grid[ny, nx] = Particle(nx, ny, 'fire')
-                    elif grid[ny, nx].type == 'water':
-                        self.life = 0
-                        grid[self.y, self.x] = Particle(self.x, self.y, 'steam')
+                neighbour = grid[ny, nx]
+                if neighbour:
+                    product = NEIGHBOUR_PRODUCT[self.material, neighbour.material]
+                    if product == DETONATE:
+                        neighbour.life = 0
+                    elif product != NONE:
+                        neighbour.respawn(product)
+                    product = SELF_PRODUCT[self.material, neighbour.material]
+                    if product != NONE:
+                        self.respawn(product)
                         return
 
-        if random.random() < 0.1 and self.y > 0 and grid[self.y - 1, self.x] is None:
-            grid[self.y - 1, self.x] = Particle(self.x, self.y - 1, 'smoke')
+        if u[0] < 0.1 and self.y > 0 and grid[self.y - 1, self.x] is None:
+            grid[self.y - 1, self.x] = world.pool.acquire(self.x, self.y - 1, SMOKE)
 
-    def update_smoke(self, grid, world):
-        if self.y > 0 and random.random() < 0.8:
-            directions = [(0, -1), (-1, -1), (1, -1)]
-            random.shuffle(directions)
+    def update_smoke(self, grid, world, u):
+        if self.y > 0 and u[0] < 0.8:
+            side = -1 if u[1] < 0.5 else 1
+            directions = _rotate([(0, -1), (side, -1), (-side, -1)], u[2])
             for dx, dy in directions:
                 nx, ny = self.x + dx, self.y + dy
                 if 0 <= nx < world.width and grid[ny, nx] is None:
                     grid[self.y, self.x], grid[ny, nx] = None, self
                     self.x, self.y = nx, ny
                     return
-        elif random.random() < 0.05:
+        elif u[3] < 0.05:
             grid[self.y, self.x] = None
+            world.pool.release(self)
 
-    def update_steam(self, grid, world):
-        if self.temperature < 100:
-            grid[self.y, self.x] = Particle(self.x, self.y, 'water')
+    def update_steam(self, grid, world, u):
+        product = self.phase_product()
+        if product != NONE:
+            self.transform(product)
             return
 
-        if self.y > 0 and random.random() < 0.8:
-            directions = [(0, -1), (-1, -1), (1, -1)]
-            random.shuffle(directions)
+        if self.y > 0 and u[0] < 0.8:
+            side = -1 if u[1] < 0.5 else 1
+            directions = _rotate([(0, -1), (side, -1), (-side, -1)], u[2])
             for dx, dy in directions:
                 nx, ny = self.x + dx, self.y + dy
                 if 0 <= nx < world.width and grid[ny, nx] is None:
                     grid[self.y, self.x], grid[ny, nx] = None, self
                     self.x, self.y = nx, ny
                     return
-        elif random.random() < 0.05:
+        elif u[3] < 0.05:
             grid[self.y, self.x] = None
+            world.pool.release(self)
 
-    def update_plant(self, grid, world):
-        if random.random() < 0.01:  # grow
-            directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-            random.shuffle(directions)
-            for dx, dy in directions:
-                nx, ny = self.x + dx, self.y + dy
-                if 0 <= nx < world.width and 0 <= ny < world.height:
-                    if grid[ny, nx] is None and random.random() < 0.2:
-                        grid[ny, nx] = Particle(nx, ny, 'plant')
-                        break
+    def grow(self, grid, world, u):
+        # fired by the world's schedule rather than rolled for every tick
+        directions = _rotate([(-1, 0), (1, 0), (0, -1), (0, 1)], u[1])
+        for i, (dx, dy) in enumerate(directions):
+            nx, ny = self.x + dx, self.y + dy
+            if 0 <= nx < world.width and 0 <= ny < world.height:
+                if grid[ny, nx] is None and u[2 + i] < 0.2:
+                    grid[ny, nx] = world.pool.acquire(nx, ny, PLANT)
+                    break
 
-    def update_explosive(self, grid, world):
+    def update_explosive(self, grid, world, u):
         self.life -= 1
         if self.life <= 0:
-            self.explode(grid, world)
-
-    def explode(self, grid, world):
-        radius = 5
-        for dy in range(-radius, radius + 1):
-            for dx in range(-radius, radius + 1):
-                if dx*dx + dy*dy <= radius*radius:
-                    nx, ny = self.x + dx, self.y + dy
-                    if 0 <= nx < world.width and 0 <= ny < world.height:
-                        if grid[ny, nx] is None or grid[ny, nx].type != 'rock':
-                            grid[ny, nx] = Particle(nx, ny, 'fire')
-
-    def apply_temperature_effects(self, grid, world):
-        neighbors = [
-            grid[y, x] for y in range(max(0, self.y - 1), min(world.height, self.y + 2))
-            for x in range(max(0, self.x - 1), min(world.width, self.x + 2))
-            if grid[y, x] is not None
-        ]
-        if neighbors:
-            self.temperature = (self.temperature + sum(n.temperature for n in neighbors)) / (len(neighbors) + 1)
-
-        if self.type == 'water' and self.temperature >= 100:
-            grid[self.y, self.x] = Particle(self.x, self.y, 'steam')
-        elif self.type == 'steam' and self.temperature < 100:
-            grid[self.y, self.x] = Particle(self.x, self.y, 'water')
+            world.detonations.append((self.y, self.x))
+
+
+class ParticlePool:
+    def __init__(self, watch=()):
+        self.free = []
+        self.acquired = 0
+        self.released = 0
+        # new particles of these materials are kept in born for the world to schedule
+        self.watch = watch
+        self.born = []
+
+    def acquire(self, x, y, particle_type):
+        self.acquired += 1
+        if self.free:
+            particle = self.free.pop()
+            particle.reset(x, y, particle_type)
+        else:
+            particle = Particle(x, y, particle_type)
+        if particle.material in self.watch:
+            self.born.append(particle)
+        return particle
+
+    def release(self, particle):
+        if particle is not None:
+            self.released += 1
+            self.free.append(particle)
+
+    def release_all(self, particles):
+        count = len(self.free)
+        self.free.extend(particle for particle in particles if particle is not None)
+        self.released += len(self.free) - count
+
+
+RULES = {
+    SAND: Particle.update_sand,
+    WATER: Particle.update_water,
+    FIRE: Particle.update_fire,
+    SMOKE: Particle.update_smoke,
+    STEAM: Particle.update_steam,
+    EXPLOSIVE: Particle.update_explosive,
+}
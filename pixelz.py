@@ -187,6 +187,7 @@ class Particle:
 class World:
     def __init__(self):
         self.grid = np.full((GRID_HEIGHT, GRID_WIDTH), None, dtype=object)
+        self.particle_surface = pygame.Surface((WIDTH, HEIGHT))
 
     def add_particle(self, x, y, particle_type):
         grid_x, grid_y = x // CELL_SIZE, y // CELL_SIZE
@@ -201,7 +202,7 @@ class World:
                     self.grid[y][x].update(self.grid, self)
 
     def draw(self, screen):
-        particle_surface = pygame.Surface((WIDTH, HEIGHT))
+        particle_surface = self.particle_surface
         particle_surface.fill(BLACK)
         for y in range(GRID_HEIGHT):
             for x in range(GRID_WIDTH):
@@ -0,0 +1,123 @@
+import collections
+import contextlib
+import csv
+import json
+import time
+
+HISTORY = 240
+COUNTS = ('updated', 'moved', 'created', 'destroyed')
+
+
+class TickStats:
+    def __init__(self, tick):
+        self.tick = tick
+        self.phases = collections.Counter()
+        # seconds per material rule on the object backend, per kernel on the array one
+        self.rules = collections.Counter()
+        self.counts = collections.Counter()
+
+    @property
+    def total(self):
+        return sum(self.phases.values())
+
+    def population(self, before, after):
+        before, after = int(before), int(after)
+        if after > before:
+            self.counts['created'] += after - before
+        else:
+            self.counts['destroyed'] += before - after
+
+    def row(self):
+        row = {'tick': self.tick, 'total': self.total}
+        row.update((f"phase.{name}", seconds) for name, seconds in self.phases.items())
+        row.update((f"rule.{name}", seconds) for name, seconds in self.rules.items())
+        row.update((name, int(self.counts[name])) for name in COUNTS)
+        return row
+
+
+class Profiler:
+    def __init__(self, history=HISTORY, keep=False):
+        self.history = collections.deque(maxlen=history)
+        self.samples = collections.defaultdict(lambda: collections.deque(maxlen=history))
+        self.hooks = []
+        self.log = [] if keep else None
+        self.current = None
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def begin(self, tick):
+        self.current = TickStats(tick)
+        return self.current
+
+    def end(self):
+        stats, self.current = self.current, None
+        self.history.append(stats)
+        if self.log is not None:
+            self.log.append(stats.row())
+        for hook in self.hooks:
+            hook(stats)
+        return stats
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current.phases[name] += time.perf_counter() - start
+
+    @contextlib.contextmanager
+    def rule(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current.rules[name] += time.perf_counter() - start
+
+    def sample(self, name, seconds):
+        # timings that happen outside a tick, like drawing a frame
+        self.samples[name].append(seconds)
+
+    def recent(self):
+        # list() copies the deque in one step, so readers on another thread
+        # never iterate it while the simulation is appending
+        return list(self.history)
+
+    def series(self, name):
+        if name in self.samples:
+            return list(self.samples[name])
+        if name == 'total':
+            return [stats.total for stats in self.recent()]
+        return [stats.phases[name] for stats in self.recent()]
+
+    def rule_totals(self):
+        totals = collections.Counter()
+        for stats in self.recent():
+            totals.update(stats.rules)
+        return totals
+
+    def count_averages(self):
+        recent = self.recent()
+        ticks = max(len(recent), 1)
+        return {name: sum(stats.counts[name] for stats in recent) / ticks for name in COUNTS}
+
+
+def phase(profiler, name):
+    return profiler.phase(name) if profiler is not None else contextlib.nullcontext()
+
+
+def save_log(rows, filename):
+    if filename.endswith('.csv'):
+        fields = list(dict.fromkeys(key for row in rows for key in row))
+        with open(filename, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fields, restval=0)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(filename, 'w') as f:
+            json.dump(rows, f, indent=2)
@@ -0,0 +1,193 @@
+import bisect
+import queue
+import struct
+import threading
+import zlib
+import numpy as np
+import savefile
+
+MAGIC = b'PXLR'
+VERSION = 1
+KEYFRAME = 0
+DELTA = 1
+KEYFRAME_EVERY = 300
+TEMPERATURE_TOLERANCE = 0.01
+QUEUE_SIZE = 64
+
+_HEADER = struct.Struct('<4sHII')
+_FRAME = struct.Struct('<IBI')
+_COUNT = struct.Struct('<I')
+
+
+class Recorder:
+    def __init__(self, world, filename, keyframe_every=KEYFRAME_EVERY, temperature_tolerance=TEMPERATURE_TOLERANCE):
+        self.world = world
+        self.keyframe_every = keyframe_every
+        self.temperature_tolerance = temperature_tolerance
+        self.tick = 0
+        self.bytes_written = 0
+        self.file = open(filename, 'wb')
+        self._write(_HEADER.pack(MAGIC, VERSION, world.width, world.height))
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.writer = threading.Thread(target=self._drain, daemon=True)
+        self.writer.start()
+        self.reference = None
+        self.keyframe()
+
+    def _write(self, data):
+        self.file.write(data)
+        self.bytes_written += len(data)
+
+    def _drain(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            tick, kind, data = item
+            if kind == KEYFRAME:
+                payload = savefile.encode(dict(zip(savefile.PLANE_NAMES, data)), level=1)
+            else:
+                payload = zlib.compress(data, 1)
+            self._write(_FRAME.pack(tick, kind, len(payload)))
+            self._write(payload)
+
+    def keyframe(self):
+        planes = [p.copy() for p in self.world.planes()]
+        self.queue.put((self.tick, KEYFRAME, planes))
+        self.reference = [p.copy() for p in planes[:3]]
+
+    def capture(self):
+        self.tick += 1
+        if self.keyframe_every and self.tick % self.keyframe_every == 0:
+            self.keyframe()
+            return
+        planes = self.world.planes()[:3]
+        index = np.concatenate([self._changed(planes, region) for region in self._regions()])
+
+        values = [index.astype(np.uint32)]
+        for current, ref in zip(planes, self.reference):
+            flat = current.reshape(-1)[index]
+            ref.reshape(-1)[index] = flat
+            values.append(flat)
+        payload = _COUNT.pack(len(index)) + b''.join(v.astype(v.dtype.newbyteorder('<')).tobytes() for v in values)
+        self.queue.put((self.tick, DELTA, payload))
+
+    def _regions(self):
+        chunks = getattr(self.world, 'chunks', None)
+        if chunks is None:
+            return [(0, self.world.height, 0, self.world.width)]
+        return chunks.regions(margin=0) or [(0, 0, 0, 0)]
+
+    def _changed(self, planes, region):
+        y0, y1, x0, x1 = region
+        material, temperature, life = (p[y0:y1, x0:x1] for p in planes)
+        ref_material, ref_temperature, ref_life = (p[y0:y1, x0:x1] for p in self.reference)
+        changed = (material != ref_material) | (life != ref_life)
+        changed |= np.abs(temperature - ref_temperature) > self.temperature_tolerance
+        ys, xs = np.nonzero(changed)
+        return (ys + y0) * self.world.width + xs + x0
+
+    def close(self):
+        if not self.file.closed:
+            self.queue.put(None)
+            self.writer.join()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def decode_delta(payload):
+    data = zlib.decompress(payload)
+    (count,) = _COUNT.unpack_from(data)
+    offset = _COUNT.size
+    arrays = []
+    for dtype in ('<u4', '<u1', '<f4', '<i2'):
+        dtype = np.dtype(dtype)
+        arrays.append(np.frombuffer(data, dtype=dtype, count=count, offset=offset))
+        offset += count * dtype.itemsize
+    return arrays
+
+
+class Player:
+    def __init__(self, filename):
+        self.file = open(filename, 'rb')
+        magic, version, self.width, self.height = _HEADER.unpack(self.file.read(_HEADER.size))
+        if magic != MAGIC:
+            raise savefile.SaveFormatError("not a recording")
+        if version > VERSION:
+            raise savefile.SaveFormatError(f"recording version {version} is newer than supported version {VERSION}")
+        self.frames = []
+        self.ticks = []
+        self.keyframes = []
+        self._index()
+        self.tick = None
+        self.material = self.temperature = self.life = None
+
+    def _index(self):
+        end = self.file.seek(0, 2)
+        offset = _HEADER.size
+        while offset + _FRAME.size <= end:
+            self.file.seek(offset)
+            tick, kind, size = _FRAME.unpack(self.file.read(_FRAME.size))
+            offset += _FRAME.size
+            if offset + size > end:
+                break
+            if kind == KEYFRAME:
+                self.keyframes.append(len(self.frames))
+            self.frames.append((tick, kind, offset, size))
+            self.ticks.append(tick)
+            offset += size
+
+    @property
+    def last_tick(self):
+        return self.frames[-1][0] if self.frames else None
+
+    def _payload(self, frame):
+        self.file.seek(frame[2])
+        return self.file.read(frame[3])
+
+    def _apply(self, position):
+        frame = self.frames[position]
+        if frame[1] == KEYFRAME:
+            _, planes = savefile.decode(self._payload(frame))
+            self.material = planes['material']
+            self.temperature = planes['temperature']
+            self.life = planes['life']
+        else:
+            index, material, temperature, life = decode_delta(self._payload(frame))
+            self.material.reshape(-1)[index] = material
+            self.temperature.reshape(-1)[index] = temperature
+            self.life.reshape(-1)[index] = life
+        self.tick = frame[0]
+        self.position = position
+
+    def seek(self, tick):
+        target = max(bisect.bisect_right(self.ticks, tick) - 1, 0)
+        start = self.keyframes[bisect.bisect_right(self.keyframes, target) - 1]
+        if self.tick is not None and start <= self.position <= target:
+            start = self.position + 1
+        for position in range(start, target + 1):
+            self._apply(position)
+        return self.material, self.temperature, self.life
+
+    def play(self, start=0, end=None):
+        self.seek(start)
+        yield self.tick, self.material, self.temperature, self.life
+        for position in range(self.position + 1, len(self.frames)):
+            if end is not None and self.frames[position][0] > end:
+                break
+            self._apply(position)
+            yield self.tick, self.material, self.temperature, self.life
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,71 @@
+import numpy as np
+import pygame
+from materials import MATERIAL_COLORS, AMBIENT_TEMPERATURE
+from palette import build_palette, build_heat_palette, heat_bin
+
+
+class Renderer:
+    def __init__(self, width, height, cell_size, colors=MATERIAL_COLORS):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.palette = build_palette(colors)
+        self.heat_palette = build_heat_palette(self.palette)
+        self.ambient_bins = np.full((height, width), heat_bin(AMBIENT_TEMPERATURE), dtype=np.intp)
+        self.grid_surface = pygame.Surface((width, height))
+        self.surface = pygame.Surface((width * cell_size, height * cell_size))
+
+    def colorize(self, world, heat=False):
+        bins = heat_bin(world.temperature_grid()) if heat else self.ambient_bins
+        return self.heat_palette[world.material_grid(), bins]
+
+    def render(self, world, heat=False):
+        pygame.surfarray.blit_array(self.grid_surface, self.colorize(world, heat).swapaxes(0, 1))
+        pygame.transform.scale(self.grid_surface, self.surface.get_size(), self.surface)
+        return self.surface
+
+
+class ProfilerOverlay:
+    SERIES = (('total', (255, 255, 255)), ('rules', (255, 210, 0)), ('temperature', (255, 80, 40)),
+              ('render', (0, 200, 255)))
+    FRAME_BUDGET = 1000 / 60
+
+    def __init__(self, profiler, width=280, height=220):
+        self.profiler = profiler
+        self.surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        self.font = pygame.font.Font(None, 18)
+        self.graph = pygame.Rect(6, 6, width - 12, 70)
+
+    def _text(self, text, y, color=(255, 255, 255), column=0):
+        self.surface.blit(self.font.render(text, True, color), (6 + column * self.graph.width // 2, y))
+
+    def draw(self, screen, position):
+        profiler = self.profiler
+        self.surface.fill((0, 0, 0, 170))
+        series = {name: [s * 1000 for s in profiler.series(name)] for name, _ in self.SERIES}
+        peak = max([self.FRAME_BUDGET] + [max(values) for values in series.values() if values])
+        graph = self.graph
+        budget_y = graph.bottom - graph.height * self.FRAME_BUDGET / peak
+        pygame.draw.line(self.surface, (90, 90, 90), (graph.left, budget_y), (graph.right, budget_y))
+        for name, color in self.SERIES:
+            values = series[name]
+            if len(values) > 1:
+                step = graph.width / (profiler.history.maxlen - 1)
+                points = [(graph.left + i * step, graph.bottom - graph.height * v / peak) for i, v in enumerate(values)]
+                pygame.draw.lines(self.surface, color, False, points)
+
+        y = graph.bottom + 4
+        for i, (name, color) in enumerate(self.SERIES):
+            last = series[name][-1] if series[name] else 0.0
+            self._text(f"{name} {last:.1f}ms", y + (i // 2) * 14, color, i % 2)
+        y += 14
+        rules = profiler.rule_totals()
+        spent = sum(rules.values()) or 1.0
+        ticks = max(len(profiler.history), 1)
+        for name, seconds in rules.most_common(4):
+            y += 14
+            self._text(f"{name:>10} {100 * seconds / spent:5.1f}%  {1000 * seconds / ticks:.2f}ms", y, (255, 210, 0))
+        y += 18
+        for i, (name, value) in enumerate(profiler.count_averages().items()):
+            self._text(f"{name} {value:.0f}", y + (i // 2) * 14, column=i % 2)
+        screen.blit(self.surface, position)
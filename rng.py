@@ -0,0 +1,36 @@
+import numpy as np
+
+# uniform draws handed to each cell's rule per tick
+CELL_DRAWS = 6
+
+
+class WorldRandom:
+    def __init__(self, seed=None):
+        self.entropy = np.random.SeedSequence(seed).entropy
+        self.generator = keyed(self.entropy)
+
+    def bytes(self, count):
+        return self.generator.bytes(count)
+
+    def random(self, size=None):
+        return self.generator.random(size)
+
+    def geometric(self, p, size=None):
+        return self.generator.geometric(p, size)
+
+    def stream(self, *key):
+        return keyed(self.entropy, *key)
+
+    def snapshot(self):
+        return {'entropy': self.entropy, 'state': self.generator.bit_generator.state}
+
+    def restore(self, snapshot):
+        self.entropy = snapshot['entropy']
+        self.generator = keyed(self.entropy)
+        self.generator.bit_generator.state = snapshot['state']
+
+
+def keyed(entropy, *key):
+    # Streams for the same entropy and distinct keys are independent, so a
+    # worker can rebuild the stream for (tick, strip) without sharing state.
+    return np.random.Generator(np.random.PCG64(np.random.SeedSequence(entropy, spawn_key=key)))
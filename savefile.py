@@ -0,0 +1,86 @@
+import json
+import os
+import struct
+import zlib
+import numpy as np
+
+MAGIC = b'PXLZ'
+VERSION = 1
+COMPRESSION_LEVEL = 6
+PLANES = (
+    ('material', np.uint8),
+    ('temperature', np.float32),
+    ('life', np.int16),
+    ('vx', np.float32),
+    ('vy', np.float32),
+)
+PLANE_NAMES = tuple(name for name, _ in PLANES)
+# written when a world has them; files without them still load
+OPTIONAL_PLANES = (
+    ('event', np.int32),
+)
+
+_HEADER = struct.Struct('<4sHI')
+
+
+class SaveFormatError(ValueError):
+    pass
+
+
+def is_json_name(filename):
+    return str(filename).lower().endswith('.json')
+
+
+def is_binary(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def encode(planes, meta=None, level=COMPRESSION_LEVEL):
+    height, width = planes['material'].shape
+    blobs = []
+    entries = []
+    for name, dtype in PLANES + tuple(plane for plane in OPTIONAL_PLANES if plane[0] in planes):
+        data = np.ascontiguousarray(planes[name], dtype=np.dtype(dtype).newbyteorder('<'))
+        blob = zlib.compress(data, level)
+        entries.append({'name': name, 'dtype': data.dtype.str, 'size': len(blob)})
+        blobs.append(blob)
+    header = dict(meta or {}, width=width, height=height, planes=entries)
+    header_bytes = json.dumps(header).encode('utf-8')
+    return b''.join([_HEADER.pack(MAGIC, VERSION, len(header_bytes)), header_bytes] + blobs)
+
+
+def decode(data):
+    if len(data) < _HEADER.size:
+        raise SaveFormatError("truncated save file")
+    magic, version, header_size = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SaveFormatError("not a binary save file")
+    if version > VERSION:
+        raise SaveFormatError(f"save format version {version} is newer than supported version {VERSION}")
+    offset = _HEADER.size
+    header = json.loads(data[offset:offset + header_size].decode('utf-8'))
+    offset += header_size
+
+    shape = (header['height'], header['width'])
+    planes = {}
+    for entry in header['planes']:
+        blob = data[offset:offset + entry['size']]
+        offset += entry['size']
+        plane = np.frombuffer(zlib.decompress(blob), dtype=np.dtype(entry['dtype']))
+        planes[entry['name']] = plane.reshape(shape).astype(dict(PLANES).get(entry['name'], plane.dtype))
+    return header, planes
+
+
+def write(filename, planes, meta=None, level=COMPRESSION_LEVEL):
+    # Written beside the target and renamed over it, so a crash or a reader
+    # never sees half a save.
+    temporary = f"{filename}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(encode(planes, meta, level))
+    os.replace(temporary, filename)
+
+
+def read(filename):
+    with open(filename, 'rb') as f:
+        return decode(f.read())
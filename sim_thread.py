@@ -0,0 +1,148 @@
+import queue
+import threading
+import time
+import numpy as np
+from brush import FILL
+
+TICK_RATE = 60
+MAX_LAG_TICKS = 5
+
+
+class Frame:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.material = np.zeros((height, width), dtype=np.uint8)
+        self.temperature = np.zeros((height, width), dtype=np.float32)
+        self.tick = -1
+
+    def material_grid(self):
+        return self.material
+
+    def temperature_grid(self):
+        return self.temperature
+
+
+class FrameBuffer:
+    # Triple buffer: the simulation fills one frame while the renderer holds
+    # another, and the third is the newest finished frame waiting to be picked up.
+    def __init__(self, width, height, count=3):
+        self.frames = [Frame(width, height) for _ in range(count)]
+        self.writing, self.ready, self.reading = 0, 1, 2
+        self.fresh = False
+        self.lock = threading.Lock()
+
+    def publish(self, material, temperature, tick):
+        frame = self.frames[self.writing]
+        if frame.material.shape != material.shape:
+            self.frames[self.writing] = frame = Frame(material.shape[1], material.shape[0])
+        np.copyto(frame.material, material)
+        np.copyto(frame.temperature, temperature)
+        frame.tick = tick
+        with self.lock:
+            self.writing, self.ready = self.ready, self.writing
+            self.fresh = True
+
+    def acquire(self):
+        with self.lock:
+            if self.fresh:
+                self.reading, self.ready = self.ready, self.reading
+                self.fresh = False
+            return self.frames[self.reading]
+
+
+class SimulationThread:
+    def __init__(self, world, tick_rate=TICK_RATE, buffers=3, checkpointer=None, view=None):
+        self.world = world
+        self.tick_rate = tick_rate
+        self.checkpointer = checkpointer
+        # (x0, y0, x1, y1) of the part of the world published for drawing
+        self.view = view or (0, 0, world.width, world.height)
+        self.frames = FrameBuffer(self.view[2] - self.view[0], self.view[3] - self.view[1], buffers)
+        self.commands = queue.SimpleQueue()
+        self.ticks = 0
+        self.ticks_per_sec = 0.0
+        self.error = None
+        self.paused = False
+        self.stopping = threading.Event()
+        self.publish()
+        self.thread = threading.Thread(target=self.run, name='simulation', daemon=True)
+        self.thread.start()
+
+    def submit(self, method, *args, **kwargs):
+        self.commands.put((method, args, kwargs))
+
+    def paint(self, cells, particle_type=None, mode=FILL):
+        self.submit('paint', cells, particle_type, mode)
+
+    def save(self, filename):
+        self.submit(self.checkpointer.save if self.checkpointer else 'save', filename)
+
+    def load(self, filename):
+        self.submit(self._load, filename)
+
+    def _load(self, filename):
+        if self.checkpointer:
+            self.checkpointer.flush()
+        self.world.load(filename)
+
+    def look(self, x0, y0, x1, y1):
+        self.view = (x0, y0, x1, y1)
+
+    def publish(self):
+        visible = self.world.viewport(*self.view)
+        self.frames.publish(visible.material_grid(), visible.temperature_grid(), self.ticks)
+
+    def latest(self):
+        if self.error is not None:
+            raise RuntimeError("simulation thread failed") from self.error
+        return self.frames.acquire()
+
+    def _drain(self):
+        while True:
+            try:
+                method, args, kwargs = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            if not callable(method):
+                method = getattr(self.world, method)
+            method(*args, **kwargs)
+
+    def run(self):
+        step = 1.0 / self.tick_rate if self.tick_rate else 0.0
+        deadline = time.perf_counter()
+        window_start, window_ticks = deadline, 0
+        try:
+            while not self.stopping.is_set():
+                self._drain()
+                if not self.paused:
+                    self.world.update()
+                    if self.checkpointer:
+                        self.checkpointer.step()
+                    self.ticks += 1
+                    window_ticks += 1
+                self.publish()
+
+                now = time.perf_counter()
+                if now - window_start >= 1.0:
+                    self.ticks_per_sec = window_ticks / (now - window_start)
+                    window_start, window_ticks = now, 0
+                deadline += step
+                if now - deadline > step * MAX_LAG_TICKS:
+                    # Too far behind to catch up; run flat out instead of bursting.
+                    deadline = now
+                elif deadline > now:
+                    self.stopping.wait(deadline - now)
+        except Exception as error:
+            self.error = error
+
+    def close(self):
+        self.stopping.set()
+        self.thread.join()
+        self._drain()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
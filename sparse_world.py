@@ -0,0 +1,434 @@
+import collections
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import brush
+import cell_rules
+import explosions
+import thermal
+import savefile
+from array_world import SCHEDULED, Viewport, apply_rules, paint_cells
+from chunks import ChunkTracker
+from events import Schedule
+from profiling import phase
+from rng import WorldRandom
+from materials import EMPTY, PLANT, AMBIENT_TEMPERATURE, material_id, material_name
+
+STORAGE_CHUNK = 64
+MEMORY_BUDGET = 256 * 2 ** 20
+# largest area stepped as one window; bigger awake regions are cut into tiles
+TILE = 512
+HALO = max(8, explosions.MAX_RADIUS)
+CHUNK_DTYPE = np.dtype(list(savefile.PLANES))
+BLANK = (EMPTY, AMBIENT_TEMPERATURE, -1, 0.0, 0.0)
+
+
+def blank_planes(height, width, count=len(BLANK)):
+    return tuple(np.full((height, width), value, dtype=dtype)
+                 for value, (_, dtype) in zip(BLANK[:count], savefile.PLANES))
+
+
+def overlaps(size, y0, y1, x0, x1):
+    # (chunk key, slices inside the chunk, slices inside the y0..y1, x0..x1 box)
+    for cy in range(y0 // size, (y1 - 1) // size + 1):
+        for cx in range(x0 // size, (x1 - 1) // size + 1):
+            top, left = cy * size, cx * size
+            a0, a1 = max(y0, top), min(y1, top + size)
+            b0, b1 = max(x0, left), min(x1, left + size)
+            yield ((cy, cx), (slice(a0 - top, a1 - top), slice(b0 - left, b1 - left)),
+                   (slice(a0 - y0, a1 - y0), slice(b0 - x0, b1 - x0)))
+
+
+class ChunkStore:
+    def __init__(self, size=STORAGE_CHUNK, memory_budget=MEMORY_BUDGET, directory=None):
+        self.size = size
+        self.limit = max(memory_budget // (size * size * CHUNK_DTYPE.itemsize), 1)
+        self.resident = collections.OrderedDict()
+        self.paged = {}
+        self.directory = directory
+        self.owns_directory = directory is None
+
+    def __len__(self):
+        return len(self.resident) + len(self.paged)
+
+    def keys(self):
+        return list(self.resident) + list(self.paged)
+
+    def get(self, key, create=False):
+        if key in self.resident:
+            self.resident.move_to_end(key)
+            return self.resident[key]
+        if key in self.paged:
+            planes = self.page_in(key)
+        elif create:
+            planes = blank_planes(self.size, self.size)
+        else:
+            return None
+        self.resident[key] = planes
+        while len(self.resident) > self.limit:
+            self.page_out(*self.resident.popitem(last=False))
+        return planes
+
+    def peek(self, key):
+        # Read without paging in or touching the LRU order.
+        if key in self.resident:
+            return self.resident[key]
+        records = np.memmap(self.paged[key], dtype=CHUNK_DTYPE, mode='r', shape=(self.size, self.size))
+        return tuple(records[name] for name in savefile.PLANE_NAMES)
+
+    def page_out(self, key, planes):
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix='pixelz-pages-')
+        os.makedirs(self.directory, exist_ok=True)
+        filename = os.path.join(self.directory, f"{key[0]}_{key[1]}.chunk")
+        records = np.memmap(filename, dtype=CHUNK_DTYPE, mode='w+', shape=(self.size, self.size))
+        for name, plane in zip(savefile.PLANE_NAMES, planes):
+            records[name] = plane
+        records.flush()
+        self.paged[key] = filename
+
+    def page_in(self, key):
+        planes = tuple(np.array(plane) for plane in self.peek(key))
+        os.remove(self.paged.pop(key))
+        return planes
+
+    def free(self, key):
+        self.resident.pop(key, None)
+        if key in self.paged:
+            os.remove(self.paged.pop(key))
+
+    def clear(self):
+        for key in self.keys():
+            self.free(key)
+
+    def close(self):
+        self.clear()
+        if self.owns_directory and self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+
+class SparseWorld:
+    def __init__(self, width, height, kernels='vector', seed=None, memory_budget=MEMORY_BUDGET,
+                 page_directory=None):
+        self.kernels = kernels
+        self.tick = 0
+        self.random = WorldRandom(seed)
+        self.profiler = None
+        self.store = ChunkStore(STORAGE_CHUNK, memory_budget, page_directory)
+        # plant events per storage chunk, in chunk-local cell indices
+        self.schedules = {}
+        self.allocate(width, height)
+
+    def allocate(self, width, height):
+        self.width = width
+        self.height = height
+        self.store.clear()
+        self.schedules.clear()
+        self.chunks = ChunkTracker(width, height)
+        self.chunks.awake.fill(False)
+
+    def free(self, key):
+        # an emptied chunk holds no plants, so its pending events can go too
+        self.store.free(key)
+        self.schedules.pop(key, None)
+
+    def gather(self, y0, y1, x0, x1, count=len(BLANK)):
+        # count limits the copy to the leading planes, e.g. 2 for drawing
+        planes = blank_planes(y1 - y0, x1 - x0, count)
+        for key, inside, window in overlaps(self.store.size, y0, y1, x0, x1):
+            chunk = self.store.get(key)
+            if chunk is not None:
+                for out, plane in zip(planes, chunk):
+                    out[window] = plane[inside]
+        return planes
+
+    def scatter(self, planes, y0, x0, box):
+        # Write the box part of a window whose top left is (y0, x0) back into
+        # chunks, allocating chunks that gain particles and freeing emptied ones.
+        for key, inside, window in overlaps(self.store.size, *box):
+            window = (slice(window[0].start + box[0] - y0, window[0].stop + box[0] - y0),
+                      slice(window[1].start + box[2] - x0, window[1].stop + box[2] - x0))
+            chunk = self.store.get(key, create=bool(planes[0][window].any()))
+            if chunk is None:
+                continue
+            for plane, updated in zip(chunk, planes):
+                plane[inside] = updated[window]
+            if not chunk[0].any():
+                self.free(key)
+
+    def viewport(self, x0, y0, x1, y1):
+        return Viewport(self.gather(max(y0, 0), min(y1, self.height), max(x0, 0), min(x1, self.width), 2))
+
+    def add_particle(self, x, y, particle_type):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            size = self.store.size
+            chunk = self.store.get((y // size, x // size), create=True)
+            if chunk[0][y % size, x % size] == EMPTY:
+                cell_rules.spawn(chunk, x % size, y % size, material_id(particle_type))
+                self.chunks.wake(x, y)
+
+    def set_temperature(self, x, y, temperature):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            size = self.store.size
+            chunk = self.store.get((y // size, x // size))
+            if chunk is not None and chunk[0][y % size, x % size] != EMPTY:
+                chunk[1][y % size, x % size] = temperature
+                self.chunks.wake(x, y)
+
+    def erase(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            size = self.store.size
+            chunk = self.store.get((y // size, x // size))
+            if chunk is not None:
+                cell_rules.clear(chunk, x % size, y % size)
+                self.chunks.wake(x, y)
+                if not chunk[0].any():
+                    self.free((y // size, x // size))
+
+    def paint(self, cells, particle_type=None, mode=brush.FILL):
+        ys, xs = (np.asarray(c, dtype=np.intp) for c in cells)
+        size = self.store.size
+        keys = (ys // size) * (-(-self.width // size)) + xs // size
+        order = np.argsort(keys, kind='stable')
+        ys, xs, keys = ys[order], xs[order], keys[order]
+        starts = np.flatnonzero(np.diff(keys, prepend=-1))
+        woken = []
+        for start, stop in zip(starts.tolist(), np.append(starts[1:], len(keys)).tolist()):
+            key = (int(ys[start]) // size, int(xs[start]) // size)
+            chunk = self.store.get(key, create=mode != brush.ERASE)
+            if chunk is None:
+                continue
+            py, px = paint_cells(chunk, ys[start:stop] % size, xs[start:stop] % size, particle_type, mode)
+            woken.append((py + key[0] * size, px + key[1] * size))
+            if not chunk[0].any():
+                self.free(key)
+        if woken:
+            self.chunks.wake_cells(*(np.concatenate(cells) for cells in zip(*woken)))
+
+    # Dense copies of the whole world, for small worlds and tools written for
+    # ArrayWorld; rendering a big world should go through viewport().
+    def material_grid(self):
+        return self.gather(0, self.height, 0, self.width, 1)[0]
+
+    def temperature_grid(self):
+        return self.gather(0, self.height, 0, self.width, 2)[1]
+
+    def particle_count(self):
+        return sum(int(np.count_nonzero(self.store.peek(key)[0])) for key in self.store.keys())
+
+    def tiles(self):
+        for y0, y1, x0, x1 in self.chunks.regions(margin=0):
+            for ty in range(y0, y1, TILE):
+                for tx in range(x0, x1, TILE):
+                    own = (ty, min(ty + TILE, y1), tx, min(tx + TILE, x1))
+                    box = (max(own[0] - HALO, 0), min(own[1] + HALO, self.height),
+                           max(own[2] - HALO, 0), min(own[3] + HALO, self.width))
+                    yield own, box
+
+    def update(self):
+        # Tiles overlap by HALO so particles can cross tile edges. A tick-wide
+        # moved mask keeps a particle from moving twice, explosives only go off
+        # in the tile that owns them, and heat spreads in a second pass that
+        # only writes back owned cells.
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin(self.tick)
+        size = self.store.size
+        tiles = list(self.tiles())
+        moved = {}
+        befores = []
+        with phase(profiler, 'rules'):
+            for own, box in tiles:
+                y0, y1, x0, x1 = box
+                window = self.gather(*box)
+                befores.append(tuple(p.copy() for p in window[:3]))
+                mask = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+                for key, inside, part in overlaps(size, *box):
+                    if key in moved:
+                        mask[part] = moved[key][inside]
+                apply_rules(window, mask, self.kernels, self.random, SCHEDULED,
+                            own=(slice(own[0] - y0, own[1] - y0), slice(own[2] - x0, own[3] - x0)))
+                explosions.step(window, (own[0] - y0, own[1] - y0), self.random, (own[2] - x0, own[3] - x0))
+                self.scatter(window, y0, x0, box)
+                for key, inside, part in overlaps(size, *box):
+                    moved.setdefault(key, np.zeros((size, size), dtype=bool))[inside] = mask[part]
+        with phase(profiler, 'events'):
+            self.grow_plants(tiles)
+        updates = []
+        with phase(profiler, 'temperature'):
+            for (own, box), before in zip(tiles, befores):
+                window = self.gather(*box)
+                thermal.step(window)
+                self.scatter(window, box[0], box[2], own)
+                updates.append((box, before, window))
+        with phase(profiler, 'chunks'):
+            self.chunks.settle(updates)
+        if profiler is not None:
+            profiler.end()
+        self.tick += 1
+
+    def pending(self, y0, y1, x0, x1):
+        pending = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+        for key, inside, window in overlaps(self.store.size, y0, y1, x0, x1):
+            if key in self.schedules:
+                pending[window] = self.schedules[key].pending[inside]
+        return pending
+
+    def add_events(self, cells):
+        # cells are flat world indices; each goes to its chunk's schedule
+        size = self.store.size
+        ys, xs = np.divmod(np.unique(cells), self.width)
+        keys = (ys // size) * (-(-self.width // size)) + xs // size
+        for k in np.unique(keys).tolist():
+            chosen = keys == k
+            key = divmod(k, -(-self.width // size))
+            if key not in self.schedules:
+                self.schedules[key] = Schedule((size, size))
+            local = (ys[chosen] % size) * size + xs[chosen] % size
+            self.schedules[key].add(self.tick, local, self.random)
+
+    def grow_plants(self, tiles):
+        # Plants stay restless here, so every plant is inside some tile: due
+        # events fire in the tile that owns the cell, and plants with no event
+        # yet (painted, loaded or just grown) are scheduled.
+        size = self.store.size
+        due = [np.empty(0, dtype=np.intp)]
+        for key, schedule in sorted(self.schedules.items()):
+            ys, xs = np.divmod(schedule.due(self.tick), size)
+            due.append((ys + key[0] * size) * self.width + xs + key[1] * size)
+        ys, xs = np.divmod(np.sort(np.concatenate(due)), self.width)
+        found = []
+        for own, box in tiles:
+            y0, y1, x0, x1 = box
+            window = self.gather(*box)
+            inside = (ys >= own[0]) & (ys < own[1]) & (xs >= own[2]) & (xs < own[3])
+            cells = (ys[inside] - y0) * (x1 - x0) + xs[inside] - x0
+            cells = cells[window[0].reshape(-1)[cells] == PLANT]
+            grown = cell_rules.grow_plants(window, cells, self.random)
+            if len(grown):
+                self.scatter(window, y0, x0, box)
+                gy, gx = np.divmod(grown, x1 - x0)
+                found.append((gy + y0) * self.width + gx + x0)
+            oy, ox = own[0] - y0, own[2] - x0
+            plants = window[0][oy:oy + own[1] - own[0], ox:ox + own[3] - own[2]] == PLANT
+            py, px = np.nonzero(plants & ~self.pending(*own))
+            found.append((py + own[0]) * self.width + px + own[2])
+        if found:
+            self.add_events(np.concatenate(found))
+
+    def reschedule(self):
+        self.schedules.clear()
+        size = self.store.size
+        cells = [np.empty(0, dtype=np.intp)]
+        for key in self.store.keys():
+            ys, xs = np.nonzero(self.store.peek(key)[0] == PLANT)
+            cells.append((ys + key[0] * size) * self.width + xs + key[1] * size)
+        self.add_events(np.concatenate(cells))
+
+    def restore_events(self, key, events):
+        if (events >= 0).any():
+            self.schedules[key] = Schedule(events.shape)
+            self.schedules[key].restore(events)
+
+    def wake_occupied(self):
+        size = self.store.size
+        ys, xs = [], []
+        for key in self.store.keys():
+            cy, cx = np.nonzero(self.store.peek(key)[0])
+            ys.append(cy + key[0] * size)
+            xs.append(cx + key[1] * size)
+        if ys:
+            self.chunks.wake_cells(np.concatenate(ys), np.concatenate(xs))
+
+    def save(self, filename):
+        if savefile.is_json_name(filename):
+            self.save_json(filename)
+        else:
+            savefile.write(filename, *self.snapshot())
+
+    def snapshot(self):
+        # concatenate copies the chunks, so nothing here aliases the live store
+        keys = sorted(self.store.keys())
+        size = self.store.size
+        planes = {}
+        for i, (name, dtype) in enumerate(savefile.PLANES):
+            chunks = [self.store.peek(key)[i] for key in keys]
+            planes[name] = np.concatenate(chunks) if chunks else np.empty((0, size), dtype=dtype)
+        events = [self.schedules[key].snapshot() if key in self.schedules else np.full((size, size), -1, dtype=np.int32)
+                  for key in keys]
+        planes['event'] = np.concatenate(events) if events else np.empty((0, size), dtype=np.int32)
+        meta = {'tick': self.tick, 'random': self.random.snapshot(), 'chunks': self.chunks.snapshot(),
+                'sparse': {'width': self.width, 'height': self.height, 'size': size, 'keys': keys}}
+        return planes, meta
+
+    def load(self, filename):
+        if not savefile.is_binary(filename):
+            self.load_json(filename)
+            return
+        header, planes = savefile.read(filename)
+        sparse = header.get('sparse')
+        if sparse:
+            self.allocate(sparse['width'], sparse['height'])
+            size = sparse['size']
+            for i, (cy, cx) in enumerate(sparse['keys']):
+                cells = tuple(planes[name][i * size:(i + 1) * size] for name in savefile.PLANE_NAMES)
+                box = (cy * size, min((cy + 1) * size, self.height), cx * size, min((cx + 1) * size, self.width))
+                self.scatter(cells, cy * size, cx * size, box)
+                if 'event' in planes:
+                    self.restore_events((cy, cx), planes['event'][i * size:(i + 1) * size])
+        else:
+            self.allocate(header['width'], header['height'])
+            self.scatter(tuple(planes[name] for name in savefile.PLANE_NAMES), 0, 0, (0, self.height, 0, self.width))
+            if 'event' in planes:
+                size = self.store.size
+                for key, inside, window in overlaps(size, 0, self.height, 0, self.width):
+                    events = np.full((size, size), -1, dtype=np.int32)
+                    events[inside] = planes['event'][window]
+                    self.restore_events(key, events)
+        self.tick = header.get('tick', 0)
+        if 'random' in header:
+            self.random.restore(header['random'])
+        if 'chunks' in header:
+            self.chunks.restore(header['chunks'])
+        else:
+            self.wake_occupied()
+
+    def save_json(self, filename):
+        size = self.store.size
+        data = []
+        for key in sorted(self.store.keys()):
+            m, t, life, vx, vy = self.store.peek(key)
+            ys, xs = np.nonzero(m)
+            data.extend({
+                'x': x + key[1] * size, 'y': y + key[0] * size, 'type': material_name(m[y, x]),
+                'temperature': float(t[y, x]),
+                'life': int(life[y, x]),
+                'velocity': [float(vx[y, x]), float(vy[y, x])]
+            } for y, x in zip(ys.tolist(), xs.tolist()))
+        with open(filename, 'w') as f:
+            json.dump(data, f)
+
+    def load_json(self, filename):
+        with open(filename, 'r') as f:
+            data = json.load(f)
+        self.clear()
+        size = self.store.size
+        for item in data:
+            x, y = item['x'], item['y']
+            chunk = self.store.get((y // size, x // size), create=True)
+            cell_rules.spawn(chunk, x % size, y % size, material_id(item['type']))
+            chunk[1][y % size, x % size] = item['temperature']
+            chunk[2][y % size, x % size] = item['life']
+            chunk[3][y % size, x % size], chunk[4][y % size, x % size] = item.get('velocity', [0.0, 0.0])
+            self.chunks.wake(x, y)
+
+    def clear(self):
+        self.store.clear()
+        self.schedules.clear()
+        self.chunks.awake.fill(False)
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import struct
+import time
+import zlib
+import numpy as np
+import brush
+from materials import MATERIAL_NAMES, AMBIENT_TEMPERATURE
+
+MAGIC = b'PXLS'
+VERSION = 1
+PORT = 7878
+TICK_RATE = 30
+KEYFRAME = 0
+DELTA = 1
+PAINT = 2
+MAX_BRUSH = 10
+# bytes a viewer may have queued before it stops getting deltas and is sent a
+# keyframe once it has caught up
+MAX_BACKLOG = 1 << 20
+# largest message a viewer may send; a paint command is a short JSON object
+MAX_COMMAND = 1024
+
+_HEADER = struct.Struct('<4sHII')
+_MESSAGE = struct.Struct('<BII')
+_COUNT = struct.Struct('<I')
+
+
+def encode_keyframe(material):
+    return zlib.compress(np.ascontiguousarray(material, dtype=np.uint8).tobytes(), 1)
+
+
+def encode_delta(index, values):
+    # Changed cells as runs of consecutive flat indices, so a block of sand
+    # falling or a row of water sliding costs one start and length per row.
+    breaks = np.flatnonzero(np.diff(index) != 1) + 1
+    starts = index[np.concatenate(([0], breaks))] if len(index) else index
+    lengths = np.diff(np.concatenate(([0], breaks, [len(index)]))) if len(index) else index
+    return zlib.compress(b''.join([_COUNT.pack(len(starts)), starts.astype('<u4').tobytes(),
+                                   lengths.astype('<u4').tobytes(), values.astype(np.uint8).tobytes()]), 1)
+
+
+def decode_delta(payload):
+    data = zlib.decompress(payload)
+    (count,) = _COUNT.unpack_from(data)
+    offset = _COUNT.size
+    starts = np.frombuffer(data, dtype='<u4', count=count, offset=offset).astype(np.intp)
+    lengths = np.frombuffer(data, dtype='<u4', count=count, offset=offset + 4 * count).astype(np.intp)
+    values = np.frombuffer(data, dtype=np.uint8, offset=offset + 8 * count)
+    index = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(len(values))
+    return index, values
+
+
+def changed_windows(world, boxes=()):
+    # Only chunks the last tick woke, plus anything painted since, can differ
+    # from what the viewers hold.
+    chunks = getattr(world, 'chunks', None)
+    if chunks is None:
+        yield 0, 0, world.material_grid()
+        return
+    gather = getattr(world, 'gather', None)
+    material = None if gather else world.material_grid()
+    for y0, y1, x0, x1 in chunks.regions(margin=0) + list(boxes):
+        yield y0, x0, gather(y0, y1, x0, x1, 1)[0] if gather else material[y0:y1, x0:x1]
+
+
+class StreamServer:
+    def __init__(self, world, host='127.0.0.1', port=PORT, tick_rate=TICK_RATE, max_backlog=MAX_BACKLOG):
+        self.world = world
+        self.host = host
+        self.port = port
+        self.tick_rate = tick_rate
+        self.max_backlog = max_backlog
+        self.reference = world.material_grid().copy()
+        self.dirty = []
+        self.viewers = set()
+        self.stale = set()
+        self.handlers = set()
+        self.tick = 0
+        self.bytes_sent = 0
+        self.keyframe = (None, b'')
+
+    def _keyframe(self):
+        # encoded at most once per tick however many viewers need it
+        if self.keyframe[0] != self.tick:
+            payload = encode_keyframe(self.reference)
+            self.keyframe = (self.tick, _MESSAGE.pack(KEYFRAME, self.tick, len(payload)) + payload)
+        return self.keyframe[1]
+
+    def _send(self, writer, message):
+        writer.write(message)
+        self.bytes_sent += len(message)
+
+    def paint(self, x0, y0, x1, y1, radius, particle_type=None, mode=brush.FILL):
+        world = self.world
+        radius = max(0, min(int(radius), MAX_BRUSH))
+        # brush.line visits every point between the ends, so keep them near the grid
+        x0, x1 = (max(-radius, min(int(x), world.width - 1 + radius)) for x in (x0, x1))
+        y0, y1 = (max(-radius, min(int(y), world.height - 1 + radius)) for y in (y0, y1))
+        cells = brush.line(x0, y0, x1, y1, radius, world.width, world.height)
+        world.paint(cells, particle_type, mode)
+        # painting over something the rules leave alone never shows up in the
+        # chunk tracker, so the stroke's box is diffed explicitly
+        if len(cells[0]):
+            self.dirty.append((cells[0].min(), cells[0].max() + 1, cells[1].min(), cells[1].max() + 1))
+
+    def delta(self):
+        width = self.world.width
+        indices, values = [np.empty(0, dtype=np.intp)], [np.empty(0, dtype=np.uint8)]
+        for y0, x0, material in changed_windows(self.world, self.dirty):
+            height, span = material.shape
+            ys, xs = np.nonzero(material != self.reference[y0:y0 + height, x0:x0 + span])
+            indices.append((ys + y0) * width + xs + x0)
+            values.append(material[ys, xs])
+        self.dirty = []
+        # windows can overlap; keep each cell once, in order
+        index, first = np.unique(np.concatenate(indices), return_index=True)
+        value = np.concatenate(values)[first]
+        self.reference.reshape(-1)[index] = value
+        return encode_delta(index, value)
+
+    def broadcast(self, payload):
+        message = _MESSAGE.pack(DELTA, self.tick, len(payload)) + payload
+        for writer in list(self.viewers):
+            backlog = writer.transport.get_write_buffer_size()
+            if writer in self.stale:
+                if backlog < self.max_backlog // 2:
+                    self.stale.discard(writer)
+                    self._send(writer, self._keyframe())
+            elif backlog > self.max_backlog:
+                self.stale.add(writer)
+            else:
+                self._send(writer, message)
+
+    async def handle(self, reader, writer):
+        self._send(writer, _HEADER.pack(MAGIC, VERSION, self.world.width, self.world.height))
+        self._send(writer, self._keyframe())
+        self.viewers.add(writer)
+        self.handlers.add(asyncio.current_task())
+        try:
+            while True:
+                kind, _, size = _MESSAGE.unpack(await reader.readexactly(_MESSAGE.size))
+                if size > MAX_COMMAND:
+                    break
+                payload = await reader.readexactly(size)
+                if kind == PAINT:
+                    try:
+                        command = json.loads(payload)
+                        mode = command.get('mode', brush.FILL)
+                        if mode not in brush.MODES or (mode != brush.ERASE and command['type'] not in MATERIAL_NAMES):
+                            continue
+                        self.paint(*command['line'], command['radius'], command.get('type'), mode)
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.viewers.discard(writer)
+            self.stale.discard(writer)
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def run(self, ticks=0):
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        step = 1.0 / self.tick_rate if self.tick_rate else 0.0
+        deadline = time.perf_counter()
+        async with server:
+            while not ticks or self.tick < ticks:
+                self.world.update()
+                self.tick += 1
+                self.broadcast(self.delta())
+                deadline += step
+                now = time.perf_counter()
+                if deadline < now - step:
+                    deadline = now
+                await asyncio.sleep(max(deadline - now, 0))
+            # closing the transports hands each handler an EOF, so they finish
+            # on their own instead of being cancelled
+            handlers = list(self.handlers)
+            for writer in list(self.viewers):
+                writer.close()
+            await asyncio.gather(*handlers, return_exceptions=True)
+
+
+class StreamClient:
+    def __init__(self, reader, writer, width, height):
+        self.reader = reader
+        self.writer = writer
+        self.width = width
+        self.height = height
+        self.material = np.zeros((height, width), dtype=np.uint8)
+        self.temperature = np.full((height, width), AMBIENT_TEMPERATURE, dtype=np.float32)
+        self.tick = None
+        self.bytes_received = 0
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=PORT):
+        reader, writer = await asyncio.open_connection(host, port)
+        magic, version, width, height = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+        if magic != MAGIC:
+            writer.close()
+            raise ConnectionError("not a pixelz stream")
+        if version > VERSION:
+            writer.close()
+            raise ConnectionError(f"stream version {version} is newer than supported version {VERSION}")
+        return cls(reader, writer, width, height)
+
+    def material_grid(self):
+        return self.material
+
+    def temperature_grid(self):
+        return self.temperature
+
+    async def receive(self):
+        kind, tick, size = _MESSAGE.unpack(await self.reader.readexactly(_MESSAGE.size))
+        payload = await self.reader.readexactly(size)
+        self.bytes_received += _MESSAGE.size + size
+        if kind == KEYFRAME:
+            self.material[...] = np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape(self.material.shape)
+        elif kind == DELTA and self.tick is not None:
+            index, values = decode_delta(payload)
+            self.material.reshape(-1)[index] = values
+        self.tick = tick
+        return tick
+
+    async def receive_forever(self):
+        try:
+            while True:
+                await self.receive()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def paint(self, x0, y0, x1, y1, radius, particle_type=None, mode=brush.FILL):
+        payload = json.dumps({'line': [x0, y0, x1, y1], 'radius': radius, 'type': particle_type,
+                              'mode': mode}).encode('utf-8')
+        self.writer.write(_MESSAGE.pack(PAINT, 0, len(payload)) + payload)
+
+    def close(self):
+        self.writer.close()
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import brush
+from world import World
+from array_world import ArrayWorld
+from parallel import ParallelWorld
+from sparse_world import SparseWorld
+
+WIDTH, HEIGHT = 48, 40
+# a bit of everything: falling sand and water, a burning wood pile with
+# explosives in it, smoke, and plants with room to grow
+SCENE = (
+    'rect:0,36,47,39:rock',
+    'disc:10,8,4:sand',
+    'disc:36,10,4:water',
+    'rect:18,28,26,35:wood',
+    'rect:21,30,22,31:explosive',
+    'disc:22,26,1:fire',
+    'disc:40,30,2:smoke',
+    'rect:2,32,12,35:plant',
+)
+
+
+def make_world(backend, seed=None):
+    if backend == 'object':
+        return World(WIDTH, HEIGHT, seed=seed)
+    if backend == 'array':
+        return ArrayWorld(WIDTH, HEIGHT, seed=seed)
+    if backend == 'cell':
+        return ArrayWorld(WIDTH, HEIGHT, kernels='cell', seed=seed)
+    if backend == 'sparse':
+        return SparseWorld(WIDTH, HEIGHT, seed=seed)
+    return ParallelWorld(WIDTH, HEIGHT, workers=2, seed=seed)
+
+
+def paint_scene(world):
+    for spec in SCENE:
+        world.paint(*brush.parse(spec, world.width, world.height, None))
+
+
+def state(world):
+    if hasattr(world, 'gather'):
+        return world.gather(0, world.height, 0, world.width)
+    return world.planes()
+
+
+def planes_of(material):
+    # material rows, with each cell's life set to its flat index so moves can be traced
+    material = np.array(material, dtype=np.uint8)
+    height, width = material.shape
+    return (material, np.zeros((height, width), dtype=np.float32),
+            np.arange(height * width, dtype=np.int16).reshape(height, width),
+            np.zeros((height, width), dtype=np.float32), np.zeros((height, width), dtype=np.float32))
+
+
+@pytest.fixture
+def world_factory():
+    worlds = []
+
+    def factory(backend, seed=None):
+        world = make_world(backend, seed)
+        worlds.append(world)
+        return world
+
+    yield factory
+    for world in worlds:
+        if hasattr(world, 'close'):
+            world.close()
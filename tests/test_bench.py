@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+import bench
+from array_world import ArrayWorld
+from world import World
+
+
+@pytest.mark.parametrize('scenario', sorted(bench.SCENARIOS))
+def test_scenarios_build_the_same_world_on_both_backends(scenario):
+    objects = bench.build(World, scenario, 48, 32, seed=0)
+    arrays = bench.build(ArrayWorld, scenario, 48, 32, seed=0)
+    assert arrays.particle_count() > 0
+    np.testing.assert_array_equal(objects.material_grid(), arrays.material_grid())
+    np.testing.assert_array_equal(objects.temperature_grid(), arrays.temperature_grid())
+
+
+def test_run_scenario_reports_latencies():
+    result = bench.run_scenario(ArrayWorld, 'sand_avalanche', 32, 24, ticks=5, memory_ticks=2)
+    assert (result['scenario'], result['size'], result['ticks']) == ('sand_avalanche', '32x24', 5)
+    assert 0 < result['p50_ms'] <= result['p90_ms'] <= result['p99_ms']
+    assert result['ticks_per_sec'] > 0 and result['peak_mb'] > 0
+    assert result['particles'] == bench.build(ArrayWorld, 'sand_avalanche', 32, 24, 0).particle_count()
+
+
+def test_results_round_trip_and_compare(tmp_path):
+    logged = []
+    results = bench.run_suite(ArrayWorld, 'array', ['fire_wood'], [(24, 16)], ticks=3, log=logged.append)
+    assert results['meta']['backend'] == 'array' and len(logged) == 1
+    bench.save_results(results, tmp_path / 'bench.json')
+    loaded = bench.load_results(tmp_path / 'bench.json')
+    assert loaded == results
+
+    faster = {'results': [dict(loaded['results'][0], ticks_per_sec=2 * loaded['results'][0]['ticks_per_sec'])]}
+    lines = bench.compare(loaded, faster)
+    assert len(lines) == 1 and '2.00x' in lines[0]
+    assert bench.compare(loaded, {'results': [dict(loaded['results'][0], size='1x1')]}) == []
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import brush
+
+
+def cells(ys, xs):
+    return sorted(zip(ys.tolist(), xs.tolist()))
+
+
+def test_circle_is_clipped_to_the_grid():
+    assert cells(*brush.circle(0, 0, 1, 5, 5)) == [(0, 0), (0, 1), (1, 0)]
+
+
+def test_line_points_visit_every_step():
+    xs, ys = brush.line_points(0, 0, 4, 2)
+    assert list(zip(xs.tolist(), ys.tolist())) == [(0, 0), (1, 0), (2, 1), (3, 2), (4, 2)]
+
+
+def test_line_has_no_gaps_or_duplicates():
+    ys, xs = brush.line(1, 1, 18, 7, 0, 20, 10)
+    points = cells(ys, xs)
+    assert len(points) == len(set(points)) == 18
+    assert (1, 1) in points and (7, 18) in points
+    # a thick stroke covers the discs stamped at both ends
+    ys, xs = brush.line(2, 5, 15, 5, 2, 20, 10)
+    thick = set(cells(ys, xs))
+    assert set(cells(*brush.circle(2, 5, 2, 20, 10))) <= thick
+    assert set(cells(*brush.circle(15, 5, 2, 20, 10))) <= thick
+    assert len(thick) == len(cells(ys, xs))
+
+
+def test_line_off_the_grid_is_empty():
+    ys, xs = brush.line(-50, -50, -40, -40, 2, 10, 10)
+    assert len(ys) == len(xs) == 0
+
+
+def test_rect_accepts_corners_in_any_order():
+    assert cells(*brush.rect(2, 1, 0, 0, 10, 10)) == cells(*brush.rect(0, 0, 2, 1, 10, 10))
+    assert len(brush.rect(-5, -5, 100, 1, 10, 10)[0]) == 20
+
+
+def test_flood_fills_only_the_connected_region():
+    material = np.array([[0, 0, 1, 0],
+                         [1, 0, 1, 0],
+                         [0, 0, 1, 0]], dtype=np.uint8)
+    assert cells(*brush.flood(material, 0, 0)) == [(0, 0), (0, 1), (1, 1), (2, 0), (2, 1)]
+    assert cells(*brush.flood(material, 3, 2)) == [(0, 3), (1, 3), (2, 3)]
+    assert len(brush.flood(material, 9, 9)[0]) == 0
+
+
+def test_stroke_joins_successive_points():
+    stroke = brush.Stroke()
+    assert cells(*stroke.to(0, 0, 0, 10, 10)) == [(0, 0)]
+    assert cells(*stroke.to(3, 0, 0, 10, 10)) == [(0, 0), (0, 1), (0, 2), (0, 3)]
+    stroke.lift()
+    assert cells(*stroke.to(6, 6, 0, 10, 10)) == [(6, 6)]
+
+
+def test_parse():
+    ys, xs = brush.rect(0, 8, 9, 9, 10, 10)
+    parsed, particle_type, mode = brush.parse('rect:0,8,9,9:rock', 10, 10)
+    assert cells(*parsed) == cells(ys, xs) and (particle_type, mode) == ('rock', brush.FILL)
+    assert brush.parse('disc:5,5,2:erase', 10, 10)[2] == brush.ERASE
+    assert brush.parse('disc:5,5,2:sand:replace', 10, 10)[2] == brush.REPLACE
+    with pytest.raises(ValueError):
+        brush.parse('star:1,2:sand', 10, 10)
+    with pytest.raises(ValueError):
+        brush.parse('disc:1,2,3:sand:smudge', 10, 10)
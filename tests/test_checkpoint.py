@@ -0,0 +1,63 @@
+import os
+import numpy as np
+import pytest
+import checkpoint
+import savefile
+from conftest import make_world, paint_scene, state
+
+
+def test_periodic_checkpoints_rotate(tmp_path):
+    world = make_world('array', seed=0)
+    paint_scene(world)
+    with checkpoint.Checkpointer(world, str(tmp_path), every=5, keep=2, lossy=False) as saver:
+        for _ in range(23):
+            world.update()
+            saver.step()
+        saver.flush()
+        assert sorted(os.listdir(tmp_path)) == ['tick_00000015.pxz', 'tick_00000020.pxz']
+        assert saver.latest() == checkpoint.checkpoint_path(str(tmp_path), 20)
+    assert savefile.read(saver.latest())[0]['tick'] == 20
+
+
+def test_saves_capture_the_tick_they_were_asked_for(tmp_path):
+    world = make_world('object', seed=0)
+    paint_scene(world)
+    expected = None
+    with checkpoint.Checkpointer(world) as saver:
+        for tick in range(10):
+            world.update()
+            if tick == 4:
+                saver.save(str(tmp_path / 'mid.pxz'))
+                expected = [plane.copy() for plane in state(world)]
+    loaded = make_world('object')
+    loaded.load(tmp_path / 'mid.pxz')
+    assert loaded.tick == 5
+    for plane, other in zip(expected, state(loaded)):
+        np.testing.assert_array_equal(plane, other)
+
+
+def test_json_saves_are_written_in_place(tmp_path):
+    world = make_world('array')
+    paint_scene(world)
+    with checkpoint.Checkpointer(world) as saver:
+        saver.save(str(tmp_path / 'world.json'))
+        assert (tmp_path / 'world.json').exists()
+
+
+def test_lossy_checkpoints_skip_when_the_writer_is_behind(tmp_path):
+    world = make_world('array')
+    saver = checkpoint.Checkpointer(world, str(tmp_path), every=1)
+    saver.queue.put(None)
+    saver.writer.join()
+    for _ in range(checkpoint.QUEUE_SIZE + 3):
+        saver.checkpoint()
+    assert saver.skipped == 3
+
+
+def test_background_errors_surface_on_the_next_call(tmp_path):
+    world = make_world('array')
+    saver = checkpoint.Checkpointer(world)
+    saver.save(str(tmp_path / 'missing' / 'world.pxz'))
+    with pytest.raises(RuntimeError):
+        saver.flush()
+    saver.close()
@@ -0,0 +1,75 @@
+import numpy as np
+import brush
+from chunks import ChunkTracker, runs
+from array_world import ArrayWorld
+from materials import SAND, WATER, ROCK, FIRE
+
+
+def test_runs():
+    assert runs(np.array([0, 1, 1, 0, 1], dtype=bool)) == [(1, 3), (4, 5)]
+    assert runs(np.zeros(3, dtype=bool)) == []
+
+
+def test_wake_reaches_the_neighbouring_chunks():
+    chunks = ChunkTracker(64, 64, size=16)
+    chunks.awake.fill(False)
+    chunks.wake(20, 40)
+    expected = np.zeros((4, 4), dtype=bool)
+    expected[1:4, 0:3] = True
+    np.testing.assert_array_equal(chunks.awake, expected)
+
+
+def test_settle_keeps_only_changed_and_restless_chunks():
+    chunks = ChunkTracker(64, 64, size=16)
+    material = np.zeros((64, 64), dtype=np.uint8)
+    temperature = np.full((64, 64), 20.0, dtype=np.float32)
+    life = np.zeros((64, 64), dtype=np.int16)
+    before = (material, temperature, life)
+    after = (material.copy(), temperature.copy(), life)
+    after[0][0, 0] = SAND
+    after[0][63, 63] = FIRE
+    # a change inside the temperature tolerance does not count
+    after[1][32, 32] += 0.25
+    chunks.settle([((0, 64, 0, 64), before, after)])
+    expected = np.zeros((4, 4), dtype=bool)
+    expected[:2, :2] = True
+    expected[2:, 2:] = True
+    np.testing.assert_array_equal(chunks.awake, expected)
+
+
+def test_regions_merge_runs_of_awake_chunks():
+    chunks = ChunkTracker(64, 48, size=16)
+    chunks.awake.fill(False)
+    chunks.awake[0, 0:2] = True
+    chunks.awake[2, 3] = True
+    assert chunks.regions(margin=2) == [(0, 18, 0, 34), (30, 48, 46, 64)]
+
+
+def test_snapshot_round_trip():
+    chunks = ChunkTracker(80, 48, size=16)
+    chunks.awake = np.random.default_rng(0).random(chunks.awake.shape) < 0.5
+    other = ChunkTracker(80, 48, size=16)
+    other.restore(chunks.snapshot())
+    np.testing.assert_array_equal(other.awake, chunks.awake)
+
+
+def test_settled_world_goes_to_sleep_and_wakes_on_paint():
+    world = ArrayWorld(64, 64, seed=0)
+    world.paint(brush.rect(0, 60, 63, 63, 64, 64), 'rock')
+    world.paint(brush.rect(10, 50, 20, 59, 64, 64), 'sand')
+    for _ in range(30):
+        world.update()
+    assert world.chunks.awake_count() == 0
+    settled = world.material_grid().copy()
+    world.update()
+    np.testing.assert_array_equal(world.material_grid(), settled)
+
+    drop = brush.circle(40, 10, 2, 64, 64)
+    world.paint(drop, 'water')
+    assert world.chunks.awake_count() > 0
+    for _ in range(60):
+        world.update()
+    material = world.material_grid()
+    assert np.count_nonzero(material == WATER) == len(drop[0])
+    assert not (material[:50] == WATER).any()
+    assert (world.material_grid()[60:] == ROCK).all()
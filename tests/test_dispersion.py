@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+import brush
+import movement
+from conftest import planes_of, make_world
+from materials import EMPTY, WATER, ROCK, SAND, DISPERSION
+from world import World
+
+E, W, R = EMPTY, WATER, ROCK
+
+
+def floor_row(row, holes=()):
+    floor = [R] * len(row)
+    for x in holes:
+        floor[x] = E
+    return planes_of([row, floor])
+
+
+def disperse(planes, left=()):
+    moved = np.zeros(planes[0].shape, dtype=bool)
+    candidates = planes[0] == W
+    going_left = np.zeros_like(candidates)
+    going_left[0, list(left)] = True
+    movement._disperse(planes, moved, candidates, going_left)
+    return planes[0][0].tolist(), planes[2][0].tolist()
+
+
+def test_slides_by_the_dispersion_rate():
+    material, life = disperse(floor_row([W] + [E] * 11))
+    assert material.index(W) == DISPERSION[WATER] and material.count(W) == 1
+    assert life[DISPERSION[WATER]] == 0
+
+
+def test_moves_a_run_as_a_block():
+    material, life = disperse(floor_row([W, W, W] + [E] * 11))
+    assert [x for x, m in enumerate(material) if m == W] == [8, 9, 10]
+    assert life[8:11] == [0, 1, 2]
+
+
+def test_splits_a_gap_between_runs():
+    material, _ = disperse(floor_row([W, E, E, E, E, W]), left=(0, 5))
+    assert material == [E, E, W, W, E, E]
+
+
+def test_stops_at_a_drop():
+    material, _ = disperse(floor_row([W] + [E] * 11, holes=(3,)))
+    assert material.index(W) == 3
+
+
+def test_stops_at_a_wall():
+    material, _ = disperse(floor_row([W, E, E, R, E]))
+    assert material == [E, E, W, R, E]
+
+
+@pytest.mark.parametrize('backend', ('object', 'array', 'cell', 'sparse'))
+def test_a_flood_levels_the_same_on_every_backend(backend):
+    # the array backend moves runs as blocks, the others one particle at a
+    # time; all of them should end with a flat pool
+    world = make_world(backend, seed=1)
+    width, height = world.width, world.height
+    world.paint(brush.rect(0, height - 4, width - 1, height - 1, width, height), 'rock')
+    world.paint(brush.rect(0, 0, 1, height - 5, width, height), 'rock')
+    world.paint(brush.rect(width - 2, 0, width - 1, height - 5, width, height), 'rock')
+    world.paint(brush.rect(4, 2, 13, 21, width, height), 'water')
+    for _ in range(200):
+        world.update()
+    water = world.material_grid()[:, 2:width - 2] == WATER
+    assert np.count_nonzero(water) == 200
+    depth = water.sum(axis=0)
+    assert depth.min() >= 200 // (width - 4) and depth.max() <= -(-200 // (width - 4))
+    # and filled from the floor up, with no holes
+    assert water[height - 4 - depth.min():height - 4].all()
+
+
+def test_object_particles_move_once_per_tick():
+    world = World(3, 12, seed=0)
+    world.add_particle(1, 0, 'sand')
+    for tick in range(1, 6):
+        world.update()
+        assert world.grid[tick, 1] is not None and world.grid[tick, 1].material == SAND
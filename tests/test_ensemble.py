@@ -0,0 +1,57 @@
+import math
+import numpy as np
+import pytest
+import ensemble
+from conftest import make_world, paint_scene
+from materials import SAND
+
+
+def test_settle_time_is_nan_while_still_changing():
+    metric = ensemble.SettleTime()
+    grid = np.zeros((2, 2), dtype=np.uint8)
+    metric.observe(1, grid)
+    grid[0, 0] = SAND
+    metric.observe(2, grid)
+    metric.observe(3, grid)
+    assert metric.summary() == {'settle_tick': 3.0}
+    grid[1, 1] = SAND
+    metric.observe(4, grid)
+    assert math.isnan(metric.summary()['settle_tick'])
+
+
+def test_aggregate_leaves_unsettled_runs_out_of_the_mean():
+    summary = {
+        'variant': np.arange(4),
+        'seed': np.array([0, 1, 0, 1]),
+        'fire_life': np.array([50.0, 50.0, 100.0, 100.0]),
+        'settle_tick': np.array([10.0, np.nan, np.nan, np.nan]),
+        'burned': np.array([4, 6, 8, 8]),
+    }
+    table = ensemble.aggregate(summary, ['fire_life'])
+    assert table['fire_life'].tolist() == [50.0, 100.0]
+    assert table['runs'].tolist() == [2, 2]
+    assert table['settle_tick.mean'][0] == 10.0
+    assert math.isnan(table['settle_tick.mean'][1])
+    assert table['settle_tick.missing'].tolist() == [1, 2]
+    assert table['burned.mean'].tolist() == [5.0, 8.0]
+    assert 'burned.missing' not in table
+
+
+def test_parse_parameter():
+    assert ensemble.parse_parameter('fire_life=50,100') == ('fire_life', [50.0, 100.0])
+    with pytest.raises(ValueError):
+        ensemble.parse_parameter('gravity=1')
+
+
+def test_run_gives_a_summary_per_variant():
+    world = make_world('array', seed=0)
+    paint_scene(world)
+    grid = [('growth_chance', [0.01, 0.02])]
+    variant_list, results = ensemble.run(world.snapshot(), 'array', grid, seeds=[0, 1], ticks=5,
+                                         every=5, metric_names=('counts', 'settle'), workers=1)
+    assert variant_list == [({'growth_chance': 0.01}, 0), ({'growth_chance': 0.01}, 1),
+                            ({'growth_chance': 0.02}, 0), ({'growth_chance': 0.02}, 1)]
+    per_tick, summary = ensemble.columns(variant_list, results, ['growth_chance'])
+    assert per_tick['tick'].tolist() == [5, 5, 5, 5]
+    assert summary['count.rock'].tolist() == [summary['count.rock'][0]] * 4
+    assert 'settle_tick' in summary
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+import brush
+import events
+from conftest import make_world, state
+from materials import PLANT
+
+
+class FixedWaits:
+    def __init__(self, *waits):
+        self.waits = list(waits)
+
+    def geometric(self, p, size):
+        drawn, self.waits = self.waits[:size], self.waits[size:]
+        return np.array(drawn)
+
+
+def test_schedule_files_and_fires_events():
+    schedule = events.Schedule((2, 3))
+    schedule.add(10, np.array([4, 1, 4]), FixedWaits(3, 5))
+    assert len(schedule) == 2
+    # a pending cell is not scheduled twice
+    schedule.add(11, np.array([1]), FixedWaits(1))
+    assert len(schedule) == 2
+    assert schedule.due(12).tolist() == []
+    assert schedule.due(13).tolist() == [1]
+    assert schedule.pending.reshape(-1).tolist() == [False, False, False, False, True, False]
+    assert schedule.due(15).tolist() == [4] and len(schedule) == 0
+
+
+def test_schedule_snapshot_restore():
+    schedule = events.Schedule((3, 3))
+    schedule.add(0, np.array([0, 5, 8]), FixedWaits(4, 2, 4))
+    snapshot = schedule.snapshot()
+    assert snapshot.reshape(-1).tolist() == [4, -1, -1, -1, -1, 2, -1, -1, 4]
+    other = events.Schedule((3, 3))
+    other.restore(snapshot)
+    assert [other.due(tick).tolist() for tick in range(5)] == [[], [], [5], [], [0, 8]]
+
+
+@pytest.mark.parametrize('backend', ('object', 'array', 'sparse'))
+def test_plants_painted_over_other_particles_are_scheduled(backend):
+    world = make_world(backend, seed=0)
+    row = brush.rect(4, 20, 43, 20, world.width, world.height)
+    world.paint(row, 'rock')
+    world.paint(row, 'plant', brush.REPLACE)
+    world.update()
+    if backend == 'sparse':
+        pending = world.pending(0, world.height, 0, world.width)
+    else:
+        pending = world.schedule.pending
+    assert pending[row].all()
+    for _ in range(300):
+        world.update()
+    assert np.count_nonzero(world.material_grid() == PLANT) > len(row[0]) + 10
+
+
+def test_backends_grow_plants_alike():
+    # plants on a lattice, each with room to grow, for a growth count that
+    # depends only on how often events fire
+    grown = {}
+    for backend in ('object', 'array', 'sparse'):
+        counts = []
+        for seed in range(8):
+            world = make_world(backend, seed=seed)
+            lattice = np.zeros((world.height, world.width), dtype=bool)
+            lattice[1::4, 1::4] = True
+            world.paint(np.nonzero(lattice), 'plant')
+            for _ in range(100):
+                world.update()
+            counts.append(np.count_nonzero(world.material_grid() == PLANT) - np.count_nonzero(lattice))
+        grown[backend] = np.mean(counts)
+    assert grown['array'] > 50
+    assert grown['object'] == pytest.approx(grown['array'], rel=0.2)
+    assert grown['sparse'] == pytest.approx(grown['array'], rel=0.2)
+
+
+def test_sparse_saves_keep_plant_events(world_factory, tmp_path):
+    world = world_factory('sparse', seed=3)
+    world.paint(brush.rect(0, 36, 47, 39, world.width, world.height), 'rock')
+    world.paint(brush.rect(10, 28, 30, 35, world.width, world.height), 'plant')
+    for _ in range(10):
+        world.update()
+    world.save(tmp_path / 'plants.pxz')
+    resumed = world_factory('sparse')
+    resumed.load(tmp_path / 'plants.pxz')
+    pending = sum(len(schedule) for schedule in world.schedules.values())
+    assert pending == np.count_nonzero(world.material_grid() == PLANT)
+    assert sum(len(schedule) for schedule in resumed.schedules.values()) == pending
+    for _ in range(60):
+        world.update()
+        resumed.update()
+    for plane, other in zip(state(world), state(resumed)):
+        np.testing.assert_array_equal(plane, other)
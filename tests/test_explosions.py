@@ -0,0 +1,75 @@
+import numpy as np
+import explosions
+from conftest import planes_of
+from materials import ROCK, WOOD, EXPLOSIVE, FIRE, BLAST_RADIUS
+from world import World
+
+
+def blast_cells(shape, y, x):
+    dy, dx = explosions.disc(int(BLAST_RADIUS[EXPLOSIVE]))
+    ty, tx = y + dy, x + dx
+    keep = (ty >= 0) & (ty < shape[0]) & (tx >= 0) & (tx < shape[1])
+    cells = np.zeros(shape, dtype=bool)
+    cells[ty[keep], tx[keep]] = True
+    return cells
+
+
+def test_disc():
+    dy, dx = explosions.disc(1)
+    assert sorted(zip(dy.tolist(), dx.tolist())) == [(-1, 0), (0, -1), (0, 0), (0, 1), (1, 0)]
+    assert len(explosions.disc(5)[0]) == 81
+    assert explosions.disc(5) is explosions.disc(5)
+
+
+def test_resolve_burns_the_blast_but_not_rock():
+    material = np.full((15, 15), WOOD, dtype=np.uint8)
+    material[7, 7] = EXPLOSIVE
+    material[7, 9] = ROCK
+    burn, primed = explosions.resolve(material, [7], [7])
+    expected = blast_cells(material.shape, 7, 7)
+    expected[7, 9] = False
+    np.testing.assert_array_equal(burn, expected)
+    assert not primed.any()
+
+
+def test_resolve_chains_through_explosives_in_the_blast():
+    material = np.zeros((12, 30), dtype=np.uint8)
+    material[6, [3, 7, 11]] = EXPLOSIVE
+    burn, _ = explosions.resolve(material, [6], [3])
+    expected = blast_cells(material.shape, 6, 3) | blast_cells(material.shape, 6, 7) | blast_cells(material.shape, 6, 11)
+    np.testing.assert_array_equal(burn, expected)
+
+
+def test_resolve_only_primes_explosives_outside_its_columns():
+    material = np.zeros((12, 16), dtype=np.uint8)
+    material[6, [5, 9]] = EXPLOSIVE
+    burn, primed = explosions.resolve(material, [6], [5], cols=(0, 8))
+    assert primed[6, 9] and primed.sum() == 1
+    assert not burn[6, 9]
+    np.testing.assert_array_equal(burn, blast_cells(material.shape, 6, 5) & ~primed)
+
+
+def test_detonate_sets_burning_cells_alight():
+    planes = planes_of(np.full((9, 9), WOOD))
+    planes[0][4, 4] = EXPLOSIVE
+    explosions.detonate(planes, [4], [4])
+    np.testing.assert_array_equal(planes[0] == FIRE, blast_cells((9, 9), 4, 4))
+
+
+def test_step_sets_off_spent_explosives():
+    planes = planes_of(np.zeros((20, 20)))
+    planes[0][[5, 5], [5, 8]] = EXPLOSIVE
+    planes[2][5, 5], planes[2][5, 8] = 0, 50
+    burn = explosions.step(planes)
+    np.testing.assert_array_equal(burn, blast_cells((20, 20), 5, 5) | blast_cells((20, 20), 5, 8))
+    assert not (planes[0] == EXPLOSIVE).any()
+
+
+def test_object_backend_chain():
+    world = World(30, 12, seed=0)
+    for x in (3, 7, 11):
+        world.add_particle(x, 6, 'explosive')
+    world.grid[6, 3].life = 1
+    world.update()
+    expected = blast_cells((12, 30), 6, 3) | blast_cells((12, 30), 6, 7) | blast_cells((12, 30), 6, 11)
+    np.testing.assert_array_equal(world.material_grid() == FIRE, expected)
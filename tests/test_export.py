@@ -0,0 +1,116 @@
+import os
+import struct
+import zlib
+import numpy as np
+import pytest
+import export
+from conftest import make_world, paint_scene
+from palette import build_palette
+
+
+def read_png(filename):
+    with open(filename, 'rb') as f:
+        data = f.read()
+    assert data.startswith(b'\x89PNG\r\n\x1a\n')
+    offset, chunks = 8, {}
+    while offset < len(data):
+        length, = struct.unpack('>I', data[offset:offset + 4])
+        tag = data[offset + 4:offset + 8]
+        body = data[offset + 8:offset + 8 + length]
+        assert struct.unpack('>I', data[offset + 8 + length:offset + 12 + length])[0] == zlib.crc32(tag + body)
+        chunks[tag] = chunks.get(tag, b'') + body
+        offset += 12 + length
+    width, height = struct.unpack('>II', chunks[b'IHDR'][:8])
+    rows = np.frombuffer(zlib.decompress(chunks[b'IDAT']), dtype=np.uint8).reshape(height, width * 3 + 1)
+    assert not rows[:, 0].any()
+    return rows[:, 1:].reshape(height, width, 3)
+
+
+def read_gif(filename):
+    # enough of a decoder for GifWriter's output: fixed-width literal codes
+    with open(filename, 'rb') as f:
+        data = f.read()
+    assert data[:6] == b'GIF89a'
+    width, height, packed = struct.unpack('<HHB', data[6:11])
+    offset = 13 + 3 * (2 << (packed & 7))
+    canvas = np.zeros((height, width), dtype=np.uint8)
+    frames = []
+    while data[offset] != 0x3b:
+        if data[offset] == 0x21:
+            offset += 2
+            while data[offset]:
+                offset += data[offset] + 1
+            offset += 1
+            continue
+        x, y, w, h = struct.unpack('<HHHH', data[offset + 1:offset + 9])
+        code_size = data[offset + 10]
+        offset += 11
+        blocks = b''
+        while data[offset]:
+            blocks += data[offset + 1:offset + 1 + data[offset]]
+            offset += data[offset] + 1
+        offset += 1
+        bits = np.unpackbits(np.frombuffer(blocks, dtype=np.uint8), bitorder='little')
+        count = len(bits) // (code_size + 1)
+        codes = bits[:count * (code_size + 1)].reshape(count, code_size + 1)
+        codes = (codes.astype(np.uint16) << np.arange(code_size + 1, dtype=np.uint16)).sum(axis=1)
+        clear = 1 << code_size
+        end = np.flatnonzero(codes == clear + 1)[0]
+        pixels = codes[:end][codes[:end] != clear]
+        canvas[y:y + h, x:x + w] = pixels.reshape(h, w)
+        frames.append(canvas.copy())
+    return frames
+
+
+def test_png_round_trip(tmp_path):
+    rgb = np.random.default_rng(0).integers(0, 256, (5, 7, 3), dtype=np.uint8)
+    writer = export.PngSequence(str(tmp_path), 7, 5)
+    writer.write(rgb)
+    writer.write(rgb[::-1].copy())
+    writer.close()
+    assert sorted(os.listdir(tmp_path)) == ['frame_000000.png', 'frame_000001.png']
+    assert np.array_equal(read_png(tmp_path / 'frame_000000.png'), rgb)
+    assert np.array_equal(read_png(tmp_path / 'frame_000001.png'), rgb[::-1])
+
+
+def test_gif_round_trip_over_changed_boxes(tmp_path):
+    filename = str(tmp_path / 'clip.gif')
+    rng = np.random.default_rng(0)
+    first = rng.integers(0, 9, (40, 300), dtype=np.uint8)
+    second = first.copy()
+    second[10:12, 250:260] = 3
+    frames = [first, second, second]
+    writer = export.GifWriter(filename, 600, 80, scale=2)
+    for frame in frames:
+        writer.write(frame)
+    writer.close()
+    decoded = read_gif(filename)
+    assert len(decoded) == 3
+    for frame, image in zip(frames, decoded):
+        assert np.array_equal(image, export.upscale(frame, 2))
+
+
+@pytest.mark.parametrize('every', (1, 3))
+def test_exporter_writes_captured_frames(tmp_path, every):
+    world = make_world('array', seed=0)
+    paint_scene(world)
+    palette = build_palette()
+    expected = []
+    with export.Exporter(world, export.PngSequence(str(tmp_path), world.width, world.height),
+                         every=every, scale=1) as exporter:
+        for _ in range(6):
+            world.update()
+            exporter.capture()
+            if world.tick % every == 0:
+                expected.append(palette[world.material_grid()])
+    assert exporter.frames == len(expected)
+    for i, rgb in enumerate(expected):
+        assert np.array_equal(read_png(tmp_path / f"frame_{i:06d}.png"), rgb)
+
+
+def test_gif_refuses_heat_view(tmp_path):
+    world = make_world('array', seed=0)
+    writer = export.GifWriter(str(tmp_path / 'clip.gif'), world.width, world.height)
+    with pytest.raises(ValueError):
+        export.Exporter(world, writer, heat=True)
+    writer.close()
@@ -0,0 +1,31 @@
+import numpy as np
+import headless
+import savefile
+from materials import SAND, ROCK
+
+
+def test_run_paints_steps_and_saves(tmp_path, capsys):
+    output = tmp_path / 'out.pxz'
+    status = headless.main(['run', '--width', '40', '--height', '30', '--seed', '1', '--ticks', '25',
+                            '--paint', 'rect:0,28,39,29:rock', '--paint', 'disc:20,5,3:sand',
+                            '--output', str(output)])
+    assert status == 0
+    printed = capsys.readouterr().out
+    assert printed.startswith('25 ticks in ') and 'ticks/s' in printed
+    header, planes = savefile.read(output)
+    assert header['tick'] == 25
+    material = planes['material']
+    assert np.count_nonzero(material == ROCK) == 80
+    # the sand has landed on the floor
+    assert np.count_nonzero(material == SAND) == 29
+    assert (material[:20] != SAND).all()
+
+
+def test_run_is_repeatable_for_a_seed(tmp_path, capsys):
+    outputs = [tmp_path / 'a.pxz', tmp_path / 'b.pxz']
+    for output in outputs:
+        headless.main(['run', '--width', '32', '--height', '32', '--seed', '4', '--ticks', '20', '--backend', 'object',
+                       '--paint', 'disc:16,16,6:water', '--output', str(output)])
+    first, second = (savefile.read(output)[1] for output in outputs)
+    for name in savefile.PLANE_NAMES:
+        np.testing.assert_array_equal(first[name], second[name])
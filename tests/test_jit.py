@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+
+RUN_SCENE = '''
+import json, sys
+import jit
+from conftest import make_world, paint_scene
+result = {'enabled': jit.ENABLED}
+for backend in ('array', 'cell'):
+    world = make_world(backend, seed=7)
+    paint_scene(world)
+    for _ in range(40):
+        world.update()
+    result[backend] = [plane.tolist() for plane in world.planes()]
+json.dump(result, sys.stdout)
+'''
+
+
+def run_scene(no_jit):
+    # jit.ENABLED is fixed at import, so each mode runs in its own interpreter
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.path.join(root, 'tests')]))
+    env.pop('PIXELZ_NO_JIT', None)
+    if no_jit:
+        env['PIXELZ_NO_JIT'] = '1'
+    output = subprocess.run([sys.executable, '-c', RUN_SCENE], env=env, cwd=root, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def test_compiled_and_interpreted_kernels_agree():
+    pytest.importorskip('numba')
+    compiled, interpreted = run_scene(no_jit=False), run_scene(no_jit=True)
+    assert compiled.pop('enabled') and not interpreted.pop('enabled')
+    for backend in compiled:
+        for plane, other in zip(compiled[backend], interpreted[backend]):
+            np.testing.assert_array_equal(np.array(plane), np.array(other))
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+import brush
+import materials
+from conftest import make_world
+from materials import (EMPTY, SAND, WATER, ROCK, FIRE, SMOKE, WOOD, STEAM, PLANT, EXPLOSIVE, NONE, DETONATE,
+                       SINKS, SELF_PRODUCT, NEIGHBOUR_PRODUCT, PHASE_ABOVE, PHASE_BELOW, material_id, material_name)
+
+
+def test_ids_and_names():
+    assert material_id('sand') == SAND and material_name(SAND) == 'sand'
+    assert material_name(EMPTY) is None
+    assert material_name(len(materials.REGISTRY)) is None
+    with pytest.raises(ValueError):
+        material_id('lava')
+
+
+def test_sinks():
+    assert SINKS[SAND, WATER] and SINKS[SAND, EMPTY] and SINKS[SAND, SMOKE]
+    assert not SINKS[SAND, ROCK] and not SINKS[WATER, SAND] and not SINKS[SMOKE, WATER]
+
+
+def test_reaction_tables():
+    assert NEIGHBOUR_PRODUCT[FIRE, WOOD] == FIRE and SELF_PRODUCT[FIRE, WOOD] == NONE
+    assert SELF_PRODUCT[FIRE, WATER] == STEAM and NEIGHBOUR_PRODUCT[FIRE, WATER] == NONE
+    assert NEIGHBOUR_PRODUCT[FIRE, PLANT] == FIRE
+    assert NEIGHBOUR_PRODUCT[FIRE, EXPLOSIVE] == DETONATE
+    assert NEIGHBOUR_PRODUCT[FIRE, ROCK] == NONE
+    assert PHASE_ABOVE[WATER] == STEAM and PHASE_BELOW[STEAM] == WATER and PHASE_ABOVE[SAND] == NONE
+
+
+def test_build_tables_from_a_custom_registry():
+    registry = [materials.Material('empty', (0, 0, 0), 'empty', 0.0, False, -1, None, None, None),
+                materials.Material('oil', (0, 0, 0), 'liquid', 0.8, True, -1, None, None, None),
+                materials.Material('ember', (0, 0, 0), 'energy', 0.0, False, 5, None, None, None)]
+    tables = materials.build_tables(registry, [('ember', 'oil', None, 'ember')])
+    density, flammable, lifetime, sinks, neighbour_product = tables[0], tables[1], tables[2], tables[6], tables[8]
+    assert flammable[1] and lifetime[2] == 5 and density[1] == np.float32(0.8)
+    assert sinks[1, 0] and not sinks[0, 1]
+    assert neighbour_product[2, 1] == 2
+
+
+@pytest.mark.parametrize('backend', ('object', 'array', 'sparse'))
+def test_backends_treat_empty_and_unknown_names_alike(backend):
+    world = make_world(backend)
+    world.add_particle(1, 1, 'empty')
+    world.paint(brush.rect(0, 3, 3, 3, world.width, world.height), 'empty')
+    assert world.particle_count() == 0
+
+    world.paint(brush.rect(0, 3, 3, 3, world.width, world.height), 'sand')
+    world.paint(brush.rect(0, 3, 1, 3, world.width, world.height), 'empty', brush.REPLACE)
+    assert world.material_grid()[3, :4].tolist() == [EMPTY, EMPTY, SAND, SAND]
+
+    with pytest.raises(ValueError):
+        world.add_particle(5, 5, 'lava')
+    with pytest.raises(ValueError):
+        world.paint(brush.rect(0, 5, 3, 5, world.width, world.height), 'lava')
+    assert world.particle_count() == 2
@@ -0,0 +1,66 @@
+import numpy as np
+import movement
+from conftest import planes_of
+from materials import EMPTY, SAND, WATER, ROCK, SMOKE, SINKS
+
+E, S, W, R = EMPTY, SAND, WATER, ROCK
+
+
+def column(*cells):
+    return planes_of([[cell] for cell in cells])
+
+
+def test_shift_runs_moves_a_run_into_a_gap():
+    planes = column(S, S, E)
+    moved = np.zeros((3, 1), dtype=bool)
+    target = movement.shift_runs(planes, moved, planes[0] == S, planes[0] == E, 1)
+    assert planes[0].ravel().tolist() == [E, S, S]
+    # the run keeps its order and the empty cell wraps round to the top
+    assert planes[2].ravel().tolist() == [2, 0, 1]
+    assert sorted(target.tolist()) == [1, 2]
+    assert moved.ravel().tolist() == [False, True, True]
+
+
+def test_shift_runs_sinks_a_run_through_a_liquid():
+    planes = column(S, S, W)
+    moved = np.zeros((3, 1), dtype=bool)
+    movement.shift_runs(planes, moved, planes[0] == S, SINKS[SAND][planes[0]], 1)
+    assert planes[0].ravel().tolist() == [W, S, S]
+    assert planes[2].ravel().tolist() == [2, 0, 1]
+
+
+def test_shift_runs_leaves_blocked_runs():
+    planes = column(S, R)
+    moved = np.zeros((2, 1), dtype=bool)
+    target = movement.shift_runs(planes, moved, planes[0] == S, planes[0] == E, 1)
+    assert len(target) == 0
+    assert planes[0].ravel().tolist() == [S, R]
+    assert not moved.any()
+
+
+def test_shift_runs_lifts_gas():
+    planes = column(E, SMOKE, SMOKE)
+    moved = np.zeros((3, 1), dtype=bool)
+    movement.shift_runs(planes, moved, planes[0] == SMOKE, planes[0] == E, -1)
+    assert planes[0].ravel().tolist() == [SMOKE, SMOKE, E]
+    assert planes[2].ravel().tolist() == [1, 2, 0]
+
+
+def test_step_conserves_material_and_keeps_rock_still():
+    rng = np.random.default_rng(0)
+    material = rng.choice([E, E, S, W, R], (20, 20))
+    planes = planes_of(material)
+    counts = np.bincount(material.ravel(), minlength=4)
+    for _ in range(10):
+        movement.step(planes, np.zeros(material.shape, dtype=bool), rng)
+    np.testing.assert_array_equal(np.bincount(planes[0].ravel(), minlength=4), counts)
+    np.testing.assert_array_equal(planes[0] == R, material == R)
+    # life travels with its cell, so every original cell is still there once
+    assert sorted(planes[2].ravel().tolist()) == list(range(400))
+
+
+def test_step_lets_sand_pile_on_the_floor():
+    planes = planes_of([[E, S, E], [E, E, E], [E, E, E]])
+    for _ in range(3):
+        movement.step(planes, np.zeros((3, 3), dtype=bool), np.random.default_rng(1))
+    assert planes[0].tolist() == [[E, E, E], [E, E, E], [E, S, E]]
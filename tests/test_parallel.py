@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import headless
+import parallel
+from conftest import paint_scene, state
+from materials import SMOKE
+
+
+def test_split_strips_keeps_strips_taller_than_two_halos():
+    assert parallel.split_strips(100, 4) == [(0, 25), (25, 50), (50, 75), (75, 100)]
+    assert parallel.split_strips(40, 4) == [(0, 20), (20, 40)]
+    assert parallel.split_strips(10, 4) == [(0, 10)]
+    strips = parallel.split_strips(400, 6)
+    assert strips[0][0] == 0 and strips[-1][1] == 400
+    assert all(y1 - y0 >= 2 * parallel.HALO for y0, y1 in strips)
+
+
+def test_same_seed_same_run(world_factory):
+    first, second = world_factory('parallel', seed=5), world_factory('parallel', seed=5)
+    for world in (first, second):
+        paint_scene(world)
+        for _ in range(30):
+            world.update()
+    for plane, other in zip(state(first), state(second)):
+        np.testing.assert_array_equal(plane, other)
+
+
+def test_save_load_continue(world_factory, tmp_path):
+    world = world_factory('parallel', seed=3)
+    paint_scene(world)
+    for _ in range(20):
+        world.update()
+    world.save(tmp_path / 'resume.pxz')
+    resumed = world_factory('parallel')
+    resumed.load(tmp_path / 'resume.pxz')
+    for _ in range(30):
+        world.update()
+        resumed.update()
+    for plane, other in zip(state(world), state(resumed)):
+        np.testing.assert_array_equal(plane, other)
+
+
+def test_smoke_dissipates_at_the_serial_rate(world_factory):
+    # gas in a halo row must be rolled for once, by the strip that owns it
+    counts = {}
+    for backend in ('array', 'parallel'):
+        world = world_factory(backend, seed=0)
+        world.paint(np.nonzero(np.ones((world.height, world.width), dtype=bool)), 'smoke')
+        world.update()
+        counts[backend] = np.count_nonzero(world.material_grid() == SMOKE) / (world.width * world.height)
+    assert counts['parallel'] == pytest.approx(counts['array'], abs=0.03)
+
+
+def test_headless_workers_honour_the_backend(capsys):
+    args = headless.build_parser().parse_args(['run', '--workers', '2', '--backend', 'cell',
+                                               '--width', '48', '--height', '40'])
+    world = headless.make_world(args)
+    try:
+        assert isinstance(world, parallel.ParallelWorld) and world.kernels == 'cell'
+    finally:
+        world.close()
+    with pytest.raises(SystemExit):
+        headless.main(['run', '--workers', '2', '--backend', 'object'])
+    assert '--workers' in capsys.readouterr().err
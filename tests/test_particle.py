@@ -0,0 +1,54 @@
+import pytest
+from particle import Particle, ParticlePool
+from world import World
+from materials import SAND, WATER, STEAM, FIRE, SMOKE, PLANT, LIFETIME, AMBIENT_TEMPERATURE
+
+
+def test_particles_are_slotted():
+    particle = Particle(1, 2, 'sand')
+    with pytest.raises(AttributeError):
+        particle.colour = 'red'
+    assert (particle.x, particle.y, particle.material, particle.type) == (1, 2, SAND, 'sand')
+
+
+def test_transform_keeps_heat_and_respawn_resets_it():
+    particle = Particle(0, 0, WATER)
+    particle.temperature, particle.vy = 150.0, 2.0
+    particle.transform(STEAM)
+    assert (particle.material, particle.temperature, particle.vy) == (STEAM, 150.0, 0.0)
+    particle.respawn(FIRE)
+    assert (particle.material, particle.temperature, particle.life) == (FIRE, AMBIENT_TEMPERATURE, LIFETIME[FIRE])
+
+
+def test_pool_reuses_released_particles():
+    pool = ParticlePool()
+    first = pool.acquire(1, 1, 'sand')
+    first.temperature = 300.0
+    pool.release(first)
+    pool.release(None)
+    second = pool.acquire(4, 5, 'water')
+    assert second is first
+    assert (second.x, second.y, second.material, second.temperature, second.moved) == (4, 5, WATER, AMBIENT_TEMPERATURE, -1)
+    assert (pool.acquired, pool.released) == (2, 1)
+    pool.release_all([second, None])
+    assert pool.free == [second] and pool.released == 2
+
+
+def test_pool_reports_watched_births():
+    pool = ParticlePool(watch=(PLANT,))
+    pool.acquire(0, 0, 'sand')
+    plant = pool.acquire(1, 0, 'plant')
+    assert pool.born == [plant]
+
+
+def test_world_transforms_in_place_and_recycles():
+    world = World(3, 3, seed=0)
+    world.add_particle(1, 0, 'fire')
+    fire = world.grid[0, 1]
+    fire.life = 1
+    world.update()
+    # burning out turns the same object into smoke
+    assert world.grid[0, 1] is fire and fire.material == SMOKE
+    world.erase(1, 0)
+    world.add_particle(2, 2, 'sand')
+    assert world.grid[2, 2] is fire and world.pool.acquired == 2
@@ -0,0 +1,68 @@
+import csv
+import json
+import pytest
+import profiling
+from conftest import make_world, paint_scene
+
+
+def test_totals_and_averages():
+    profiler = profiling.Profiler(history=2, keep=True)
+    hooked = []
+    profiler.add_hook(hooked.append)
+    for tick, (rules, moved) in enumerate([(0.5, 4), (1.0, 6), (2.0, 10)]):
+        stats = profiler.begin(tick)
+        stats.phases['rules'] = rules
+        stats.phases['temperature'] = 0.25
+        stats.rules['sand'] = rules
+        stats.counts['moved'] = moved
+        stats.population(10, 7)
+        profiler.end()
+    # only the last two ticks are kept for the overlay, all three in the log
+    assert profiler.series('total') == [1.25, 2.25]
+    assert profiler.series('rules') == [1.0, 2.0]
+    assert profiler.rule_totals()['sand'] == 3.0
+    assert profiler.count_averages() == {'updated': 0.0, 'moved': 8.0, 'created': 0.0, 'destroyed': 3.0}
+    assert [row['tick'] for row in profiler.log] == [0, 1, 2]
+    assert profiler.log[0] == {'tick': 0, 'total': 0.75, 'phase.rules': 0.5, 'phase.temperature': 0.25,
+                               'rule.sand': 0.5, 'updated': 0, 'moved': 4, 'created': 0, 'destroyed': 3}
+    assert [stats.tick for stats in hooked] == [0, 1, 2]
+
+
+def test_phase_and_rule_timers_accumulate():
+    profiler = profiling.Profiler()
+    profiler.begin(0)
+    for _ in range(2):
+        with profiler.phase('rules'), profiler.rule('water'):
+            pass
+    stats = profiler.end()
+    assert stats.phases['rules'] > 0 and stats.rules['water'] > 0
+    assert profiler.series('missing') == [0]
+    profiler.sample('render', 0.5)
+    assert profiler.series('render') == [0.5]
+    with profiling.phase(None, 'rules'):
+        pass
+
+
+@pytest.mark.parametrize('backend', ('object', 'array', 'sparse'))
+def test_worlds_report_every_tick(backend):
+    world = make_world(backend, seed=1)
+    paint_scene(world)
+    world.profiler = profiling.Profiler(keep=True)
+    for _ in range(3):
+        world.update()
+    log = world.profiler.log
+    assert [row['tick'] for row in log] == [0, 1, 2]
+    assert all(row['total'] > 0 and row['phase.rules'] > 0 for row in log)
+    # the sparse backend times phases only
+    if backend != 'sparse':
+        assert all(row['updated'] > 0 for row in log)
+
+
+def test_save_log(tmp_path):
+    rows = [{'tick': 0, 'total': 1.0}, {'tick': 1, 'total': 2.0, 'rule.sand': 0.5}]
+    profiling.save_log(rows, str(tmp_path / 'log.csv'))
+    with open(tmp_path / 'log.csv') as f:
+        read = list(csv.DictReader(f))
+    assert read[0] == {'tick': '0', 'total': '1.0', 'rule.sand': '0'}
+    profiling.save_log(rows, str(tmp_path / 'log.json'))
+    assert json.loads((tmp_path / 'log.json').read_text()) == rows
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import recorder
+import savefile
+from conftest import paint_scene
+
+
+@pytest.mark.parametrize('backend', ('object', 'array'))
+def test_recording_plays_back_every_tick(backend, world_factory, tmp_path):
+    world = world_factory(backend, seed=9)
+    paint_scene(world)
+    filename = tmp_path / 'run.pxr'
+    expected = []
+    with recorder.Recorder(world, filename, keyframe_every=7) as rec:
+        expected.append([p.copy() for p in world.planes()[:3]])
+        for _ in range(20):
+            world.update()
+            rec.capture()
+            expected.append([p.copy() for p in world.planes()[:3]])
+
+    with recorder.Player(filename) as player:
+        assert player.last_tick == 20
+        ticks = []
+        for tick, material, temperature, life in player.play():
+            ticks.append(tick)
+            np.testing.assert_array_equal(material, expected[tick][0])
+            np.testing.assert_allclose(temperature, expected[tick][1], atol=recorder.TEMPERATURE_TOLERANCE)
+            np.testing.assert_array_equal(life, expected[tick][2])
+        assert ticks == list(range(21))
+        # seeking backwards replays from the keyframe before the tick
+        material, _, life = player.seek(9)
+        np.testing.assert_array_equal(material, expected[9][0])
+        np.testing.assert_array_equal(life, expected[9][2])
+
+
+def test_play_stops_at_end(world_factory, tmp_path):
+    world = world_factory('array', seed=1)
+    paint_scene(world)
+    with recorder.Recorder(world, tmp_path / 'run.pxr') as rec:
+        for _ in range(10):
+            world.update()
+            rec.capture()
+    with recorder.Player(tmp_path / 'run.pxr') as player:
+        assert [tick for tick, *_ in player.play(3, 6)] == [3, 4, 5, 6]
+
+
+def test_truncated_recording_drops_the_partial_frame(world_factory, tmp_path):
+    world = world_factory('array', seed=1)
+    paint_scene(world)
+    filename = tmp_path / 'run.pxr'
+    with recorder.Recorder(world, filename) as rec:
+        for _ in range(4):
+            world.update()
+            rec.capture()
+    data = filename.read_bytes()
+    filename.write_bytes(data[:-3])
+    with recorder.Player(filename) as player:
+        assert player.last_tick == 3
+
+
+def test_rejects_other_files(tmp_path):
+    (tmp_path / 'junk').write_bytes(b'JUNK' + bytes(16))
+    with pytest.raises(savefile.SaveFormatError):
+        recorder.Player(tmp_path / 'junk')
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+import palette
+from array_world import ArrayWorld
+from materials import MATERIAL_COLORS, SAND, WATER, AMBIENT_TEMPERATURE
+
+
+def test_palette_maps_ids_to_colours():
+    lut = palette.build_palette()
+    np.testing.assert_array_equal(lut[:len(MATERIAL_COLORS)], MATERIAL_COLORS)
+    assert not lut[len(MATERIAL_COLORS):].any()
+
+
+def test_heat_bins_clip_and_ambient_is_untinted():
+    bins = palette.heat_bin(np.array([-1000, palette.COLD_LIMIT, palette.HOT_LIMIT, 10 ** 6]))
+    assert bins.tolist() == [0, 0, palette.HEAT_BINS - 1, palette.HEAT_BINS - 1]
+    heat = palette.build_heat_palette(palette.build_palette())
+    ambient = int(palette.heat_bin(AMBIENT_TEMPERATURE))
+    np.testing.assert_array_equal(heat[SAND, ambient], MATERIAL_COLORS[SAND])
+    # empty cells stay black at any temperature
+    assert not heat[0].any()
+    assert heat[SAND, -1, 0] > heat[SAND, ambient, 0]
+    assert heat[SAND, 0, 2] > heat[SAND, ambient, 2]
+
+
+def test_render_scales_the_palette_image():
+    pygame = pytest.importorskip('pygame')
+    from renderer import Renderer
+    world = ArrayWorld(4, 3)
+    world.add_particle(1, 2, 'sand')
+    world.add_particle(3, 0, 'water')
+    renderer = Renderer(4, 3, cell_size=2)
+    surface = renderer.render(world)
+    assert surface.get_size() == (8, 6)
+    pixels = pygame.surfarray.array3d(surface)
+    np.testing.assert_array_equal(pixels[2:4, 4:6].reshape(-1, 3), [MATERIAL_COLORS[SAND]] * 4)
+    np.testing.assert_array_equal(pixels[6:8, 0:2].reshape(-1, 3), [MATERIAL_COLORS[WATER]] * 4)
+    assert not pixels[0:2, 0:2].any()
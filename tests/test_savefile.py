@@ -0,0 +1,76 @@
+import os
+import numpy as np
+import pytest
+import savefile
+from conftest import make_world, paint_scene, state
+
+
+def random_planes(rng, height=6, width=9):
+    return {
+        'material': rng.integers(0, 8, (height, width)).astype(np.uint8),
+        'temperature': rng.random((height, width), dtype=np.float32) * 500,
+        'life': rng.integers(-1, 100, (height, width)).astype(np.int16),
+        'vx': rng.random((height, width), dtype=np.float32),
+        'vy': rng.random((height, width), dtype=np.float32),
+        'event': rng.integers(-1, 50, (height, width)).astype(np.int32),
+    }
+
+
+def test_round_trip():
+    planes = random_planes(np.random.default_rng(1))
+    header, decoded = savefile.decode(savefile.encode(planes, {'tick': 12, 'random': {'seed': 4}}))
+    assert (header['tick'], header['random'], header['width'], header['height']) == (12, {'seed': 4}, 9, 6)
+    assert set(decoded) == set(planes)
+    for name, plane in planes.items():
+        assert decoded[name].dtype == plane.dtype
+        np.testing.assert_array_equal(decoded[name], plane)
+
+
+def test_optional_planes_are_optional():
+    planes = random_planes(np.random.default_rng(2))
+    del planes['event']
+    _, decoded = savefile.decode(savefile.encode(planes))
+    assert set(decoded) == set(savefile.PLANE_NAMES)
+
+
+def test_rejects_bad_data():
+    data = savefile.encode(random_planes(np.random.default_rng(3)))
+    with pytest.raises(savefile.SaveFormatError):
+        savefile.decode(data[:4])
+    with pytest.raises(savefile.SaveFormatError):
+        savefile.decode(b'JUNK' + data[4:])
+    with pytest.raises(savefile.SaveFormatError):
+        savefile.decode(data[:4] + (savefile.VERSION + 1).to_bytes(2, 'little') + data[6:])
+
+
+def test_write_replaces_the_target(tmp_path):
+    filename = tmp_path / 'world.pxz'
+    filename.write_bytes(b'old')
+    planes = random_planes(np.random.default_rng(4))
+    savefile.write(filename, planes)
+    assert os.listdir(tmp_path) == ['world.pxz']
+    np.testing.assert_array_equal(savefile.read(filename)[1]['material'], planes['material'])
+
+
+@pytest.mark.parametrize('backend', ('object', 'array'))
+@pytest.mark.parametrize('name', ('world.pxz', 'world.json'))
+def test_worlds_load_what_they_save(backend, name, tmp_path):
+    world = make_world(backend, seed=2)
+    paint_scene(world)
+    for _ in range(5):
+        world.update()
+    world.save(tmp_path / name)
+    loaded = make_world(backend)
+    loaded.load(tmp_path / name)
+    for plane, other in zip(state(world), state(loaded)):
+        np.testing.assert_allclose(plane, other)
+
+
+def test_backends_read_each_others_saves(tmp_path):
+    world = make_world('object', seed=2)
+    paint_scene(world)
+    world.save(tmp_path / 'world.pxz')
+    loaded = make_world('array')
+    loaded.load(tmp_path / 'world.pxz')
+    for plane, other in zip(state(world), state(loaded)):
+        np.testing.assert_array_equal(plane, other)
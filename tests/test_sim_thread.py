@@ -0,0 +1,63 @@
+import time
+import numpy as np
+import pytest
+import brush
+from array_world import ArrayWorld
+from sim_thread import FrameBuffer, SimulationThread
+from materials import SAND
+
+
+def published(buffer, value, tick):
+    buffer.publish(np.full((2, 3), value, dtype=np.uint8), np.zeros((2, 3), dtype=np.float32), tick)
+
+
+def test_frame_buffer_hands_over_the_newest_frame():
+    buffer = FrameBuffer(3, 2)
+    first = buffer.acquire()
+    assert first.tick == -1
+    published(buffer, 1, 1)
+    published(buffer, 2, 2)
+    frame = buffer.acquire()
+    assert frame.tick == 2 and (frame.material == 2).all()
+    # with nothing new the reader keeps its frame
+    assert buffer.acquire() is frame
+    # the writer never touches the frame being read
+    published(buffer, 3, 3)
+    published(buffer, 4, 4)
+    assert frame.tick == 2 and (frame.material == 2).all()
+    assert buffer.acquire().tick == 4
+
+
+def test_frame_buffer_follows_a_resized_view():
+    buffer = FrameBuffer(3, 2)
+    buffer.publish(np.ones((4, 5), dtype=np.uint8), np.zeros((4, 5), dtype=np.float32), 7)
+    assert buffer.acquire().material.shape == (4, 5)
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline
+        time.sleep(0.01)
+
+
+def test_thread_runs_commands_and_publishes():
+    world = ArrayWorld(20, 20, seed=0)
+    with SimulationThread(world, tick_rate=0) as sim:
+        sim.paint(brush.rect(0, 0, 19, 0, 20, 20), 'sand')
+        wait_for(lambda: sim.ticks > 5 and (sim.latest().material[-1] == SAND).all())
+        sim.look(0, 10, 20, 20)
+        wait_for(lambda: sim.latest().material.shape == (10, 20))
+    ticks = sim.ticks
+    time.sleep(0.05)
+    assert sim.ticks == ticks and world.tick == ticks
+
+
+def test_thread_errors_reach_the_reader():
+    world = ArrayWorld(8, 8)
+    sim = SimulationThread(world, tick_rate=0)
+    sim.submit('paint', brush.rect(0, 0, 1, 1, 8, 8), 'lava')
+    sim.thread.join(10)
+    with pytest.raises(RuntimeError):
+        sim.latest()
+    sim.close()
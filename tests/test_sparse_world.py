@@ -0,0 +1,102 @@
+import os
+import numpy as np
+import pytest
+import brush
+import sparse_world
+from conftest import paint_scene, state
+from array_world import ArrayWorld
+from sparse_world import ChunkStore, SparseWorld
+from materials import SAND, SMOKE
+
+
+def test_chunk_store_pages_out_the_least_recently_used(tmp_path):
+    store = ChunkStore(size=4, memory_budget=2 * 16 * sparse_world.CHUNK_DTYPE.itemsize, directory=str(tmp_path))
+    for key in ((0, 0), (0, 1), (1, 0)):
+        store.get(key, create=True)[0][1, 2] = key[1] + 1
+    assert list(store.resident) == [(0, 1), (1, 0)] and list(store.paged) == [(0, 0)]
+    assert store.peek((0, 0))[0][1, 2] == 1
+    assert list(store.paged) == [(0, 0)]
+    assert store.get((0, 0))[0][1, 2] == 1
+    assert list(store.paged) == [(0, 1)] and len(store) == 3
+    assert store.get((5, 5)) is None
+    store.free((0, 1))
+    assert os.listdir(tmp_path) == [] and len(store) == 2
+
+
+def test_empty_chunks_are_not_kept():
+    world = SparseWorld(256, 256)
+    world.paint(brush.circle(200, 200, 3, 256, 256), 'sand')
+    assert world.store.keys() == [(3, 3)]
+    world.paint(brush.circle(200, 200, 3, 256, 256), None, brush.ERASE)
+    assert len(world.store) == 0
+
+
+def test_settles_like_the_array_backend():
+    piles = []
+    for world in (SparseWorld(96, 96, seed=0), ArrayWorld(96, 96, seed=0)):
+        world.paint(brush.rect(0, 90, 95, 95, 96, 96), 'rock')
+        world.paint(brush.rect(60, 0, 70, 40, 96, 96), 'sand')
+        for _ in range(120):
+            world.update()
+        sand = world.material_grid() == SAND
+        assert np.count_nonzero(sand) == 451
+        piles.append(sand.sum(axis=0))
+    # the piles differ only where a grain rolled the other way
+    assert np.abs(piles[0] - piles[1]).sum() <= 0.1 * 451
+
+
+def test_paging_does_not_change_the_run(tmp_path):
+    worlds = [SparseWorld(160, 160, seed=2),
+              SparseWorld(160, 160, seed=2, memory_budget=1, page_directory=str(tmp_path))]
+    for world in worlds:
+        world.paint(brush.rect(0, 150, 159, 159, 160, 160), 'rock')
+        world.paint(brush.circle(30, 20, 10, 160, 160), 'water')
+        world.paint(brush.circle(120, 100, 8, 160, 160), 'sand')
+        for _ in range(20):
+            world.update()
+    assert worlds[1].store.paged
+    for plane, other in zip(state(worlds[0]), state(worlds[1])):
+        np.testing.assert_array_equal(plane, other)
+    for world in worlds:
+        world.close()
+
+
+def test_viewport_reads_only_the_view():
+    world = SparseWorld(300, 300)
+    world.add_particle(250, 250, 'sand')
+    world.add_particle(10, 10, 'sand')
+    view = world.viewport(240, 240, 400, 400)
+    assert view.material_grid().shape == (60, 60)
+    assert view.material_grid()[10, 10] == SAND and np.count_nonzero(view.material_grid()) == 1
+
+
+@pytest.mark.parametrize('name', ('resume.pxz', 'resume.json'))
+def test_save_load_continue(name, world_factory, tmp_path):
+    world = world_factory('sparse', seed=3)
+    paint_scene(world)
+    for _ in range(20):
+        world.update()
+    world.save(tmp_path / name)
+    resumed = world_factory('sparse', seed=3)
+    resumed.load(tmp_path / name)
+    if name.endswith('.json'):
+        # JSON keeps cells only, so compare the state and stop there
+        for plane, other in zip(state(world), state(resumed)):
+            np.testing.assert_allclose(plane, other)
+        return
+    for _ in range(30):
+        world.update()
+        resumed.update()
+    for plane, other in zip(state(world), state(resumed)):
+        np.testing.assert_array_equal(plane, other)
+
+
+def test_smoke_dissipates_once_across_tile_seams(monkeypatch):
+    # gas in a halo is rolled for only by the tile that owns it
+    monkeypatch.setattr(sparse_world, 'TILE', 32)
+    counts = {}
+    for world in (SparseWorld(128, 128, seed=0), ArrayWorld(128, 128, seed=0)):
+        world.paint(np.nonzero(np.ones((128, 128), dtype=bool)), 'smoke')
+        world.update()
+        counts[type(world).__name__] = np.count_nonzero(world.material_grid() == SMOKE)
+    assert counts['SparseWorld'] == pytest.approx(counts['ArrayWorld'], rel=0.03)
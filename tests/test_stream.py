@@ -0,0 +1,71 @@
+import asyncio
+import zlib
+import numpy as np
+import pytest
+import stream
+from array_world import ArrayWorld
+from materials import SAND, WATER
+
+
+@pytest.mark.parametrize('index', (
+    [],
+    [5],
+    [0, 1, 2, 3, 10, 11, 40],
+    list(range(100, 164)) + [200, 202],
+))
+def test_delta_round_trip(index):
+    index = np.array(index, dtype=np.intp)
+    values = (index * 7 % 11).astype(np.uint8)
+    decoded_index, decoded_values = stream.decode_delta(stream.encode_delta(index, values))
+    np.testing.assert_array_equal(decoded_index, index)
+    np.testing.assert_array_equal(decoded_values, values)
+
+
+def test_keyframe_round_trip():
+    material = np.random.default_rng(5).integers(0, 8, (5, 7)).astype(np.uint8)
+    decoded = np.frombuffer(zlib.decompress(stream.encode_keyframe(material)), dtype=np.uint8)
+    np.testing.assert_array_equal(decoded.reshape(material.shape), material)
+
+
+def test_remote_strokes_are_clamped():
+    world = ArrayWorld(40, 30)
+    server = stream.StreamServer(world)
+    server.paint(0, 0, 10 ** 9, -10 ** 9, 10 ** 6, 'sand')
+    y0, y1, x0, x1 = server.dirty[-1]
+    assert 0 <= y0 < y1 <= world.height and 0 <= x0 < x1 <= world.width
+    assert world.particle_count() > 0
+
+
+def test_viewers_follow_the_world_and_oversized_commands_drop_the_viewer():
+    async def scenario():
+        world = ArrayWorld(40, 30, seed=0)
+        world.add_particle(5, 5, 'water')
+        server = stream.StreamServer(world)
+        listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        client = await stream.StreamClient.connect('127.0.0.1', port)
+        await client.receive()
+        assert client.material[5, 5] == WATER
+
+        client.paint(20, 2, 24, 2, 1, 'sand')
+        while not server.dirty:
+            await asyncio.sleep(0.01)
+        for _ in range(10):
+            world.update()
+            server.tick += 1
+            server.broadcast(server.delta())
+            await client.receive()
+        np.testing.assert_array_equal(client.material, world.material_grid())
+        assert (client.material == SAND).any() and client.tick == 10
+
+        rogue = await stream.StreamClient.connect('127.0.0.1', port)
+        rogue.writer.write(stream._MESSAGE.pack(stream.PAINT, 0, stream.MAX_COMMAND + 1))
+        await asyncio.wait_for(rogue.receive_forever(), 5)
+        assert len(server.viewers) == 1
+
+        client.close()
+        rogue.close()
+        await asyncio.wait_for(asyncio.gather(*server.handlers), 5)
+        listener.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+import numpy as np
+import thermal
+from conftest import planes_of
+from materials import EMPTY, WATER, ROCK, STEAM, AMBIENT_TEMPERATURE
+
+
+def test_diffuse_averages_over_occupied_neighbours():
+    occupied = np.array([[True, True, False]])
+    temperature = np.array([[100.0, 40.0, 900.0]], dtype=np.float32)
+    thermal.diffuse(occupied, temperature)
+    # each occupied cell counts itself twice against its occupied neighbours;
+    # the empty cell's value is neither read nor written
+    np.testing.assert_allclose(temperature, [[80.0, 60.0, 900.0]])
+
+
+def test_diffuse_leaves_isolated_cells():
+    occupied = np.array([[True, False, True]])
+    temperature = np.array([[100.0, 20.0, 60.0]], dtype=np.float32)
+    thermal.diffuse(occupied, temperature)
+    np.testing.assert_allclose(temperature, [[100.0, 20.0, 60.0]])
+
+
+def test_is_uniform_ignores_empty_cells():
+    occupied = np.array([[True, False]])
+    assert thermal.is_uniform(occupied, np.array([[AMBIENT_TEMPERATURE, 500.0]], dtype=np.float32))
+    assert not thermal.is_uniform(occupied, np.array([[500.0, AMBIENT_TEMPERATURE]], dtype=np.float32))
+
+
+def test_phase_changes_both_ways():
+    planes = planes_of([[WATER, WATER, STEAM, STEAM, ROCK, EMPTY]])
+    planes[1][0] = [150, 50, 150, 50, 2000, 2000]
+    planes[3][0] = 1.0
+    thermal.apply_phase_changes(planes)
+    assert planes[0][0].tolist() == [STEAM, WATER, STEAM, WATER, ROCK, EMPTY]
+    # cells that changed lose their life and velocity but keep their heat
+    assert planes[2][0].tolist() == [-1, 1, 2, -1, 4, 5]
+    assert planes[3][0].tolist() == [0.0, 1.0, 1.0, 0.0, 1.0, 1.0]
+    assert planes[1][0, 0] == 150
@@ -0,0 +1,9 @@
+import pytest
+from util import parse_size
+
+
+def test_parse_size():
+    assert parse_size('200x150') == (200, 150)
+    assert parse_size('64X48') == (64, 48)
+    with pytest.raises(ValueError):
+        parse_size('64')
@@ -0,0 +1,56 @@
+import numpy as np
+from materials import EMPTY, AMBIENT_TEMPERATURE, NONE, PHASE_TEMPERATURE, PHASE_ABOVE, PHASE_BELOW
+
+PHASED = tuple(np.flatnonzero(np.isfinite(PHASE_TEMPERATURE)).tolist())
+
+
+def box_sum(values):
+    padded = np.pad(values, 1)
+    rows = padded[:-2] + padded[1:-1] + padded[2:]
+    return rows[:, :-2] + rows[:, 1:-1] + rows[:, 2:]
+
+
+def diffuse(occupied, temperature):
+    heat = temperature * occupied
+    total = heat + box_sum(heat)
+    count = box_sum(occupied.astype(temperature.dtype))
+    count += 1
+    np.divide(total, count, out=total)
+    np.copyto(temperature, total, where=occupied)
+
+
+def is_uniform(occupied, temperature):
+    return not ((temperature != AMBIENT_TEMPERATURE) & occupied).any()
+
+
+def phase_masks(material, temperature):
+    changes = []
+    for kind in PHASED:
+        here = material == kind
+        if not here.any():
+            continue
+        threshold = PHASE_TEMPERATURE[kind]
+        if PHASE_ABOVE[kind] != NONE:
+            changes.append((PHASE_ABOVE[kind], here & (temperature >= threshold)))
+        if PHASE_BELOW[kind] != NONE:
+            changes.append((PHASE_BELOW[kind], here & (temperature < threshold)))
+    return changes
+
+
+def apply_phase_changes(planes):
+    material, temperature, life, vx, vy = planes
+    changes = phase_masks(material, temperature)
+    for product, mask in changes:
+        material[mask] = product
+    for _, mask in changes:
+        life[mask] = -1
+        vx[mask] = 0.0
+        vy[mask] = 0.0
+
+
+def step(planes):
+    material, temperature = planes[0], planes[1]
+    occupied = material != EMPTY
+    if not is_uniform(occupied, temperature):
+        diffuse(occupied, temperature)
+    apply_phase_changes(planes)
@@ -0,0 +1,4 @@
+def parse_size(text):
+    # WIDTHxHEIGHT, as taken by --sizes and --world-size
+    width, height = text.lower().split('x')
+    return int(width), int(height)
@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import sys
+import pygame
+import brush
+from renderer import Renderer
+from stream import StreamClient, PORT, MAX_BRUSH
+
+CELL_SIZE = 4
+FRAME_RATE = 60
+# number keys pick what to paint, as the buttons do in main.py
+MATERIAL_KEYS = {
+    pygame.K_1: 'sand',
+    pygame.K_2: 'water',
+    pygame.K_3: 'rock',
+    pygame.K_4: 'fire',
+    pygame.K_5: 'wood',
+    pygame.K_6: 'plant',
+    pygame.K_7: 'explosive',
+}
+
+
+async def view(host='127.0.0.1', port=PORT, cell_size=CELL_SIZE):
+    client = await StreamClient.connect(host, port)
+    receiving = asyncio.ensure_future(client.receive_forever())
+    pygame.init()
+    screen = pygame.display.set_mode((client.width * cell_size, client.height * cell_size))
+    renderer = Renderer(client.width, client.height, cell_size)
+    current_type = 'sand'
+    brush_size = 3
+    eraser_mode = False
+    last = None
+    received, window_start = 0, pygame.time.get_ticks()
+    try:
+        while not receiving.done():
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return
+                elif event.type == pygame.KEYDOWN and event.key in MATERIAL_KEYS:
+                    current_type = MATERIAL_KEYS[event.key]
+                    eraser_mode = False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_e:
+                    eraser_mode = not eraser_mode
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 4:
+                    brush_size = min(MAX_BRUSH, brush_size + 1)
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 5:
+                    brush_size = max(1, brush_size - 1)
+
+            if pygame.mouse.get_pressed()[0]:
+                x, y = pygame.mouse.get_pos()
+                x, y = x // cell_size, y // cell_size
+                x0, y0 = last or (x, y)
+                if (x, y) != last:
+                    client.paint(x0, y0, x, y, brush_size, current_type, brush.ERASE if eraser_mode else brush.FILL)
+                last = (x, y)
+            else:
+                last = None
+
+            screen.blit(renderer.render(client), (0, 0))
+            pygame.display.flip()
+
+            now = pygame.time.get_ticks()
+            if now - window_start >= 1000:
+                rate = (client.bytes_received - received) * 1000 / (now - window_start) / 1024
+                mode = 'erase' if eraser_mode else current_type
+                pygame.display.set_caption(f"pixelz {host}:{port} tick {client.tick} {rate:.0f} KiB/s {mode}")
+                received, window_start = client.bytes_received, now
+            await asyncio.sleep(1 / FRAME_RATE)
+    finally:
+        receiving.cancel()
+        client.close()
+        pygame.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch and paint into a world served by headless.py serve.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--cell-size', type=int, default=CELL_SIZE)
+    args = parser.parse_args()
+    asyncio.run(view(args.host, args.port, args.cell_size))
+    sys.exit()
@@ -1,32 +1,236 @@
 import numpy as np
 import json
-from particle import Particle
+import time
+import brush
+import explosions
+import thermal
+import savefile
+from profiling import phase
+from events import Schedule
+from particle import ParticlePool
+from array_world import Viewport
+from rng import WorldRandom, CELL_DRAWS
+from materials import EMPTY, AMBIENT_TEMPERATURE, NONE, FIRE, PLANT, MATERIAL_NAMES, material_id
 
 class World:
-    def __init__(self, width, height):
+    def __init__(self, width, height, seed=None):
         self.width = width
         self.height = height
+        self.random = WorldRandom(seed)
         self.grid = np.full((height, width), None, dtype=object)
+        self.pool = ParticlePool(watch=(PLANT,))
+        self.schedule = Schedule((height, width))
+        self.detonations = []
+        self.profiler = None
+        self.tick = 0
 
     def add_particle(self, x, y, particle_type):
         if 0 <= x < self.width and 0 <= y < self.height:
-            if self.grid[y, x] is None:
-                self.grid[y, x] = Particle(x, y, particle_type)
+            material = material_id(particle_type)
+            # an empty cell holds no particle, as in the array backends
+            if self.grid[y, x] is None and material != EMPTY:
+                self.grid[y, x] = self.pool.acquire(x, y, material)
+
+    def set_temperature(self, x, y, temperature):
+        if 0 <= x < self.width and 0 <= y < self.height and self.grid[y, x] is not None:
+            self.grid[y, x].temperature = temperature
+
+    def erase(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.pool.release(self.grid[y, x])
+            self.grid[y, x] = None
+
+    def paint(self, cells, particle_type=None, mode=brush.FILL):
+        material = EMPTY if mode == brush.ERASE else material_id(particle_type)
+        if material == EMPTY and mode == brush.FILL:
+            return
+        for y, x in zip(cells[0].tolist(), cells[1].tolist()):
+            particle = self.grid[y, x]
+            if material == EMPTY:
+                self.pool.release(particle)
+                self.grid[y, x] = None
+            elif particle is None:
+                self.grid[y, x] = self.pool.acquire(x, y, material)
+            elif mode == brush.REPLACE:
+                particle.respawn(material)
+                # acquire reports new plants to the schedule; a respawn has to as well
+                if material in self.pool.watch:
+                    self.pool.born.append(particle)
+
+    def occupied(self):
+        return self.grid != None
+
+    def material_grid(self):
+        materials = np.zeros((self.height, self.width), dtype=np.uint8)
+        occupied = self.occupied()
+        materials[occupied] = [p.material for p in self.grid[occupied]]
+        return materials
+
+    def temperature_grid(self):
+        temperature = np.full((self.height, self.width), AMBIENT_TEMPERATURE, dtype=np.float32)
+        occupied = self.occupied()
+        temperature[occupied] = [p.temperature for p in self.grid[occupied]]
+        return temperature
+
+    def viewport(self, x0, y0, x1, y1):
+        grid = self.grid[max(y0, 0):min(y1, self.height), max(x0, 0):min(x1, self.width)]
+        occupied = grid != None
+        particles = grid[occupied]
+        material = np.zeros(grid.shape, dtype=np.uint8)
+        temperature = np.full(grid.shape, AMBIENT_TEMPERATURE, dtype=np.float32)
+        material[occupied] = [p.material for p in particles]
+        temperature[occupied] = [p.temperature for p in particles]
+        return Viewport((material, temperature))
+
+    def particle_count(self):
+        return int(np.count_nonzero(self.occupied()))
 
     def update(self):
+        profiler = self.profiler
+        # Cells occupied when the tick starts, bottom row first, each with one
+        # row of draws. As in the cell kernels, particles created during the
+        # scan wait for the next tick.
+        ys, xs = np.nonzero(self.occupied()[::-1])
+        ys = self.height - 1 - ys
+        cells = zip(ys.tolist(), xs.tolist(), self.random.random((len(ys), CELL_DRAWS)))
+        if profiler is None:
+            tick = self.tick
+            for y, x, u in cells:
+                particle = self.grid[y, x]
+                if particle is not None and particle.moved != tick:
+                    particle.update(self.grid, self, u.tolist())
+                    if particle.x != x or particle.y != y:
+                        particle.moved = tick
+        else:
+            stats = profiler.begin(self.tick)
+            acquired, released = self.pool.acquired, self.pool.released
+            with profiler.phase('rules'):
+                self.update_profiled(cells, stats)
+        with phase(profiler, 'events'):
+            self.grow_plants()
+        with phase(profiler, 'explosions'):
+            if self.detonations:
+                self.detonate()
+        with phase(profiler, 'temperature'):
+            self.apply_temperature_effects()
+        if profiler is not None:
+            stats.counts['created'] += self.pool.acquired - acquired
+            stats.counts['destroyed'] += self.pool.released - released
+            profiler.end()
+        self.tick += 1
 
-        for y in range(self.height - 1, -1, -1):
-            for x in range(self.width):
-                if self.grid[y, x]:
-                    self.grid[y, x].update(self.grid, self)
+    def update_profiled(self, cells, stats):
+        clock = time.perf_counter
+        rules, counts = stats.rules, stats.counts
+        tick = self.tick
+        for y, x, u in cells:
+            particle = self.grid[y, x]
+            if particle is not None and particle.moved != tick:
+                name = MATERIAL_NAMES[particle.material]
+                start = clock()
+                particle.update(self.grid, self, u.tolist())
+                rules[name] += clock() - start
+                counts['updated'] += 1
+                if particle.x != x or particle.y != y:
+                    particle.moved = tick
+                    counts['moved'] += 1
+
+    def grow_plants(self):
+        due = self.schedule.due(self.tick)
+        fired = []
+        for cell, u in zip(due.tolist(), self.random.random((len(due), CELL_DRAWS))):
+            particle = self.grid[divmod(cell, self.width)]
+            if particle is not None and particle.material == PLANT:
+                particle.grow(self.grid, self, u)
+                fired.append(cell)
+        born, self.pool.born = self.pool.born, []
+        fired.extend(p.y * self.width + p.x for p in born if self.grid[p.y, p.x] is p and p.material == PLANT)
+        self.schedule.add(self.tick, np.array(fired, dtype=np.intp), self.random)
+
+    def reschedule(self):
+        self.pool.born = []
+        self.schedule.clear()
+        self.schedule.add(self.tick, np.flatnonzero(self.material_grid() == PLANT), self.random)
+
+    def detonate(self):
+        material = self.material_grid()
+        ys, xs = zip(*self.detonations)
+        self.detonations = []
+        burn, primed = explosions.resolve(material, ys, xs, rng=self.random)
+        ys, xs = np.nonzero(burn)
+        for y, x in zip(ys.tolist(), xs.tolist()):
+            if self.grid[y, x] is None:
+                self.grid[y, x] = self.pool.acquire(x, y, FIRE)
+            else:
+                self.grid[y, x].respawn(FIRE)
+
+    def apply_temperature_effects(self):
+        occupied = self.occupied()
+        ys, xs = np.nonzero(occupied)
+        particles = self.grid[ys, xs]
+        temperature = np.zeros((self.height, self.width), dtype=np.float32)
+        temperature[ys, xs] = [p.temperature for p in particles]
+        thermal.diffuse(occupied, temperature)
+        for particle, x, y, t in zip(particles, xs.tolist(), ys.tolist(), temperature[ys, xs].tolist()):
+            particle.temperature = t
+            product = particle.phase_product()
+            if product != NONE:
+                particle.transform(product)
+
+    def planes(self):
+        occupied = self.occupied()
+        particles = self.grid[occupied]
+        life = np.full((self.height, self.width), -1, dtype=np.int16)
+        vx = np.zeros((self.height, self.width), dtype=np.float32)
+        vy = np.zeros((self.height, self.width), dtype=np.float32)
+        life[occupied] = [p.life for p in particles]
+        vx[occupied] = [p.vx for p in particles]
+        vy[occupied] = [p.vy for p in particles]
+        return self.material_grid(), self.temperature_grid(), life, vx, vy
 
     def save(self, filename):
+        if savefile.is_json_name(filename):
+            self.save_json(filename)
+        else:
+            savefile.write(filename, *self.snapshot())
+
+    def snapshot(self):
+        # planes() already builds fresh arrays
+        planes = dict(zip(savefile.PLANE_NAMES, self.planes()), event=self.schedule.snapshot())
+        return planes, {'tick': self.tick, 'random': self.random.snapshot()}
+
+    def load(self, filename):
+        if not savefile.is_binary(filename):
+            self.load_json(filename)
+            return
+        header, planes = savefile.read(filename)
+        self.restore(planes, header)
+
+    def restore(self, planes, meta):
+        self.height, self.width = planes['material'].shape
+        self.tick = meta.get('tick', 0)
+        if 'random' in meta:
+            self.random.restore(meta['random'])
+        self.clear()
+        ys, xs = np.nonzero(planes['material'])
+        for y, x in zip(ys.tolist(), xs.tolist()):
+            particle = self.pool.acquire(x, y, planes['material'][y, x])
+            particle.temperature = float(planes['temperature'][y, x])
+            particle.life = int(planes['life'][y, x])
+            particle.vx = float(planes['vx'][y, x])
+            particle.vy = float(planes['vy'][y, x])
+            self.grid[y, x] = particle
+        # plants without a saved event are scheduled from pool.born on the next tick
+        if 'event' in planes:
+            self.schedule.restore(planes['event'])
+
+    def save_json(self, filename):
         data = [
             {
                 'x': x, 'y': y, 'type': particle.type,
                 'temperature': particle.temperature,
                 'life': particle.life,
-                'velocity': particle.velocity.tolist()
+                'velocity': [particle.vx, particle.vy]
             }
             for y, row in enumerate(self.grid)
             for x, particle in enumerate(row)
@@ -35,13 +239,19 @@ class World:
         with open(filename, 'w') as f:
             json.dump(data, f)
 
-    def load(self, filename):
+    def load_json(self, filename):
         with open(filename, 'r') as f:
             data = json.load(f)
-        self.grid = np.full((self.height, self.width), None, dtype=object)
+        self.clear()
         for item in data:
-            particle = Particle(item['x'], item['y'], item['type'])
+            particle = self.pool.acquire(item['x'], item['y'], item['type'])
             particle.temperature = item['temperature']
             particle.life = item['life']
-            particle.velocity = np.array(item['velocity'])
+            particle.vx, particle.vy = item['velocity']
             self.grid[item['y'], item['x']] = particle
+
+    def clear(self):
+        self.detonations = []
+        self.pool.release_all(self.grid[self.occupied()])
+        self.grid = np.full((self.height, self.width), None, dtype=object)
+        self.schedule = Schedule((self.height, self.width))